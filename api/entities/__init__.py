@@ -4,9 +4,11 @@ from fastapi import APIRouter, Depends, Request
 from fastapi_csrf_protect.flexible import CsrfProtect
 
 from infrastructure.auth import get_user_from_token
+from infrastructure.page_cache import bump_pages_version
 
 from .category import router as categories_router
 from .collections import router as entity_collections_router
+from .slides import router as slides_router
 from .tile import router as tile_router
 from .tile_boxes import router as tile_boxes_router
 from .tile_color import router as tile_color_router
@@ -23,7 +25,9 @@ async def csrf_validate(request: Request, csrf_protect: csrfProtectDep):
 
 
 # admin_router = APIRouter(dependencies=[Depends(get_user_from_token)])
-admin_router = APIRouter(dependencies=[Depends(csrf_validate)])
+admin_router = APIRouter(
+    dependencies=[Depends(csrf_validate), Depends(bump_pages_version)]
+)
 admin_router.include_router(tile_router)
 admin_router.include_router(tile_size_router)
 admin_router.include_router(tile_color_router)
@@ -32,3 +36,4 @@ admin_router.include_router(tile_boxes_router)
 admin_router.include_router(tile_producers_router)
 admin_router.include_router(categories_router)
 admin_router.include_router(entity_collections_router)
+admin_router.include_router(slides_router)
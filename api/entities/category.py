@@ -19,4 +19,5 @@ async def admin_create_tile_box(manager: dbManagerDep, name: Annotated[str, Form
         filters["name"] = name
 
     await manager.delete(Categories, **filters)
+    manager.invalidate(Categories)
     return RedirectResponse("/admin", status_code=303)
@@ -5,7 +5,8 @@ from fastapi import APIRouter, Depends, File, Form, UploadFile
 from fastapi.responses import RedirectResponse
 
 from infrastructure.crud import Crud, get_db_manager
-from infrastructure.images import (CollectionImagesManager, ImageGenerator)
+from infrastructure.images import CollectionImagesManager
+from api.utils import upload_chunks
 from services.collections import add_collection, delete_collection
 
 router = APIRouter(prefix="/admin/tiles/collections")
@@ -22,13 +23,12 @@ async def admin_create_tile_collection(
 ):
     collection_name = collection_name.strip()
     category_name = category_name.strip()
-    image = await image.read()
     await add_collection(
         collection_name,
-        image,
+        upload_chunks(image),
         category_name,
         manager,
-        images_generator=ImageGenerator,
+        images_generator=None,  # варианты создаст очередь изображений
         file_manager=CollectionImagesManager(),
     )
     return RedirectResponse("/admin", status_code=303)
@@ -1,26 +1,51 @@
 import logging
 from typing import Annotated
 
-from fastapi import APIRouter, File, UploadFile
+from fastapi import APIRouter, Depends, File, Form, UploadFile
 from fastapi.responses import RedirectResponse
 
-from infrastructure.images import SlideImagesManager, ImageGenerator
-from services.slides import add_slides, delete_slides
+from api.utils import upload_chunks
+from infrastructure.crud import Crud, get_db_manager
+from infrastructure.images import SlideImagesManager
+from services.slides import add_slides, delete_slides, update_slide
 
 router = APIRouter(prefix="/admin/slides")
+dbManagerDep = Annotated[Crud, Depends(get_db_manager)]
 log = logging.getLogger(__name__)
 
 
 @router.post("/insert")
-async def insert_slide_image(images: Annotated[list[UploadFile], File()]):
-    images_bytes = [await image.read() for image in images]
+async def insert_slide_image(
+    manager: dbManagerDep, images: Annotated[list[UploadFile], File()]
+):
+    # варианты создаст очередь изображений
     await add_slides(
-        images_bytes, images_generator=ImageGenerator, file_manager=SlideImagesManager()
+        [upload_chunks(image) for image in images],
+        images_generator=None,
+        file_manager=SlideImagesManager(),
+        manager=manager,
     )
     return RedirectResponse("/admin", status_code=303)
 
 
+@router.post("/update")
+async def update_slide_image(
+    manager: dbManagerDep,
+    slide_id: Annotated[int, Form()],
+    position: Annotated[int | None, Form()] = None,
+    active: Annotated[bool, Form()] = False,
+):
+    await update_slide(manager, slide_id, position=position, active=active)
+    return RedirectResponse("/admin", status_code=303)
+
+
 @router.post("/delete")
-async def delete_slide_image():
-    await delete_slides(file_manager=SlideImagesManager())
+async def delete_slide_image(
+    manager: dbManagerDep,
+    slide_id: Annotated[int | None, Form()] = None,
+):
+    params = {}
+    if slide_id is not None:
+        params["id"] = slide_id
+    await delete_slides(SlideImagesManager(), manager, **params)
     return RedirectResponse("/admin", status_code=303)
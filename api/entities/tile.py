@@ -5,10 +5,10 @@ from fastapi import APIRouter, Depends, File, Form, UploadFile
 from fastapi.responses import RedirectResponse
 
 from infrastructure.crud import Crud, get_db_manager
-from infrastructure.images import (ProductImagesManager, ImageGenerator)
+from infrastructure.images import ProductImagesManager
 from domain import *
 from services.tile import add_tile, delete_tile, update_tile
-from api.utils import api_input_to_params, strip_input_params
+from api.utils import api_input_to_params, strip_input_params, upload_chunks
 
 router = APIRouter(prefix="/admin/tiles")
 dbManagerDep = Annotated[Crud, Depends(get_db_manager)]
@@ -58,8 +58,7 @@ async def admin_create_tile(
             surface_name,
         )
     ]
-    bytes_images = [await img.read() for img in images] if images else []
-    bytes_main_image = await main_image.read()
+    images_chunks = [upload_chunks(img) for img in images if img.size] if images else []
     length_str, width_str, height_str = size.split()
     length = Decimal(length_str)
     width = Decimal(width_str)
@@ -76,11 +75,11 @@ async def admin_create_tile(
         box_weight,
         box_area,
         boxes_count,
-        bytes_main_image,
+        upload_chunks(main_image),
         category_name,
         manager,
-        bytes_images,
-        images_generator=ImageGenerator,
+        images_chunks,
+        images_generator=None,  # варианты создаст очередь изображений
         file_manager=ProductImagesManager(),
         color_feature=feature_name,
         surface=surface_name,
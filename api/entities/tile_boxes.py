@@ -26,4 +26,5 @@ async def admin_create_tile_box(
         filters["area"] = area
 
     await manager.delete(Box, **filters)
+    manager.invalidate(Box)
     return RedirectResponse("/admin", status_code=303)
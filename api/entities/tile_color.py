@@ -26,4 +26,5 @@ async def admin_delete_tile_color_feature(
         log.debug("feature_name: %s", feature_name)
         filters["feature_name"] = feature_name
     await manager.delete(TileColor, **filters)
+    manager.invalidate(TileColor)
     return RedirectResponse("/admin", status_code=303)
@@ -22,4 +22,5 @@ async def admin_create_tile_box(
         filters["name"] = name
 
     await manager.delete(Producer, **filters)
+    manager.invalidate(Producer)
     return RedirectResponse("/admin", status_code=303)
@@ -24,6 +24,7 @@ async def admin_delete_tile_size(
         await manager.delete(TileSize, height=height, width=width, length=length)
     else:
         await manager.delete(TileSize)
+    manager.invalidate(TileSize)
     return RedirectResponse("/admin", status_code=303)
 
 
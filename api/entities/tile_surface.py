@@ -22,4 +22,5 @@ async def admin_create_tile_box(
         filters["name"] = name
 
     await manager.delete(TileSurface, **filters)
+    manager.invalidate(TileSurface)
     return RedirectResponse("/admin", status_code=303)
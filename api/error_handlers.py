@@ -3,13 +3,12 @@ import logging
 from fastapi import Request
 from fastapi.responses import RedirectResponse
 
+from api.templating import templates
 from domain.exceptions import (AlreadyExistsError, ForeignKeyViolationError,
                                NotFoundError, RefreshTokenNotExistsError, CredentialsValidateError, UserLoginNotFoundError)
-from fastapi.templating import Jinja2Templates
 from infrastructure.user_agent import CookieManager
 
 log = logging.getLogger(__name__)
-templates = Jinja2Templates("templates")
 
 async def not_found_handler(request: Request, exc: NotFoundError):
     log.error("Ошибка поиска в базе данных: %s", exc)
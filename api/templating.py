@@ -0,0 +1,98 @@
+import logging
+from functools import lru_cache
+
+from fastapi.responses import StreamingResponse
+from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemBytecodeCache, FileSystemLoader
+from markupsafe import Markup
+
+from core import conf
+from core.config import STREAM_CHUNK_SIZE, TEMPLATE_FRAGMENT_CACHE, TEMPLATES_DIR
+from infrastructure.files import FileManager
+
+log = logging.getLogger(__name__)
+
+
+def build_bytecode_cache(
+    directory: str | None = conf.templates_cache_dir, pattern: str = "__jinja2_%s.cache"
+) -> FileSystemBytecodeCache:
+    # без каталога байткод кладётся во временный
+    return FileSystemBytecodeCache(directory, pattern)
+
+
+def build_environment(
+    directory: str = TEMPLATES_DIR,
+    auto_reload: bool = conf.templates_auto_reload,
+    bytecode_cache_dir: str | None = conf.templates_cache_dir,
+) -> Environment:
+    # одно окружение на все роутеры: общий кэш шаблонов и байткод на диске,
+    # который переживает перезапуск воркеров
+    return Environment(
+        loader=FileSystemLoader(directory),
+        autoescape=True,
+        auto_reload=auto_reload,
+        bytecode_cache=build_bytecode_cache(bytecode_cache_dir),
+    )
+
+
+templates = Jinja2Templates(env=build_environment())
+templates.env.globals["image_sources"] = FileManager().image_sources
+# асинхронные шаблоны для потоковых ответов; байткод у них другой, поэтому отдельный кэш
+stream_env = templates.env.overlay(
+    enable_async=True,
+    bytecode_cache=build_bytecode_cache(pattern="__jinja2_async_%s.cache"),
+)
+
+
+async def _buffered(parts, chunk_size: int = STREAM_CHUNK_SIZE, first_chunk_size: int = 1024):
+    # generate_async отдаёт мелкие куски, в сеть они уходят пачками по chunk_size;
+    # первая пачка (начало head) меньше, чтобы браузер сразу начал грузить стили
+    buffer, size, threshold = [], 0, first_chunk_size
+    async for part in parts:
+        buffer.append(part)
+        size += len(part)
+        if size >= threshold:
+            yield "".join(buffer)
+            buffer, size, threshold = [], 0, chunk_size
+    if buffer:
+        yield "".join(buffer)
+
+
+def stream_template(name: str, context: dict, status_code: int = 200) -> StreamingResponse:
+    # начало страницы уходит браузеру, пока тело ещё рендерится
+    template = stream_env.get_template(name)
+    return StreamingResponse(
+        _buffered(template.generate_async(context)),
+        status_code=status_code,
+        media_type="text/html",
+    )
+
+
+def precompile_templates(envs: tuple[Environment, ...] = (templates.env, stream_env)) -> int:
+    # при старте: все шаблоны компилируются заранее, а не первым запросом к странице
+    compiled = 0
+    for env in envs:
+        for name in env.list_templates(extensions=["html"]):
+            env.get_template(name)
+            compiled += 1
+    log.info("Скомпилировано шаблонов: %s", compiled)
+    return compiled
+
+
+@lru_cache(maxsize=32)
+def _render_category_nav(items: tuple[tuple[str, str], ...]) -> Markup:
+    template = templates.env.get_template("fragments/category_nav.html")
+    return Markup(
+        template.render(categories=[{"slug": slug, "name": name} for slug, name in items])
+    )
+
+
+def category_nav(categories) -> Markup:
+    # меню категорий одинаково на всех страницах: рендерится один раз на набор категорий
+    items = tuple((category["slug"], category["name"]) for category in categories)
+    if not TEMPLATE_FRAGMENT_CACHE:
+        return _render_category_nav.__wrapped__(items)
+    return _render_category_nav(items)
+
+
+templates.env.globals["category_nav"] = category_nav
@@ -1,5 +1,15 @@
 from decimal import Decimal
 
+from fastapi import UploadFile
+
+from core.config import UPLOAD_CHUNK_SIZE
+
+
+async def upload_chunks(upload: UploadFile, chunk_size: int = UPLOAD_CHUNK_SIZE):
+    # файл загрузки читается кусками и пишется на диск, не собираясь в памяти целиком
+    while chunk := await upload.read(chunk_size):
+        yield chunk
+
 
 def api_input_to_params(**input_params):
     if not input_params:
@@ -5,6 +5,7 @@ from .catalog import router as catalog_router
 from .clients import router as clients_router
 from .collections import router as collections_router
 from .home import router as home_router
+from .search import router as search_router
 
 view_router = APIRouter()
 view_router.include_router(view_admin_router)
@@ -12,3 +13,4 @@ view_router.include_router(catalog_router)
 view_router.include_router(clients_router)
 view_router.include_router(collections_router)
 view_router.include_router(home_router)
+view_router.include_router(search_router)
@@ -2,11 +2,15 @@ import logging
 from datetime import timedelta
 from typing import Annotated
 
-from fastapi import APIRouter, Depends, Form, Request, Response
-from fastapi.templating import Jinja2Templates
+from fastapi import APIRouter, Depends, Form, Query, Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
 from fastapi_csrf_protect.flexible import CsrfProtect
 from starlette.responses import RedirectResponse
 
+from api.templating import stream_template, templates
+from core import conf
+from core.config import ADMIN_TILES_MAX_PER_PAGE, ADMIN_TILES_PER_PAGE
 from infrastructure.crud import Crud, get_db_manager
 from infrastructure.user_agent import (
     CookieManager,
@@ -14,6 +18,7 @@ from infrastructure.user_agent import (
     require_admin_for_dep,
 )
 from services.auth import create_tokens_from_login_and_set, set_tokens
+from services.tile import fetch_admin_tiles
 from domain import *
 from services.security import get_hash
 
@@ -22,7 +27,6 @@ dbManagerDep = Annotated[Crud, Depends(get_db_manager)]
 csrfProtectDep = Annotated[CsrfProtect, Depends()]
 requireAdminDep = Annotated[dict | None, Depends(require_admin_for_dep)]
 
-templates = Jinja2Templates("templates")
 log = logging.getLogger(__name__)
 
 
@@ -33,8 +37,8 @@ async def admin_page(
     csrf_token: csrfProtectDep,
     tokens: requireAdminDep,
 ):
+    # только справочники из кэша: таблица товаров грузится отдельно, см. admin_tiles
     plain_token, signed_token = csrf_token.generate_csrf_tokens()
-    tiles = await manager.read(Tile, loaded=["images", "size", "box"])
     tile_sizes = await manager.read(TileSize)
     tile_sizes = [
         TileSize(
@@ -51,26 +55,26 @@ async def admin_page(
     boxes_weights = await manager.read(Box, distinct="weight")
     boxes_areas = await manager.read(Box, distinct="area")
     producers = await manager.read(Producer)
-    boxes_count = await manager.read(Tile, distinct="boxes_count")
-    tiles = [map_to_tile_domain(**t) for t in tiles]
     categories = await manager.read(Categories)
+    slides = await manager.read(Slide, order_by="position")
 
-    response = templates.TemplateResponse(
-        "admin.html",
-        {
-            "request": request,
-            "tiles": tiles,
-            "tile_sizes": tile_sizes,
-            "colors_names": colors_names,
-            "colors_features": colors_features,
-            "tile_surfaces": surfaces,
-            "boxes_weights": boxes_weights,
-            "boxes_areas": boxes_areas,
-            "producers": producers,
-            "categories": categories,
-            "boxes_count": boxes_count,
-            "csrf_token": plain_token,
-        },
+    context = {
+        "request": request,
+        "tile_sizes": tile_sizes,
+        "colors_names": colors_names,
+        "colors_features": colors_features,
+        "tile_surfaces": surfaces,
+        "boxes_weights": boxes_weights,
+        "boxes_areas": boxes_areas,
+        "producers": producers,
+        "categories": categories,
+        "slides": slides,
+        "csrf_token": plain_token,
+    }
+    response = (
+        stream_template("admin.html", context)
+        if conf.stream_html
+        else templates.TemplateResponse("admin.html", context)
     )
     if tokens:
         set_tokens(
@@ -82,6 +86,33 @@ async def admin_page(
     return response
 
 
+@router.get("/api/tiles")
+async def admin_tiles(
+    request: Request,
+    manager: dbManagerDep,
+    tokens: requireAdminDep,
+    q: str = "",
+    page: Annotated[int, Query(ge=1)] = 1,
+    per_page: Annotated[int, Query(ge=1, le=ADMIN_TILES_MAX_PER_PAGE)] = ADMIN_TILES_PER_PAGE,
+    producer_name: str | None = None,
+    category_name: str | None = None,
+):
+    filters = {
+        k: v
+        for k, v in (("producer_name", producer_name), ("category_name", category_name))
+        if v
+    }
+    result = await fetch_admin_tiles(manager, q, page, per_page, **filters)
+    response = JSONResponse(jsonable_encoder(result))
+    if tokens:
+        set_tokens(
+            CookieManager(request, response),
+            access_token=tokens["access_token"],
+            refresh_token=tokens["refresh_token"],
+        )
+    return response
+
+
 @router.post("/login/submit")
 async def admin_login_submit(
     request: Request,
@@ -2,25 +2,26 @@ import logging
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, Request
-from fastapi.templating import Jinja2Templates
 
+from api.templating import templates
 from infrastructure.crud import Crud, get_db_manager
 from infrastructure.images import ProductImagesManager
+from infrastructure.page_cache import cached_page
 #from infrastructure.repo import get_special_repo, SpecialRepository
 from core.config import ITEMS_PER_PAGE
 from domain import Producer, Slug, Tile, map_to_tile_domain
 from services.views import (build_data_for_filters, build_main_images,
-                            build_tile_filters, fetch_items,
+                            build_tile_filters, fetch_page,
                             get_categories_for_items)
 
 router = APIRouter(tags=["presentation"], prefix="/catalog")
 dbManagerDep = Annotated[Crud, Depends(get_db_manager)]
 #specialRepoDep = Annotated[SpecialRepository, Depends(get_special_repo)]
-templates = Jinja2Templates("templates")
 log = logging.getLogger(__name__)
 
 
 @router.get("/{category}/products/{tile_id:int}")
+@cached_page()
 async def get_tile_page(
     request: Request, category: str, tile_id: int, manager: dbManagerDep
 ):
@@ -54,6 +55,7 @@ async def get_tile_page(
 
 
 @router.get("/{category_name}/products")
+@cached_page("producer", "size", "color", "page", "cursor")
 async def get_catalog_tiles_page(
     request: Request,
     category_name: str,
@@ -62,13 +64,18 @@ async def get_catalog_tiles_page(
     size: str | None = None,
     color: str | None = None,
     page: int = 1,
+    cursor: str | None = None,
 ):
     filters = await build_tile_filters(manager, producer, size, color, category_name)
     limit = ITEMS_PER_PAGE
     offset = (page - 1) * limit
 
-    tiles, total_count = await fetch_items(manager, limit, offset, **filters)
-    sizes, colors, producers = await build_data_for_filters(manager, category_name)
+    tiles, total_count, next_cursor, prev_cursor = await fetch_page(
+        manager, limit, offset, cursor, **filters
+    )
+    sizes, colors, producers = await build_data_for_filters(
+        manager, category_name, filters=filters
+    )
     main_images = build_main_images(tiles)
     product_manager = ProductImagesManager()
     for k in main_images:
@@ -89,6 +96,8 @@ async def get_catalog_tiles_page(
             "page": page,
             "total_pages": total_pages,
             "total_count": total_count,
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor,
             "main_images": main_images,
             "categories": categories,
             "category": category_name,
@@ -2,10 +2,11 @@ import logging
 from typing import Annotated
 
 from fastapi import APIRouter, Depends, Request
-from fastapi.templating import Jinja2Templates
 
+from api.templating import templates
 from infrastructure.crud import Crud, get_db_manager
 from infrastructure.images import CollectionImagesManager, ProductImagesManager
+from infrastructure.page_cache import cached_page
 from core.config import COLLECTIONS_PER_PAGE
 from domain import CollectionCategory, Slug, map_to_tile_domain
 from services.views import (build_data_for_filters, build_main_images,
@@ -14,11 +15,11 @@ from services.views import (build_data_for_filters, build_main_images,
 
 router = APIRouter(tags=["presentation"], prefix="/catalog")
 dbManagerDep = Annotated[Crud, Depends(get_db_manager)]
-templates = Jinja2Templates("templates")
 log = logging.getLogger(__name__)
 
 
 @router.get("/{category}/collections")
+@cached_page("page")
 async def get_collections_page(
     request: Request,
     manager: dbManagerDep,
@@ -34,6 +35,7 @@ async def get_collections_page(
         category_name=category_name,
         offset=offset,
         limit=limit,
+        order_by="collection_id",
         loaded=["collection"],
     )
     collections = []
@@ -46,9 +48,7 @@ async def get_collections_page(
         slug = (await manager.read(Slug, name=coll["name"]))[0]["slug"]
         coll["slug"] = slug
         collections.append(coll)
-    total_count = len(
-        await manager.read(CollectionCategory, category_name=category_name)
-    )
+    total_count = await manager.count(CollectionCategory, category_name=category_name)
     total_pages = max((total_count + limit - 1) // limit, 1)
     categories = await get_categories_for_items(manager)
 
@@ -67,6 +67,7 @@ async def get_collections_page(
 
 
 @router.get("/{category}/collections/{collection}")
+@cached_page("name", "size", "color", "page", "cursor")
 async def get_catalog_tiles_page(
     request: Request,
     manager: dbManagerDep,
@@ -76,17 +77,18 @@ async def get_catalog_tiles_page(
     size: str | None = None,
     color: str | None = None,
     page: int = 1,
+    cursor: str | None = None,
 ):
     filters = await build_tile_filters(manager, name, size, color, category)
     limit = COLLECTIONS_PER_PAGE
     offset = (page - 1) * limit
 
-    tiles, total_count = await fetch_collections_items(
-        manager, collection, limit, offset, **filters
+    tiles, total_count, next_cursor, prev_cursor = await fetch_collections_items(
+        manager, collection, limit, offset, cursor, **filters
     )
 
     sizes, colors, producers = await build_data_for_filters(
-        manager, collection=collection, category=category
+        manager, collection=collection, category=category, filters=filters
     )
     main_images = build_main_images(tiles)
     product_manager = ProductImagesManager()
@@ -108,6 +110,8 @@ async def get_catalog_tiles_page(
             "path_to_catalog": path_to_catalog,
             "total_pages": total_pages,
             "total_count": total_count,
+            "next_cursor": next_cursor,
+            "prev_cursor": prev_cursor,
             "main_images": main_images,
             "categories": categories,
             "producers": producers,
@@ -3,23 +3,24 @@ from typing import Annotated
 
 from fastapi import APIRouter, Depends, Request
 from fastapi.responses import RedirectResponse
-from fastapi.templating import Jinja2Templates
 
+from api.templating import templates
 from infrastructure.crud import Crud, get_db_manager
 from infrastructure.images import SlideImagesManager
+from infrastructure.page_cache import cached_page
+from services.slides import get_slides_paths
 from services.views import get_categories_for_items
 
 router = APIRouter()
-templates = Jinja2Templates("templates")
 dbManagerDep = Annotated[Crud, Depends(get_db_manager)]
 
 log = logging.getLogger(__name__)
 
 
 @router.get("/")
+@cached_page()
 async def get_main_page(request: Request, manager: dbManagerDep):
-    slide_manager = SlideImagesManager()
-    slide_images = slide_manager.get_all_slides_paths
+    slide_images = await get_slides_paths(manager, SlideImagesManager())
     categories = await get_categories_for_items(manager)
     return templates.TemplateResponse(
         "home.html",
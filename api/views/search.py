@@ -0,0 +1,51 @@
+import logging
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Query, Request
+
+from api.templating import templates
+from core.config import ITEMS_PER_PAGE
+from domain import map_to_tile_domain
+from infrastructure.crud import Crud, get_db_manager
+from infrastructure.images import ProductImagesManager
+from services.views import (build_main_images, get_categories_for_items,
+                            search_items)
+
+router = APIRouter(tags=["presentation"], prefix="/search")
+dbManagerDep = Annotated[Crud, Depends(get_db_manager)]
+log = logging.getLogger(__name__)
+
+
+# без cached_page: произвольные запросы вытесняли бы из кэша страницы каталога
+@router.get("")
+async def get_search_page(
+    request: Request,
+    manager: dbManagerDep,
+    q: str = "",
+    page: Annotated[int, Query(ge=1)] = 1,
+):
+    limit = ITEMS_PER_PAGE
+    tiles, total_count, page = await search_items(manager, q, limit, page)
+    main_images = build_main_images(tiles)
+    product_manager = ProductImagesManager()
+    for k in main_images:
+        main_images[k] = product_manager.get_product_catalog_image_path(main_images[k])
+
+    tiles = [map_to_tile_domain(**tile) for tile in tiles]
+    total_pages = max((total_count + limit - 1) // limit, 1)
+    categories = await get_categories_for_items(manager)
+
+    return templates.TemplateResponse(
+        "search.html",
+        {
+            "request": request,
+            "query": q.strip(),
+            "tiles": tiles,
+            "page": page,
+            "total_pages": total_pages,
+            "total_count": total_count,
+            "main_images": main_images,
+            "categories": categories,
+            "category_slugs": {c["name"]: c["slug"] for c in categories},
+        },
+    )
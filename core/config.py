@@ -2,8 +2,60 @@ import json
 
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+TEMPLATES_DIR = "templates"
+TEMPLATE_FRAGMENT_CACHE = True  # общие для всех страниц фрагменты рендерятся один раз
+STREAM_CHUNK_SIZE = 16 * 1024  # байт HTML в одном куске потоковой страницы
 COLLECTIONS_PER_PAGE = 20
 ITEMS_PER_PAGE = 20
+DB_INT_MAX = 2**31 - 1  # предел integer-колонок Postgres, в том числе id
+SEARCH_CONFIG = "russian"  # конфигурация полнотекстового поиска Postgres, как в триггере каталога
+SEARCH_MAX_QUERY_LENGTH = 100  # символов поисковой строки, остальное отбрасывается
+ADMIN_TILES_PER_PAGE = 50
+ADMIN_TILES_MAX_PER_PAGE = 200
+REFERENCE_CACHE_TTL = 300  # секунд
+REFERENCE_CACHE_MAX_ENTRIES = 1024  # разных чтений справочников в памяти процесса
+PAGE_CACHE_TTL = 600  # секунд
+PAGE_CACHE_MAX_ENTRIES = 1000
+PAGE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+FILE_INDEX_TTL = 60  # секунд между фоновыми пересканированиями каталогов изображений
+FILE_TEMP_MAX_AGE = 3600  # секунд, после которых временный файл оборванной записи удаляется
+FILE_WRITE_ATOMIC = True  # запись через временный файл и переименование
+FILE_WRITE_FSYNC = False  # fsync файла и его каталога при каждой записи
+# варианты изображений по целям image_worker: базовый размер и ширины для srcset;
+# вариант базовой ширины называется как цель, остальные — "<цель>@<ширина>"
+IMAGE_PRESETS = {
+    "products": {  # каталог товаров
+        "size": (640, 400),
+        "mode": "cover",
+        "widths": (320, 640, 960),
+    },
+    "collections": {  # карточки коллекций
+        "size": (960, 480),
+        "mode": "cover",
+        "widths": (480, 960, 1440),
+    },
+    "details": {  # детальная картинка
+        "size": (2400, None),
+        "mode": "fit",
+        "widths": (640, 1280, 1920, 2400),
+    },
+    "slides": {
+        "size": (1100, 825),
+        "mode": "cover",
+        "widths": (550, 1100, 1650),
+    },
+}
+# форматы, которые image_worker кладёт рядом с JPEG-вариантом, по убыванию предпочтения
+IMAGE_VARIANT_FORMATS = {"avif": "image/avif", "webp": "image/webp"}
+# секунд ожидания ответа image_worker: крупный оригинал со всеми ступенями и форматами
+# кодируется несколько секунд даже в пуле процессов, умолчание httpx (5 с) мало
+IMAGE_SERVICE_TIMEOUT = 60
+IMAGE_SERVICE_CONNECT_TIMEOUT = 5
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # байт за одно чтение загружаемого файла
+IMAGE_UPLOAD_CONCURRENCY = 4  # изображений товара обрабатывается одновременно
+IMAGE_JOB_LEASE = 300  # секунд на задачу, потом её может взять другой обработчик
+IMAGE_JOB_MAX_ATTEMPTS = 3
+IMAGE_JOB_POLL_INTERVAL = 2  # секунд между опросами пустой очереди
 
 
 class Settings(BaseSettings):
@@ -22,6 +74,11 @@ class Settings(BaseSettings):
     initial_admins: str
     pepper: str
     cookie_secret: str
+    page_cache_dir: str | None = None
+    content_addressed_images: bool = False
+    templates_auto_reload: bool = False  # только для разработки
+    templates_cache_dir: str | None = None
+    stream_html: bool = False  # страница админки отдаётся потоком, начало уходит до конца рендера
 
     @property
     def db_url(self):
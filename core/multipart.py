@@ -0,0 +1,55 @@
+import re
+import uuid
+from collections.abc import Iterable, Iterator
+
+# бинарный обмен изображениями между сайтом и image_worker без base64:
+# одна часть multipart/mixed на каждую цель генерации
+
+_NAME_RE = re.compile(rb'name="([^"]+)"')
+
+
+def new_boundary() -> str:
+    return uuid.uuid4().hex
+
+
+def multipart_content_type(boundary: str) -> str:
+    return f"multipart/mixed; boundary={boundary}"
+
+
+def encode_part(
+    boundary: str, name: str, data: bytes, content_type: str = "image/jpeg"
+) -> bytes:
+    headers = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{name}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    )
+    return headers.encode() + data + b"\r\n"
+
+
+def encode_end(boundary: str) -> bytes:
+    return f"--{boundary}--\r\n".encode()
+
+
+def encode_parts(boundary: str, parts: Iterable[tuple[str, bytes]]) -> Iterator[bytes]:
+    for name, data in parts:
+        yield encode_part(boundary, name, data)
+    yield encode_end(boundary)
+
+
+def decode_parts(body: bytes, content_type: str) -> dict[str, bytes]:
+    _, sep, boundary = content_type.partition("boundary=")
+    if not sep or not boundary:
+        raise ValueError(f"Нет boundary в Content-Type: {content_type}")
+    delimiter = b"--" + boundary.strip('"').encode()
+    chunks = body.split(delimiter)
+    if len(chunks) < 2 or not chunks[-1].startswith(b"--"):
+        raise ValueError("Ответ multipart оборван")
+    parts = {}
+    for chunk in chunks[1:-1]:
+        headers, sep, data = chunk.removeprefix(b"\r\n").partition(b"\r\n\r\n")
+        name = _NAME_RE.search(headers)
+        if not sep or name is None or not data.endswith(b"\r\n"):
+            raise ValueError("Повреждённая часть multipart")
+        parts[name.group(1).decode()] = data[:-2]
+    return parts
@@ -1,13 +1,17 @@
+from datetime import datetime
 from decimal import Decimal
 
-from sqlalchemy import (ForeignKey, ForeignKeyConstraint, UniqueConstraint,
-                        inspect)
+from sqlalchemy import (DateTime, ForeignKey, ForeignKeyConstraint, Index,
+                        UniqueConstraint, func, inspect, text)
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.ext.asyncio import AsyncAttrs
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from sqlalchemy.types import DECIMAL
 
 from core import conf
 
+# позиция главного изображения товара, остальные позиции — галерея
+MAIN_IMAGE_POSITION = 0
 
 class Base(AsyncAttrs, DeclarativeBase):
     pass
@@ -27,6 +31,15 @@ class Catalog(Base):
     producer_name: Mapped[str] = mapped_column(ForeignKey("producers.name"))
     category_name: Mapped[str] = mapped_column(ForeignKey("categories.name"))
     boxes_count: Mapped[int]
+    collection_id: Mapped[int | None] = mapped_column(
+        ForeignKey("collections.id", ondelete="SET NULL"), nullable=True, index=True
+    )
+    # поисковый документ: заполняет триггер catalog_search_document (миграция f3b9d2c6a8e1)
+    # из названия, коллекции, производителя, цвета и категории; обычные чтения его не грузят
+    search_vector: Mapped[str | None] = mapped_column(
+        TSVECTOR, nullable=True, deferred=True
+    )
+    search_text: Mapped[str | None] = mapped_column(nullable=True, deferred=True)
 
     color: Mapped["TileColor"] = relationship("TileColor", back_populates="tiles")
     size: Mapped["TileSize"] = relationship("TileSize", back_populates="tiles")
@@ -38,14 +51,31 @@ class Catalog(Base):
         back_populates="tile",
         cascade="all, delete-orphan",
         passive_deletes=True,
+        order_by="TileImages.position",
     )
     category: Mapped["Categories"] = relationship("Categories", back_populates="tiles")
+    collection: Mapped["Collections"] = relationship(
+        "Collections", back_populates="tiles"
+    )
 
     __table_args__ = (
         ForeignKeyConstraint(
             ["color_name", "feature_name"],
             ["tile_colors.color_name", "tile_colors.feature_name"],
         ),
+        # листинг каталога: фильтр по категории и фильтрам панели, порядок по id
+        Index("ix_catalog_category_name_id", "category_name", "id"),
+        Index("ix_catalog_category_name_producer_name_id", "category_name", "producer_name", "id"),
+        Index("ix_catalog_category_name_color_name_id", "category_name", "color_name", "id"),
+        Index("ix_catalog_category_name_size_id_id", "category_name", "size_id", "id"),
+        # полнотекстовый поиск и триграммы для запросов с опечатками
+        Index("ix_catalog_search_vector", "search_vector", postgresql_using="gin"),
+        Index(
+            "ix_catalog_search_text_trgm",
+            "search_text",
+            postgresql_using="gin",
+            postgresql_ops={"search_text": "gin_trgm_ops"},
+        ),
     )
 
     def model_dump(self) -> dict:
@@ -71,6 +101,7 @@ class Catalog(Base):
             "boxes_count": self.boxes_count,
             "category_name": self.category_name,
             "size_id": self.size_id,
+            "collection_id": self.collection_id,
         }
 
 
@@ -93,15 +124,29 @@ class Categories(Base):
 class TileImages(Base):
     __tablename__ = "tile_images"
     image_id: Mapped[int] = mapped_column(primary_key=True)
-    tile_id: Mapped[int] = mapped_column(ForeignKey("catalog.id", ondelete="CASCADE"))
+    tile_id: Mapped[int] = mapped_column(
+        ForeignKey("catalog.id", ondelete="CASCADE"), index=True
+    )
     image_path: Mapped[str] = mapped_column(default=conf.image_path)
+    position: Mapped[int] = mapped_column(default=0, server_default="0")
     tile: Mapped["Catalog"] = relationship("Catalog", back_populates="images")
 
+    __table_args__ = (
+        # листинг каталога читает только главное изображение товара
+        Index(
+            "ix_tile_images_main",
+            "tile_id",
+            unique=True,
+            postgresql_where=text(f"position = {MAIN_IMAGE_POSITION}"),
+        ),
+    )
+
     def model_dump(self) -> dict:
         return {
             "image_id": self.image_id,
             "tile_id": self.tile_id,
             "image_path": self.image_path,
+            "position": self.position,
         }
 
 
@@ -110,13 +155,17 @@ class Collections(Base):
     id: Mapped[int] = mapped_column(primary_key=True)
     # name: Mapped[str] = mapped_column(primary_key=True)
     name: Mapped[str] = mapped_column(unique=True)
-    image_path: Mapped[str] = mapped_column(unique=True, nullable=True)
+    # не уникален: при адресации по содержимому коллекции делят одно изображение
+    image_path: Mapped[str] = mapped_column(nullable=True, index=True)
     categories: Mapped[list["CollectionCategory"]] = relationship(
         "CollectionCategory",
         back_populates="collection",
         cascade="all, delete-orphan",
         passive_deletes=True,
     )
+    tiles: Mapped[list["Catalog"]] = relationship(
+        "Catalog", back_populates="collection", passive_deletes=True
+    )
 
     def model_dump(self) -> dict:
         return {"id": self.id, "name": self.name, "image_path": self.image_path}
@@ -128,7 +177,7 @@ class CollectionCategory(Base):
         ForeignKey("collections.id", ondelete="CASCADE"), primary_key=True
     )
     category_name: Mapped[str] = mapped_column(
-        ForeignKey("categories.name", ondelete="CASCADE"), primary_key=True
+        ForeignKey("categories.name", ondelete="CASCADE"), primary_key=True, index=True
     )
 
     category: Mapped["Categories"] = relationship(
@@ -236,7 +285,61 @@ class Admins(Base):
 class Slug(Base):
     __tablename__ = "slugs"
     name: Mapped[str] = mapped_column(primary_key=True)
-    slug: Mapped[str] = mapped_column(primary_key=True)
+    slug: Mapped[str] = mapped_column(primary_key=True, index=True)
 
     def model_dump(self) -> dict:
         return {"name": self.name, "slug": self.slug}
+
+
+class ImageJobs(Base):
+    # очередь генерации вариантов изображений, см. services.image_jobs
+    __tablename__ = "image_jobs"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    kind: Mapped[str]
+    source_path: Mapped[str]
+    status: Mapped[str] = mapped_column(default="pending")
+    attempts: Mapped[int] = mapped_column(default=0)
+    last_error: Mapped[str | None] = mapped_column(nullable=True)
+    locked_until: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), nullable=True
+    )
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), server_default=func.now()
+    )
+
+    __table_args__ = (
+        # выборка следующей задачи смотрит только на незавершённые
+        Index(
+            "ix_image_jobs_queue",
+            "id",
+            postgresql_where=text("status IN ('pending', 'processing')"),
+        ),
+    )
+
+    def model_dump(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "source_path": self.source_path,
+            "status": self.status,
+            "attempts": self.attempts,
+            "last_error": self.last_error,
+            "locked_until": self.locked_until,
+        }
+
+
+class Slides(Base):
+    # слайды главной страницы: порядок и показ задаются здесь, а не содержимым каталога
+    __tablename__ = "slides"
+    id: Mapped[int] = mapped_column(primary_key=True)
+    image_path: Mapped[str] = mapped_column(nullable=True)
+    position: Mapped[int] = mapped_column(default=0, server_default="0", index=True)
+    active: Mapped[bool] = mapped_column(default=True, server_default=text("true"))
+
+    def model_dump(self) -> dict:
+        return {
+            "id": self.id,
+            "image_path": self.image_path,
+            "position": self.position,
+            "active": self.active,
+        }
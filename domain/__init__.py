@@ -1,3 +1,5 @@
 from .exceptions import *
+from .jobs import *
+from .slides import *
 from .tile import *
 from .user import *
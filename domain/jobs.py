@@ -0,0 +1,9 @@
+class ImageJob:
+    PENDING = "pending"
+    PROCESSING = "processing"
+    DONE = "done"
+    FAILED = "failed"
+
+    def __init__(self, kind: str, source_path: str):
+        self.kind = kind
+        self.source_path = source_path
@@ -0,0 +1,5 @@
+class Slide:
+    def __init__(self, image_path: str, position: int = 0, active: bool = True):
+        self.image_path = image_path
+        self.position = position
+        self.active = active
@@ -4,11 +4,19 @@ from slugify import slugify
 
 
 class TileSize:
-    def __init__(self, size_id: int, width: Decimal, length: Decimal, height: Decimal):
+    def __init__(
+        self,
+        size_id: int,
+        width: Decimal,
+        length: Decimal,
+        height: Decimal,
+        count: int | None = None,
+    ):
         self.id = size_id
         self.height = height
         self.width = width
         self.length = length
+        self.count = count
 
     def __str__(self):
         return f"{self.format_decimal(self.length)}×{self.format_decimal(self.width)}×{self.format_decimal(self.height)}"
@@ -22,9 +30,10 @@ class TileSize:
 
 
 class TileColor:
-    def __init__(self, color_name: str, feature_name: str = ""):
+    def __init__(self, color_name: str, feature_name: str = "", count: int | None = None):
         self.color_name = color_name
         self.feature_name = feature_name
+        self.count = count
 
     def __str__(self):
         return f"{self.color_name} {self.feature_name}"
@@ -39,8 +48,9 @@ class TileSurface:
 
 
 class Producer:
-    def __init__(self, name: str):
+    def __init__(self, name: str, count: int | None = None):
         self.name = name
+        self.count = count
 
     def __str__(self):
         return f"{self.name}"
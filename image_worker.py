@@ -4,11 +4,15 @@ import logging
 from concurrent.futures import ProcessPoolExecutor
 from io import BytesIO
 
-from fastapi import FastAPI
-from PIL import Image, ImageOps
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from PIL import Image, ImageOps, features
 from pydantic import BaseModel
 
+from core.config import IMAGE_PRESETS
 from core.logger import setup_logging
+from core.multipart import (encode_end, encode_part, multipart_content_type,
+                            new_boundary)
 
 
 setup_logging()
@@ -22,11 +26,20 @@ MAX_RETRIES = 3
 
 executor = ProcessPoolExecutor(max_workers=NUM_WORKERS)
 
-IMAGE_PRESETS = {
-    "products": {"size": (640, 400), "mode": "cover"},  # каталог товаров
-    "collections": {"size": (960, 480), "mode": "cover"},  # карточки коллекций
-    "details": {"size": (2400, None), "mode": "fit"},  # детальная картинка
-    "slides": {"size": (1100, 825), "mode": "cover"},
+# форматы каждого варианта: JPEG понимают все браузеры, WebP/AVIF легче и
+# отдаются через <picture>; вариант в JPEG называется по цели ("products"),
+# остальные — с расширением формата ("products.webp")
+IMAGE_FORMATS = {
+    "JPEG": {"quality": 82, "optimize": True, "progressive": True},
+    "WEBP": {"quality": 80, "method": 4},
+}
+if features.check("avif"):
+    IMAGE_FORMATS["AVIF"] = {"quality": 60, "speed": 6}
+
+IMAGE_MEDIA_TYPES = {
+    "JPEG": "image/jpeg",
+    "WEBP": "image/webp",
+    "AVIF": "image/avif",
 }
 
 
@@ -50,58 +63,147 @@ def resize_image(
     raise ValueError(f"Unknown resize mode: {mode}")
 
 
-def image_to_bytes(
-    img: Image.Image,
-    img_format: str = "JPEG",
-    quality: int = 82,
-) -> bytes:
+def image_to_bytes(img: Image.Image, img_format: str = "JPEG") -> bytes:
     buf = BytesIO()
-    img.save(
-        buf,
-        format=img_format,
-        quality=quality,
-        optimize=True,
-        progressive=True,
-    )
+    img.save(buf, format=img_format, **IMAGE_FORMATS[img_format])
     return buf.getvalue()
 
 
-def generate_image_variant(image_bytes: bytes, target: str):
+def variant_name(target: str, img_format: str, width: int | None = None) -> str:
+    name = target if width is None else f"{target}@{width}"
+    return name if img_format == "JPEG" else f"{name}.{img_format.lower()}"
+
+
+def variant_media_type(variant: str) -> str:
+    # формат варианта — по расширению имени, без расширения это JPEG
+    _, sep, extension = variant.rpartition(".")
+    return IMAGE_MEDIA_TYPES[extension.upper() if sep else "JPEG"]
+
+
+def fit_target_size(img: Image.Image, target: str) -> tuple[int, int] | None:
     """
-    Генерирует вариант изображения для сайта.
+    Итоговый размер цели для изображения или None, если изображение меньше
+    цели и сохраняется в исходном размере (защита от апскейла).
+    """
+    width, height = IMAGE_PRESETS[target]["size"]
+    smaller_width = width is not None and img.width < width
+    smaller_height = height is not None and img.height < height
+    if smaller_width or smaller_height:
+        log.warning(
+            "Image smaller than target (%s < %s), saving original size",
+            img.size,
+            (width, height),
+        )
+        return None
+    return (
+        width if width is not None else img.width,
+        height if height is not None else img.height,
+    )
+
+
+def ladder_sizes(
+    img: Image.Image, target: str, target_size: tuple[int, int] | None
+) -> dict[int | None, tuple[int, int] | None]:
+    # базовый размер цели (ключ None) и ступени ширины для srcset, без апскейла
+    sizes: dict[int | None, tuple[int, int] | None] = {None: target_size}
+    if target_size is None:
+        return sizes
+    base_width, base_height = target_size
+    for width in IMAGE_PRESETS[target]["widths"]:
+        height = round(base_height * width / base_width)
+        if width == base_width or width > img.width or height > img.height:
+            continue
+        sizes[width] = (width, height)
+    return sizes
+
+
+def required_size(targets, size: tuple[int, int]) -> tuple[int, int]:
+    # наименьший размер, из которого ещё получаются все цели и ступени без потери качества
+    widths, heights = [], []
+    for target in targets:
+        preset = IMAGE_PRESETS[target]
+        width, height = preset["size"]
+        max_width = max(preset["widths"], default=width)
+        widths.append(max(width, max_width))
+        heights.append(round(height * max_width / width) if height is not None else 1)
+    return min(max(widths), size[0]), min(max(heights), size[1])
+
+
+def decode_image(image_bytes: bytes, targets) -> Image.Image:
+    with Image.open(BytesIO(image_bytes)) as src:
+        req_width, req_height = required_size(targets, src.size)
+        # JPEG уменьшается в 2/4/8 раз прямо при декодировании, не меньше требуемого размера
+        if src.format == "JPEG":
+            src.draft("RGB", (req_width, req_height))
+        img = src.convert("RGB")
+    # остальные форматы быстро сжимаются целым множителем, оставляя запас x2 для LANCZOS
+    factor = min(img.width // req_width, img.height // req_height) // 2
+    if factor >= 2:
+        img = img.reduce(factor)
+    return img
+
+
+def resize_image_variants(
+    image_bytes: bytes, targets
+) -> dict[tuple[str, int | None], Image.Image]:
+    """
+    Декодирует изображение один раз и уменьшает его до всех ступеней целей.
 
     - сохраняет пропорции
     - не апскейлит маленькие изображения
-    - идемпотентна
     """
 
-    if target not in IMAGE_PRESETS:
-        raise ValueError(f"Unknown image preset: {target}")
-
-    preset = IMAGE_PRESETS[target]
-    width, height = preset["size"]
-    mode = preset["mode"]
-    with Image.open(BytesIO(image_bytes)) as img:
-        img = img.convert("RGB")
-        smaller_width = width is not None and img.width < width
-        smaller_height = height is not None and img.height < height
-        # защита от апскейла
-        if smaller_width or smaller_height:
-            log.warning(
-                "Image smaller than target (%s < %s), saving original size",
-                img.size,
-                (width, height),
-            )
-            resized = img
-        else:
-            target_size = (
-                width if width is not None else img.width,
-                height if height is not None else img.height,
-            )
-            resized = resize_image(img, target_size, mode)
-        bytes_img = image_to_bytes(resized)
-
-        return bytes_img
+    for target in targets:
+        if target not in IMAGE_PRESETS:
+            raise ValueError(f"Unknown image preset: {target}")
+
+    resized = {}
+    img = decode_image(image_bytes, targets)
+    for target in targets:
+        mode = IMAGE_PRESETS[target]["mode"]
+        target_size = fit_target_size(img, target)
+        for width, size in ladder_sizes(img, target, target_size).items():
+            if size is None:
+                resized[target, width] = img
+            else:
+                # fit уменьшает изображение на месте, остальным вариантам нужен исходник
+                source = img.copy() if mode == "fit" else img
+                resized[target, width] = resize_image(source, size, mode)
+    return resized
+
+
+def generate_image_variants(image_bytes: bytes, targets) -> dict[str, bytes]:
+    """
+    Генерирует варианты изображения для сайта по всем целям за одно декодирование.
+    Идемпотентна.
+    """
+    return {
+        variant_name(target, img_format, width): image_to_bytes(img, img_format)
+        for (target, width), img in resize_image_variants(image_bytes, targets).items()
+        for img_format in IMAGE_FORMATS
+    }
+
+
+async def generate_image_variants_parallel(image_bytes: bytes, targets) -> dict[str, bytes]:
+    # одно декодирование и уменьшение, затем каждая пара ступень/формат
+    # кодируется в своём процессе пула: AVIF и WebP крупных ступеней — самое долгое
+    loop = asyncio.get_running_loop()
+    resized = await loop.run_in_executor(
+        executor, resize_image_variants, image_bytes, tuple(targets)
+    )
+    jobs = {
+        variant_name(target, img_format, width): loop.run_in_executor(
+            executor, image_to_bytes, img, img_format
+        )
+        for (target, width), img in resized.items()
+        for img_format in IMAGE_FORMATS
+    }
+    return dict(zip(jobs, await asyncio.gather(*jobs.values())))
+
+
+def generate_image_variant(image_bytes: bytes, target: str):
+    # только JPEG-вариант цели
+    return generate_image_variants(image_bytes, (target,))[target]
 
 
 class ImageWithTarget(BaseModel):
@@ -112,14 +214,27 @@ class ImageWithTarget(BaseModel):
 @app.post("/generate-images")
 async def generate_image(image_data: ImageWithTarget):
     data = base64.b64decode(image_data.data)
-    loop = asyncio.get_running_loop()
-    images = {}
-    for target in image_data.targets:
-        image = await loop.run_in_executor(
-            executor,
-            generate_image_variant,
-            data,
-            target,
-        )
-        images[target] = base64.b64encode(image).decode("utf-8")
-    return images
+    images = await generate_image_variants_parallel(data, image_data.targets)
+    return {
+        target: base64.b64encode(image).decode("utf-8")
+        for target, image in images.items()
+    }
+
+
+@app.post("/generate-images/binary")
+async def generate_image_binary(request: Request, targets: list[str] = Query()):
+    # тело запроса — исходное изображение как есть, ответ — multipart/mixed,
+    # по одной части на цель
+    unknown = [target for target in targets if target not in IMAGE_PRESETS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown image preset: {unknown}")
+    data = await request.body()
+    boundary = new_boundary()
+
+    async def parts():
+        images = await generate_image_variants_parallel(data, targets)
+        for target, image in images.items():
+            yield encode_part(boundary, target, image, variant_media_type(target))
+        yield encode_end(boundary)
+
+    return StreamingResponse(parts(), media_type=multipart_content_type(boundary))
@@ -0,0 +1,51 @@
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from typing import Any
+
+
+class TTLCache:
+    # записи в порядке записи: срок у всех одинаковый, поэтому истёкшие и самые старые
+    # всегда в начале и вытесняются при записи без обхода всего кэша
+    def __init__(
+        self,
+        ttl: float,
+        clock: Callable[[], float] = time.monotonic,
+        max_entries: int | None = None,
+    ):
+        self._ttl = ttl
+        self._clock = clock
+        self._max_entries = max_entries
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+
+    def get(self, key: Hashable, default=None):
+        item = self._data.get(key)
+        if item is None:
+            return default
+        expires_at, value = item
+        if expires_at <= self._clock():
+            del self._data[key]
+            return default
+        return value
+
+    def set(self, key: Hashable, value):
+        now = self._clock()
+        self._data[key] = (now + self._ttl, value)
+        self._data.move_to_end(key)
+        while self._data:
+            oldest_key, (expires_at, _) = next(iter(self._data.items()))
+            if expires_at > now and (
+                self._max_entries is None or len(self._data) <= self._max_entries
+            ):
+                break
+            del self._data[oldest_key]
+
+    def invalidate(self, predicate: Callable[[Hashable], bool] | None = None):
+        if predicate is None:
+            self._data.clear()
+            return
+        for key in [key for key in self._data if predicate(key)]:
+            del self._data[key]
+
+    def __len__(self):
+        return len(self._data)
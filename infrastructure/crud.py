@@ -1,18 +1,26 @@
 import logging
-from collections.abc import Collection
+import re
+from collections.abc import Collection, Sequence
+from datetime import timedelta
 from typing import Any
 
-from sqlalchemy import delete, select, update
+from sqlalchemy import (and_, delete, false, func, literal, null, or_, select,
+                        tuple_, union_all, update)
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import selectinload, joinedload
 
 import domain
 from core import conf
+from core.config import (DB_INT_MAX, IMAGE_JOB_MAX_ATTEMPTS,
+                         REFERENCE_CACHE_MAX_ENTRIES, REFERENCE_CACHE_TTL,
+                         SEARCH_CONFIG)
 from db import models
 from domain.exceptions import (AlreadyExistsError, ForeignKeyViolationError,
                                NotFoundError)
 
+from .cache import TTLCache
+
 log = logging.getLogger(__name__)
 
 
@@ -45,6 +53,55 @@ class Crud:
     def register(self, domain_cls, orm_cls):
         self._mapper[domain_cls] = orm_cls
 
+    def invalidate(self, *domain_models):
+        # без кэша сбрасывать нечего, см. CachedCrud
+        pass
+
+    @staticmethod
+    def _conditions(model, filters: dict) -> list:
+        conditions = []
+        for field, value in filters.items():
+            attr = getattr(model, field)
+            if isinstance(value, Collection) and not isinstance(value, str):
+                conditions.append(attr.in_(value))
+            else:
+                conditions.append(attr == value)
+        return conditions
+
+    @staticmethod
+    def _search_condition(model, fields: Sequence[str], term: str):
+        # подстрока без учёта регистра в текстовых полях, точное совпадение в числовых
+        escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        pattern = f"%{escaped}%"
+        conditions = []
+        for field in fields:
+            column = getattr(model, field)
+            if column.type.python_type is int:
+                # только ASCII-цифры в пределах integer: "²" или длинное число не доходят до базы
+                if term.isascii() and term.isdecimal() and int(term) <= DB_INT_MAX:
+                    conditions.append(column == int(term))
+            else:
+                conditions.append(column.ilike(pattern))
+        return or_(*conditions) if conditions else false()
+
+    @staticmethod
+    def _resolve_column(model, path: str):
+        # "size.length" -> колонка связанной модели и связь, по которой нужен join
+        if "." not in path:
+            return getattr(model, path), None
+        relation_name, column_name = path.split(".", 1)
+        relation = getattr(model, relation_name)
+        return getattr(relation.property.mapper.class_, column_name), relation
+
+    @staticmethod
+    def _order_columns(model, order_by: str | None) -> list:
+        # первичный ключ добавляется в конец, чтобы порядок был однозначным
+        columns = [getattr(model, order_by)] if order_by else []
+        for pk_column in model.__mapper__.primary_key:
+            if pk_column.key not in {column.key for column in columns}:
+                columns.append(getattr(model, pk_column.key))
+        return columns
+
     async def create(
         self, domain_model, seq_data: list | None = None, session=None, **kwargs
     ) -> tuple[dict, ...] | dict:
@@ -102,11 +159,9 @@ class Crud:
             log.debug("%s filter for delete: %s", domain_model, filters)
             model = self._mapper[domain_model]
 
-            conditions = [
-                getattr(model, field) == value for field, value in filters.items()
-            ]
-
-            delete_query = delete(model).where(*conditions).returning(model)
+            delete_query = (
+                delete(model).where(*self._conditions(model, filters)).returning(model)
+            )
 
             result = await cur_session.execute(delete_query)
             deleted_records = result.scalars()
@@ -134,11 +189,7 @@ class Crud:
         async def _update_internal(cur_session):
             model = self._mapper[domain_model]
             query = update(model)
-
-            conditions = [
-                getattr(model, field) == value for field, value in filters.items()
-            ]
-            query = query.where(*conditions)
+            query = query.where(*self._conditions(model, filters))
 
             query = query.values(**values)
 
@@ -151,22 +202,39 @@ class Crud:
                 return await _update_internal(session)
 
 
-    async def read(
+    def build_read_query(
         self,
         domain_model,
         *,
-        session=None,
         loaded=None,
         limit: int | None = None,
         offset: int | None = None,
         order_by: str | None = None,
         distinct: str | None = None,
+        seek: Sequence | None = None,
+        backward: bool = False,
+        columns: Sequence[str] | None = None,
+        search: tuple[Sequence[str], str] | None = None,
         **filters
-    ) -> tuple[dict, ...]:
-
-        async def _read_internal(cur_session):
-            model = self._mapper[domain_model]
+    ):
+        # seek - значения (order_by, *первичный ключ) последней прочитанной записи,
+        # backward - читать записи перед ней
+        # columns - выбрать только эти колонки, в том числе связанные вида "size.length"
+        # search - (поля, строка): запись подходит, если строка найдена хотя бы в одном поле
+        model = self._mapper[domain_model]
 
+        if columns:
+            resolved = [self._resolve_column(model, path) for path in columns]
+            query = select(
+                *(
+                    column.label(path.replace(".", "_"))
+                    for path, (column, _) in zip(columns, resolved)
+                )
+            ).select_from(model)
+            relations = {rel.key: rel for _, rel in resolved if rel is not None}
+            for relation in relations.values():
+                query = query.outerjoin(relation)
+        else:
             options = []
 
             if loaded:
@@ -180,29 +248,72 @@ class Crud:
             if options:
                 query = query.options(*options)
 
-            conditions = []
-            for field, value in filters.items():
-                attr = getattr(model, field)
-                if isinstance(value, Collection) and not isinstance(value, str):
-                    conditions.append(attr.in_(value))
-                else:
-                    conditions.append(attr == value)
+        query = query.where(*self._conditions(model, filters))
+        if search and search[1]:
+            query = query.where(self._search_condition(model, *search))
 
-            query = query.where(*conditions)
+        if distinct:
+            query = query.distinct(getattr(model, distinct))
 
-            if distinct:
-                query = query.distinct(getattr(model, distinct))
+        if order_by or seek is not None:
+            order_columns = self._order_columns(model, order_by)
+            if seek is not None:
+                key = tuple_(*order_columns)
+                query = query.where(key < tuple(seek) if backward else key > tuple(seek))
+            query = query.order_by(
+                *(column.desc() if backward else column for column in order_columns)
+            )
 
-            if order_by:
-                query = query.order_by(getattr(model, order_by))
+        if offset:
+            query = query.offset(offset)
 
-            if offset:
-                query = query.offset(offset)
+        if limit:
+            query = query.limit(limit)
+        return query
 
-            if limit:
-                query = query.limit(limit)
-            result = (await cur_session.execute(query)).scalars()
-            return tuple(r.model_dump() for r in result)
+    async def read(
+        self,
+        domain_model,
+        *,
+        session=None,
+        loaded=None,
+        limit: int | None = None,
+        offset: int | None = None,
+        order_by: str | None = None,
+        distinct: str | None = None,
+        seek: Sequence | None = None,
+        backward: bool = False,
+        columns: Sequence[str] | None = None,
+        as_dict: bool = False,
+        search: tuple[Sequence[str], str] | None = None,
+        **filters
+    ) -> tuple:
+        # с columns возвращаются строки Row без ORM-объектов,
+        # as_dict - словари с ключами как в model_dump ("size.length" -> "size_length")
+
+        async def _read_internal(cur_session):
+            query = self.build_read_query(
+                domain_model,
+                loaded=loaded,
+                limit=limit,
+                offset=offset,
+                order_by=order_by,
+                distinct=distinct,
+                seek=seek,
+                backward=backward,
+                columns=columns,
+                search=search,
+                **filters
+            )
+            result = await cur_session.execute(query)
+            if not columns:
+                rows = tuple(r.model_dump() for r in result.scalars())
+            elif as_dict:
+                rows = tuple(dict(r) for r in result.mappings())
+            else:
+                rows = tuple(result.all())
+            # при чтении назад порядок возвращается к прямому
+            return rows[::-1] if backward else rows
 
         if session is not None:
             return await _read_internal(session)
@@ -210,12 +321,320 @@ class Crud:
             async with self.session_factory.begin() as session:
                 return await _read_internal(session)
 
+    async def count(
+        self,
+        domain_model,
+        *,
+        session=None,
+        search: tuple[Sequence[str], str] | None = None,
+        **filters
+    ) -> int:
+
+        async def _count_internal(cur_session) -> int:
+            model = self._mapper[domain_model]
+            query = (
+                select(func.count())
+                .select_from(model)
+                .where(*self._conditions(model, filters))
+            )
+            if search and search[1]:
+                query = query.where(self._search_condition(model, *search))
+            return (await cur_session.execute(query)).scalar_one()
+
+        if session is not None:
+            return await _count_internal(session)
+        else:
+            async with self.session_factory.begin() as session:
+                return await _count_internal(session)
+
+    async def main_images(
+        self, tiles_ids: Collection[int], *, session=None
+    ) -> dict[int, str]:
+        # только главное изображение каждого товара, без остальной галереи
+
+        async def _main_images_internal(cur_session) -> dict[int, str]:
+            model = self._mapper[domain.TileImages]
+            query = select(model.tile_id, model.image_path).where(
+                model.tile_id.in_(tiles_ids),
+                model.position == models.MAIN_IMAGE_POSITION,
+            )
+            return dict((await cur_session.execute(query)).all())
+
+        if session is not None:
+            return await _main_images_internal(session)
+        else:
+            async with self.session_factory.begin() as session:
+                return await _main_images_internal(session)
+
+    async def collection_id_by_name(self, name: str, *, session=None) -> int | None:
+        # имя коллекции сравнивается без учёта регистра, как слово в кавычках в названии товара
+
+        async def _collection_id_internal(cur_session) -> int | None:
+            model = self._mapper[domain.Collections]
+            query = select(model.id).where(func.lower(model.name) == name.lower()).limit(1)
+            return (await cur_session.execute(query)).scalar_one_or_none()
+
+        if session is not None:
+            return await _collection_id_internal(session)
+        else:
+            async with self.session_factory.begin() as session:
+                return await _collection_id_internal(session)
+
+    async def link_tiles_to_collection(
+        self, collection_id: int, name: str, *, session=None
+    ) -> list[int]:
+        # товары с названием коллекции в кавычках одним UPDATE, то же выражение,
+        # что и в миграции 3b7e1c9a4d20 (services.views.extract_quoted_word)
+
+        async def _link_internal(cur_session) -> list[int]:
+            model = self._mapper[domain.Tile]
+            query = (
+                update(model)
+                .where(
+                    model.name.like('%"%"%'),
+                    func.lower(func.split_part(model.name, '"', 2)) == name.lower(),
+                )
+                .values(collection_id=collection_id)
+                .returning(model.id)
+                .execution_options(synchronize_session=False)
+            )
+            return list((await cur_session.execute(query)).scalars())
+
+        if session is not None:
+            return await _link_internal(session)
+        else:
+            async with self.session_factory.begin() as session:
+                return await _link_internal(session)
+
+    @staticmethod
+    def _prefix_tsquery(term: str) -> str:
+        # каждое слово запроса ищется как префикс: "керам плит" -> "керам:* & плит:*";
+        # в строке остаются только буквы и цифры, синтаксис tsquery из запроса не проходит
+        return " & ".join(f"{word}:*" for word in re.findall(r"\w+", term))
+
+    async def search_tiles(
+        self,
+        term: str,
+        *,
+        columns: Sequence[str],
+        limit: int,
+        offset: int = 0,
+        session=None,
+    ) -> tuple[tuple[dict, ...], int]:
+        # полнотекстовый поиск по документу товара с сортировкой по релевантности;
+        # если слова не нашлись (опечатка), поиск по триграммам того же документа.
+        # возвращает страницу товаров и общее число найденных; offset за концом выдачи
+        # даёт последнюю страницу
+
+        async def _search_internal(cur_session) -> tuple[tuple[dict, ...], int]:
+            model = self._mapper[domain.Tile]
+
+            async def _count(condition) -> int:
+                query = select(func.count()).select_from(model).where(condition)
+                return (await cur_session.execute(query)).scalar_one()
+
+            prefix_query = self._prefix_tsquery(term)
+            total = 0
+            if prefix_query:
+                ts_query = func.to_tsquery(SEARCH_CONFIG, prefix_query)
+                condition = model.search_vector.op("@@")(ts_query)
+                rank = func.ts_rank_cd(model.search_vector, ts_query)
+                total = await _count(condition)
+            if not total:
+                text_term = term.lower()
+                condition = literal(text_term).op("<%")(model.search_text)
+                rank = func.word_similarity(text_term, model.search_text)
+                total = await _count(condition)
+            if not total:
+                return (), 0
+            # страница за концом выдачи заменяется последней: OFFSET не выходит за bigint
+            page_offset = min(offset, (total - 1) // limit * limit)
+            query = (
+                self.build_read_query(domain.Tile, columns=columns)
+                .where(condition)
+                .order_by(rank.desc(), model.id)
+                .limit(limit)
+                .offset(page_offset)
+            )
+            rows = tuple(dict(r) for r in (await cur_session.execute(query)).mappings())
+            return rows, total
+
+        if session is not None:
+            return await _search_internal(session)
+        else:
+            async with self.session_factory.begin() as session:
+                return await _search_internal(session)
+
+    async def claim_image_job(
+        self,
+        lease: float,
+        *,
+        max_attempts: int = IMAGE_JOB_MAX_ATTEMPTS,
+        session=None,
+    ) -> dict | None:
+        # следующая задача очереди: ожидающая или брошенная обработчиком после истечения аренды;
+        # SKIP LOCKED не даёт двум обработчикам взять одну и ту же задачу
+
+        async def _claim_internal(cur_session) -> dict | None:
+            model = self._mapper[domain.ImageJob]
+            now = func.now()
+            expired = and_(
+                model.status == domain.ImageJob.PROCESSING,
+                model.locked_until < now,
+            )
+            # задача, на которой обработчик падал max_attempts раз (например, изображение
+            # съедает всю память), больше не выдаётся
+            await cur_session.execute(
+                update(model)
+                .where(expired, model.attempts >= max_attempts)
+                .values(
+                    status=domain.ImageJob.FAILED,
+                    last_error="аренда истекла после последней попытки",
+                    locked_until=None,
+                )
+                .execution_options(synchronize_session=False)
+            )
+            available = or_(
+                model.status == domain.ImageJob.PENDING,
+                and_(expired, model.attempts < max_attempts),
+            )
+            next_job = (
+                select(model.id)
+                .where(available)
+                .order_by(model.id)
+                .limit(1)
+                .with_for_update(skip_locked=True)
+                .scalar_subquery()
+            )
+            query = (
+                update(model)
+                .where(model.id == next_job)
+                .values(
+                    status=domain.ImageJob.PROCESSING,
+                    attempts=model.attempts + 1,
+                    locked_until=now + timedelta(seconds=lease),
+                )
+                .returning(model)
+                .execution_options(synchronize_session=False)
+            )
+            job = (await cur_session.execute(query)).scalar_one_or_none()
+            return job.model_dump() if job is not None else None
+
+        if session is not None:
+            return await _claim_internal(session)
+        else:
+            async with self.session_factory.begin() as session:
+                return await _claim_internal(session)
+
+    async def facets(
+        self,
+        domain_model,
+        groups: dict[str, Sequence[str]],
+        *,
+        session=None,
+        **filters
+    ) -> dict[str, tuple[tuple, ...]]:
+        # значения и количество записей по каждой группе колонок одним запросом:
+        # {группа: ((*значения, количество), ...)}
+
+        async def _facets_internal(cur_session) -> dict[str, tuple[tuple, ...]]:
+            model = self._mapper[domain_model]
+            columns = {
+                path: self._resolve_column(model, path)
+                for paths in groups.values()
+                for path in paths
+            }
+            labels = {path: path.replace(".", "_") for path in columns}
+
+            queries = []
+            for name, paths in groups.items():
+                selected = [literal(name).label("facet")]
+                for path, (column, _) in columns.items():
+                    value = column if path in paths else null().cast(column.type)
+                    selected.append(value.label(labels[path]))
+                selected.append(func.count().label("count"))
+
+                query = select(*selected).select_from(model)
+                relations = {
+                    columns[path][1].key: columns[path][1]
+                    for path in paths
+                    if columns[path][1] is not None
+                }
+                for relation in relations.values():
+                    query = query.join(relation)
+                # свой фильтр к группе не применяется, чтобы в ней оставались альтернативы
+                group_filters = {k: v for k, v in filters.items() if k not in paths}
+                query = query.where(*self._conditions(model, group_filters))
+                queries.append(query.group_by(*(columns[path][0] for path in paths)))
+
+            query = union_all(*queries) if len(queries) > 1 else queries[0]
+            query = query.order_by("facet", *labels.values())
+            result = {name: [] for name in groups}
+            for row in (await cur_session.execute(query)).mappings():
+                values = tuple(row[labels[path]] for path in groups[row["facet"]])
+                result[row["facet"]].append(values + (row["count"],))
+            return {name: tuple(values) for name, values in result.items()}
+
+        if session is not None:
+            return await _facets_internal(session)
+        else:
+            async with self.session_factory.begin() as session:
+                return await _facets_internal(session)
+
+
+def _freeze(value):
+    if isinstance(value, Collection) and not isinstance(value, str):
+        return frozenset(value)
+    return value
+
+
+class CachedCrud(Crud):
+    # справочники меняются только из админки, поэтому чтения вне транзакции
+    # обслуживаются из памяти до истечения ttl или явной инвалидации
+    def __init__(
+        self,
+        url,
+        domain_with_orm: dict | None = None,
+        cached_models=(),
+        ttl: float = REFERENCE_CACHE_TTL,
+        max_entries: int = REFERENCE_CACHE_MAX_ENTRIES,
+    ):
+        super().__init__(url, domain_with_orm)
+        self._cached_models = frozenset(cached_models)
+        # ключи строятся и из параметров запроса (slug, размер), поэтому кэш ограничен
+        self._cache = TTLCache(ttl, max_entries=max_entries)
+
+    async def read(self, domain_model, *, session=None, **kwargs) -> tuple[dict, ...]:
+        # строки Row (columns без as_dict) не кэшируются: копировать их как словари нельзя
+        row_tuples = kwargs.get("columns") and not kwargs.get("as_dict")
+        if session is not None or domain_model not in self._cached_models or row_tuples:
+            return await super().read(domain_model, session=session, **kwargs)
+        key = (domain_model, frozenset((k, _freeze(v)) for k, v in kwargs.items()))
+        rows = self._cache.get(key)
+        if rows is None:
+            rows = await super().read(domain_model, **kwargs)
+            # пустые выборки по произвольным значениям из URL не занимают кэш
+            if rows:
+                self._cache.set(key, rows)
+        # копии, чтобы изменения в вызывающем коде не попадали в кэш
+        return tuple(dict(row) for row in rows)
+
+    def invalidate(self, *domain_models):
+        if not domain_models:
+            self._cache.invalidate()
+        else:
+            self._cache.invalidate(lambda key: key[0] in domain_models)
+        log.debug("кэш справочников сброшен: %s", domain_models or "все")
+
+    async def close_and_dispose(self):
+        self.invalidate()
+        await super().close_and_dispose()
 
 
-_db_manager: Crud | None = None
+_db_manager: CachedCrud | None = None
 
 
-def get_db_manager(test=False) -> Crud:
+def get_db_manager(test=False) -> CachedCrud:
     db_host = conf.db_url if not test else conf.test_db_url
     domain_with_orm = {
         domain.Tile: models.Catalog,
@@ -230,9 +649,21 @@ def get_db_manager(test=False) -> Crud:
         domain.Admin: models.Admins,
         domain.Slug: models.Slug,
         domain.CollectionCategory: models.CollectionCategory,
+        domain.ImageJob: models.ImageJobs,
+        domain.Slide: models.Slides,
     }
+    reference_models = (
+        domain.Categories,
+        domain.Slug,
+        domain.Producer,
+        domain.TileSize,
+        domain.TileColor,
+        domain.TileSurface,
+        domain.Box,
+        domain.Slide,  # главная страница читает слайды из памяти
+    )
     global _db_manager
     if _db_manager is None:
-        _db_manager = Crud(db_host, domain_with_orm)
+        _db_manager = CachedCrud(db_host, domain_with_orm, reference_models)
 
     return _db_manager
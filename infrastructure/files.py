@@ -1,20 +1,208 @@
 import asyncio
+import hashlib
 import logging
+import os
+import time
 from pathlib import Path
+from typing import AsyncIterable
+from uuid import uuid4
 
 import aiofiles  # type: ignore
 
+from core import conf
+from core.config import (FILE_INDEX_TTL, FILE_TEMP_MAX_AGE, FILE_WRITE_ATOMIC,
+                         FILE_WRITE_FSYNC, IMAGE_PRESETS, IMAGE_VARIANT_FORMATS)
+
+
 log = logging.getLogger(__name__)
 
+# временные файлы записи: ".<имя>.<uuid>.tmp" хранилища и ".<имя>.upload" загрузок
+TEMP_FILE_SUFFIXES = (".tmp", ".upload")
+
+
+def is_temp_file(name: str) -> bool:
+    return name.startswith(".") and name.endswith(TEMP_FILE_SUFFIXES)
+
+
+class FileIndex:
+    # имена существующих файлов по каталогам. Запросы читают только память: каталоги
+    # сканирует refresh в потоке (при старте и затем фоновой задачей раз в FILE_INDEX_TTL),
+    # между сканированиями индекс обновляют save/delete файловых менеджеров этого процесса
+    def __init__(self):
+        self._dirs: dict[Path, set[str]] = {}
+
+    def _names(self, directory: Path) -> set[str]:
+        # неизвестный каталог пуст до ближайшего refresh, который его и прочитает
+        return self._dirs.setdefault(Path(directory), set())
 
-class FileSystemStorage:
     @staticmethod
-    async def save(path: Path | str, data: bytes):
-        upload_dir = Path(path).parent
-        if upload_dir:
-            path.parent.mkdir(parents=True, exist_ok=True)
+    def _scan(directory: Path) -> set[str]:
+        # временные файлы в индекс не попадают; оставшиеся после сбоя процесса
+        # посреди записи (старше FILE_TEMP_MAX_AGE) удаляются здесь же
+        stale_before = time.time() - FILE_TEMP_MAX_AGE
+        names = set()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    if not entry.is_file():
+                        continue
+                    if not is_temp_file(entry.name):
+                        names.add(entry.name)
+                        continue
+                    try:
+                        if entry.stat().st_mtime < stale_before:
+                            os.unlink(entry.path)
+                            log.info("Удалён брошенный временный файл %s", entry.path)
+                    except FileNotFoundError:
+                        pass
+        except (FileNotFoundError, NotADirectoryError):
+            return set()
+        return names
+
+    async def refresh(self, directories=()) -> bool:
+        # перечитывает известные и переданные каталоги; что save/delete изменили
+        # за время сканирования, сохраняется поверх результата.
+        # True, если на диске нашлись изменения, о которых индекс не знал
+        changed = False
+        for directory in {*self._dirs, *map(Path, directories)}:
+            before = set(self._names(directory))
+            scanned = await asyncio.to_thread(self._scan, directory)
+            current = self._names(directory)
+            changed = changed or scanned != before
+            self._dirs[directory] = (scanned | (current - before)) - (before - current)
+        return changed
+
+    def exists(self, path: Path | str) -> bool:
+        path = Path(path)
+        return path.name in self._names(path.parent)
+
+    def add(self, path: Path | str):
+        path = Path(path)
+        self._names(path.parent).add(path.name)
+
+    def discard(self, path: Path | str):
+        path = Path(path)
+        self._names(path.parent).discard(path.name)
+
+    def invalidate(self):
+        self._dirs.clear()
+
+
+async def run_file_index_refresh(
+    directories,
+    index: FileIndex | None = None,
+    interval: float = FILE_INDEX_TTL,
+    on_change=None,
+):
+    # фоновое пересканирование: подхватывает файлы, записанные другими процессами;
+    # on_change вызывается, если они нашлись (страницы со ссылками на оригиналы устарели)
+    index = index if index is not None else file_index
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            if await index.refresh(directories) and on_change is not None:
+                await on_change()
+        except Exception:
+            log.exception("Ошибка обновления индекса файлов")
+
+
+file_index = FileIndex()
+
+# сигнатуры форматов изображений: (смещение, байты) -> расширение
+IMAGE_SIGNATURES = (
+    (((0, b"\xff\xd8\xff"),), "jpg"),
+    (((0, b"\x89PNG\r\n\x1a\n"),), "png"),
+    (((0, b"GIF8"),), "gif"),
+    (((0, b"RIFF"), (8, b"WEBP")), "webp"),
+    (((4, b"ftypavif"),), "avif"),
+)
+
+
+def image_extension(data: bytes) -> str:
+    for signature, ext in IMAGE_SIGNATURES:
+        if all(data[offset:offset + len(magic)] == magic for offset, magic in signature):
+            return ext
+    # неизвестный формат отдаётся как раньше, с типом JPEG по умолчанию
+    return "jpg"
+
+
+async def iter_chunks(data: bytes | AsyncIterable[bytes]):
+    # содержимое файла: байты целиком или поток кусков (например, из UploadFile)
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        yield bytes(data)
+        return
+    async for chunk in data:
+        yield chunk
+
+
+def _fsync_directory(directory: Path):
+    # новое имя в каталоге тоже сбрасывается на диск; на Windows каталог не открыть
+    if os.name != "posix":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class FileSystemStorage:
+    # atomic: файл пишется во временный рядом и появляется под своим именем целиком,
+    # поэтому после сбоя посреди записи не остаётся обрезанных изображений;
+    # fsync: данные и запись в каталоге сбрасываются на диск до возврата из save
+    def __init__(self, atomic: bool = FILE_WRITE_ATOMIC, fsync: bool = FILE_WRITE_FSYNC):
+        self._atomic = atomic
+        self._fsync = fsync
+        self._directories: set[Path] = set()
+
+    def _ensure_directory(self, directory: Path):
+        # mkdir выполняется один раз на каталог, а не на каждый сохраняемый файл
+        if directory not in self._directories:
+            directory.mkdir(parents=True, exist_ok=True)
+            self._directories.add(directory)
+
+    async def save(self, path: Path | str, data: bytes | AsyncIterable[bytes]):
+        path = Path(path)
+        try:
+            await self._write(path, data)
+        except FileNotFoundError:
+            # каталог удалили после того, как он попал в кэш
+            self._directories.discard(path.parent)
+            if not isinstance(data, bytes):
+                raise
+            await self._write(path, data)
+
+    async def _write(self, path: Path, data: bytes | AsyncIterable[bytes]):
+        self._ensure_directory(path.parent)
+        if not self._atomic and isinstance(data, bytes):
             async with aiofiles.open(path, "xb") as fw:
                 await fw.write(data)
+            return
+        tmp = path.with_name(f".{path.name}.{uuid4().hex}.tmp")
+        try:
+            async with aiofiles.open(tmp, "xb") as fw:
+                async for chunk in iter_chunks(data):
+                    await fw.write(chunk)
+                if self._fsync:
+                    await fw.flush()
+                    await asyncio.to_thread(os.fsync, fw.fileno())
+            # link, а не rename: существующий файл не заменяется, FileExistsError
+            await asyncio.to_thread(os.link, tmp, path)
+        finally:
+            await asyncio.to_thread(tmp.unlink, True)
+        if self._fsync:
+            await asyncio.to_thread(_fsync_directory, path.parent)
+
+    @staticmethod
+    async def move(src: Path | str, dst: Path | str):
+        # существующий dst не заменяется: FileExistsError
+        await asyncio.to_thread(os.link, src, dst)
+        await asyncio.to_thread(Path(src).unlink, True)
+
+    @staticmethod
+    async def read(path: Path | str) -> bytes:
+        async with aiofiles.open(path, "rb") as fr:
+            return await fr.read()
 
     @staticmethod
     async def delete(path: Path | str):
@@ -22,12 +210,26 @@ class FileSystemStorage:
         await asyncio.to_thread(path.unlink, True)
 
 
+file_storage = FileSystemStorage()
+
+
 class FileManager:
     def __init__(
-        self, root: str = "static/images", layers: dict | None = None, storage = None
+        self,
+        root: str = "static/images",
+        layers: dict | None = None,
+        storage = None,
+        index: FileIndex | None = None,
+        content_addressed: bool | None = None,
     ):
         self._root = Path(root)
-        self._storage = storage if storage else FileSystemStorage()
+        # новые оригиналы называются хэшем содержимого: одинаковые фото товаров
+        # хранятся одним файлом, а повторная загрузка получает новый URL
+        self.content_addressed = (
+            conf.content_addressed_images if content_addressed is None else content_addressed
+        )
+        self._storage = storage if storage else file_storage
+        self._index = index if index is not None else file_index
         self._layers = (
             layers
             if layers
@@ -51,6 +253,19 @@ class FileManager:
             raise ValueError(f"Unknown layer: {layer}")
         return self._root / self._layers.get(layer, "") / file_name
 
+    @staticmethod
+    def derived_name(base_path: Path | str) -> str:
+        # имя файла в слоях вариантов: старые имена без расширения не меняются,
+        # у адресуемых по содержимому расширение заменяется на расширение JPEG-варианта
+        base_path = Path(base_path)
+        return f"{base_path.stem}.jpg" if base_path.suffix else base_path.name
+
+    def exists(self, path: Path | str) -> bool:
+        return self._index.exists(path)
+
+    def directories(self) -> list[Path]:
+        # каталоги слоёв: варианты всех форматов и ширин лежат рядом с файлом слоя
+        return [self._root / directory for directory in self._layers.values()]
 
     async def save(self, image_path: Path | str, img):
         # upload_dir = Path(image_path).parent
@@ -59,8 +274,42 @@ class FileManager:
         #     async with self._fs.open(image_path, "xb") as fw:
         #         await fw.write(img)
         await self._storage.save(image_path, img)
+        self._index.add(image_path)
         return image_path
 
+    async def save_original(
+        self, file_name: str, layer: str, data: bytes | AsyncIterable[bytes]
+    ) -> tuple[Path, bool]:
+        # оригинал загрузки, потоком без сборки в памяти; второе значение - записан ли
+        # файл этим вызовом (False - файл с тем же содержимым уже был)
+        if not self.content_addressed:
+            return await self.save(self.resolve_path(file_name, layer), data), True
+        hasher = hashlib.sha256()
+        head = bytearray()
+
+        async def hashed():
+            async for chunk in iter_chunks(data):
+                hasher.update(chunk)
+                if len(head) < 16:
+                    head.extend(chunk[: 16 - len(head)])
+                yield chunk
+
+        staging = self.resolve_path(f".{file_name}.upload", layer)
+        await self._storage.save(staging, hashed())
+        path = self.resolve_path(
+            f"{hasher.hexdigest()[:32]}.{image_extension(bytes(head))}", layer
+        )
+        try:
+            await self._storage.move(staging, path)
+        except FileExistsError:
+            await self._storage.delete(staging)
+            return path, False
+        self._index.add(path)
+        return path, True
+
+    async def read(self, image_path: Path | str) -> bytes:
+        return await self._storage.read(image_path)
+
     async def save_by_layer(self, file_name: str, img: bytes, layer: str):
         path = self.resolve_path(file_name, layer)
         await self.save(path, img)
@@ -69,10 +318,86 @@ class FileManager:
     async def save_by_layer_from_path(self, base_path: Path | str, img: bytes, layer: str):
         return await self.save_by_layer(Path(base_path).name, img, layer)
 
-    async def delete_by_layers(self, base_path: str | Path, layers: list[str]) -> int:
+    def resolve_variant_path(self, file_name: str, variant: str) -> Path:
+        # вариант от image_worker "<слой>[@<ширина>][.<формат>]":
+        # "products" -> products/<file_name>, "products@320.webp" -> products/<file_name>_320w.webp
+        name, _, ext = variant.partition(".")
+        layer, _, width = name.partition("@")
+        return self.variant_path(
+            self.resolve_path(self.derived_name(file_name), layer),
+            int(width) if width else None,
+            ext or None,
+        )
+
+    async def save_variant(self, file_name: str, img: bytes, variant: str):
+        path = self.resolve_variant_path(file_name, variant)
+        await self.save(path, img)
+        return path
+
+    @staticmethod
+    def variant_path(image_path: Path | str, width: int | None = None, ext: str | None = None) -> Path:
+        # "<имя>[_<ширина>w][.<формат>]"; у имени с расширением формат заменяет его
+        image_path = Path(image_path)
+        name = image_path.stem if image_path.suffix else image_path.name
+        if width is not None:
+            name += f"_{width}w"
+        if ext is not None:
+            name += f".{ext}"
+        elif image_path.suffix:
+            name += image_path.suffix
+        return image_path.with_name(name)
+
+    def layer_of(self, image_path: Path | str) -> str | None:
+        parent = Path(image_path).parent
+        for layer, directory in self._layers.items():
+            if parent == self._root / directory:
+                return layer
+        return None
+
+    def _variants(self, image_path: Path | str) -> dict[str, list[tuple[int | None, Path]]]:
+        # существующие варианты изображения слоя по mime: [(ширина, путь)];
+        # ширина None у файла без суффикса, он базового размера цели
+        preset = IMAGE_PRESETS.get(self.layer_of(image_path) or "", {})
+        base_width = preset.get("size", (None,))[0]
+        widths = [w for w in preset.get("widths", ()) if w != base_width]
+        formats = list(IMAGE_VARIANT_FORMATS.items()) + [(None, "image/jpeg")]
+        variants: dict[str, list[tuple[int | None, Path]]] = {}
+        for ext, mime in formats:
+            for width in [None, *widths]:
+                path = self.variant_path(image_path, width, ext)
+                if self._index.exists(path):
+                    variants.setdefault(mime, []).append((width or base_width, path))
+        return variants
+
+    def image_sources(self, image_path: Path | str) -> list[tuple[str, str]]:
+        # (mime, srcset) для <picture>: сначала лёгкие форматы, JPEG последним
+        sources = []
+        for mime, variants in self._variants(image_path).items():
+            if len(variants) == 1:
+                srcset = f"/{variants[0][1]}"
+            else:
+                srcset = ", ".join(
+                    f"/{path} {width}w" for width, path in sorted(variants, key=lambda v: v[0])
+                )
+            sources.append((mime, srcset))
+        return sources
+
+    async def delete_by_layers(
+        self, base_path: str | Path, layers: list[str], references: int = 0
+    ) -> int:
+        # references - сколько записей, кроме удаляемой, ещё ссылается на оригинал:
+        # общий файл удаляется вместе с последней ссылкой
+        if references:
+            log.debug("%s ещё используется (%s), не удаляется", base_path, references)
+            return 0
         log.debug("deleted by layers: %s", layers)
-        file_name = Path(base_path).name
-        paths = [self.resolve_path(file_name, layer) for layer in layers]
+        file_name = self.derived_name(base_path)
+        paths = []
+        for layer in layers:
+            path = self.resolve_path(file_name, layer)
+            variants = [p for vs in self._variants(path).values() for _, p in vs]
+            # сам файл слоя удаляется, даже если индекс о нём не знает
+            paths.extend(variants if path in variants else [path, *variants])
         paths.append(base_path)  # type: ignore
         #return await self.delete_async(paths)
         return await self.delete(paths)
@@ -84,6 +409,7 @@ class FileManager:
             if isinstance(path, str):
                 path = Path(path)
             await self._storage.delete(path)
+            self._index.discard(path)
             deleted += 1
         return deleted
 
@@ -101,9 +427,8 @@ class FileManager:
     #         deleted += 1
     #     return deleted
 
-    @staticmethod
-    def get_directory(main_path: Path, other_path: str | Path) -> str:
-        if main_path.exists():
+    def get_directory(self, main_path: Path, other_path: str | Path) -> str:
+        if self._index.exists(main_path):
             return str(main_path)
         return str(other_path)
 
@@ -127,10 +452,20 @@ class FileSession:
         image_path = await self._fm.save(image_path, img)
         self._saved_files.append(image_path)
 
+    async def save_original(self, file_name: str, layer: str, data):
+        image_path, stored = await self._fm.save_original(file_name, layer, data)
+        if stored:
+            self._saved_files.append(image_path)
+        return image_path, stored
+
     async def save_by_layer(self, image_path: Path, img: bytes, layer: str):
         image_path = await self._fm.save_by_layer(image_path, img, layer)
         self._saved_files.append(image_path)
 
+    async def save_variant(self, file_name: str, img: bytes, variant: str):
+        image_path = await self._fm.save_variant(file_name, img, variant)
+        self._saved_files.append(image_path)
+
     async def rollback(self):
         log.debug("paths to rollback: %s", self._saved_files)
         await self._fm.delete(self._saved_files)
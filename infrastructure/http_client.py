@@ -1,9 +1,12 @@
 import logging
 from functools import wraps
 
-from httpx import ASGITransport, AsyncClient, ConnectError, HTTPStatusError
+from httpx import (ASGITransport, AsyncClient, ConnectError, HTTPStatusError,
+                   Timeout)
 
 from core import conf
+from core.config import IMAGE_SERVICE_CONNECT_TIMEOUT, IMAGE_SERVICE_TIMEOUT
+from core.multipart import decode_parts
 
 # from aiohttp import ClientResponseError, ClientSession
 # from aiohttp.client_exceptions import ClientConnectorError
@@ -66,10 +69,15 @@ class MyExternalApiForBot:
 
     def connect(self):
         if not self._client:
+            timeout = Timeout(IMAGE_SERVICE_TIMEOUT, connect=IMAGE_SERVICE_CONNECT_TIMEOUT)
             self._client = (
-                AsyncClient(transport=ASGITransport(app=self._app), base_url=self._url)
+                AsyncClient(
+                    transport=ASGITransport(app=self._app),
+                    base_url=self._url,
+                    timeout=timeout,
+                )
                 if self._app
-                else AsyncClient(base_url=self._url)
+                else AsyncClient(base_url=self._url, timeout=timeout)
             )
 
     async def generate_images(self, **data):
@@ -81,6 +89,26 @@ class MyExternalApiForBot:
             log.exception(f"HTTP ошибка: {exc}")
             return None
 
+    async def generate_images_binary(
+        self, data: bytes, targets: tuple[str, ...]
+    ) -> dict[str, bytes] | None:
+        try:
+            resp = await self._client.post(
+                "/generate-images/binary",
+                content=data,
+                params={"targets": list(targets)},
+                headers={"Content-Type": "application/octet-stream"},
+            )
+            resp.raise_for_status()
+        except HTTPStatusError as exc:
+            log.exception(f"HTTP ошибка: {exc}")
+            return None
+        images = decode_parts(resp.content, resp.headers["content-type"])
+        # кроме JPEG под именем цели воркер присылает варианты других форматов
+        if not images.keys() >= set(targets):
+            raise ValueError(f"Ожидались цели {targets}, получены {tuple(images)}")
+        return images
+
     async def close(self):
         if self._client:
             await self._client.aclose()
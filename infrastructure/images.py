@@ -1,4 +1,3 @@
-import base64
 import logging
 from binascii import Error
 from functools import wraps
@@ -62,103 +61,95 @@ class ImageGenerator:
     def __init__(self, api_client=None):
         self._api_client = api_client if api_client else get_http_client()
 
+    # изображения передаются воркеру и обратно в бинарном виде, без base64
     @generate_image_with_exc
     async def products_catalog_and_details(self, img: bytes):
-        img = base64.b64encode(img).decode("utf-8")
-        response = await self._api_client.generate_images(
-            data=img, targets=("products", "details")
-        )
-        response["products"] = base64.b64decode(response["products"])
-        response["details"] = base64.b64decode(response["details"])
-        return response
+        return await self._api_client.generate_images_binary(img, ("products", "details"))
 
 
     @generate_image_with_exc
     async def collections_catalog(self, img: bytes):
-        img = base64.b64encode(img).decode("utf-8")
-        response = await self._api_client.generate_images(data=img, targets=("collections",))
-        response["collections"] = base64.b64decode(response["collections"])
-        return response
+        return await self._api_client.generate_images_binary(img, ("collections",))
 
 
     @generate_image_with_exc
     async def slides(self, img: bytes):
-        img = base64.b64encode(img).decode("utf-8")
-        response = await self._api_client.generate_images(data=img, targets=("slides",))
-        response["slides"] = base64.b64decode(response["slides"])
-        return response
+        return await self._api_client.generate_images_binary(img, ("slides",))
 
 
 class ProductImagesManager(FileManager):
 
-    def __init__(self, root: str = "static/images", layers: dict | None = None, storage=None):
-        super().__init__(root, layers, storage)
+    def __init__(
+        self,
+        root: str = "static/images",
+        layers: dict | None = None,
+        storage=None,
+        index=None,
+        content_addressed: bool | None = None,
+    ):
+        super().__init__(root, layers, storage, index, content_addressed)
 
-    async def delete_product(self, base_path: str | Path) -> int:
-        return await self.delete_by_layers(base_path, ["products", "details"])
+    async def delete_product(self, base_path: str | Path, references: int = 0) -> int:
+        return await self.delete_by_layers(base_path, ["products", "details"], references)
 
     def base_product_path(self, file_name: str) -> Path:
         return self.resolve_path(file_name, "original_product")
 
     def get_product_catalog_image_path(self, base_path: str) -> str:
         base_path = Path(base_path)
-        name = base_path.name
+        name = self.derived_name(base_path)
         path_catalog = self.resolve_path(name, "products")
         return self.get_directory(path_catalog, base_path)
 
     def get_product_details_image_path(self, base_path: str) -> str:
         base_path = Path(base_path)
-        name = base_path.name
+        name = self.derived_name(base_path)
         path_details = self.resolve_path(name, "details")
         return self.get_directory(path_details, base_path)
 
 
 
 class CollectionImagesManager(FileManager):
-    def __init__(self, root: str = "static/images", layers: dict | None = None, storage=None):
-        super().__init__(root, layers, storage)
-
-    async def delete_collection(self, base_path: str | Path) -> int:
-        return await self.delete_by_layers(base_path, ["collections"])
+    def __init__(
+        self,
+        root: str = "static/images",
+        layers: dict | None = None,
+        storage=None,
+        index=None,
+        content_addressed: bool | None = None,
+    ):
+        super().__init__(root, layers, storage, index, content_addressed)
+
+    async def delete_collection(self, base_path: str | Path, references: int = 0) -> int:
+        return await self.delete_by_layers(base_path, ["collections"], references)
 
     def base_collection_path(self, file_name: str) -> Path:
         return self.resolve_path(file_name, "original_collection")
 
     def get_collections_image_path(self, base_path: str) -> str:
-        name = Path(base_path).name
+        name = self.derived_name(base_path)
         path_collections = self.resolve_path(name, "collections")
         return self.get_directory(path_collections, base_path)
 
 
 class SlideImagesManager(FileManager):
-    def __init__(self, root: str = "static/images", layers: dict | None = None, storage=None):
-        super().__init__(root, layers, storage)
-
-    async def delete_all_slides(self) -> int:
-        paths = [
-            self.resolve_path(layer="original_slide"),
-            self.resolve_path(layer="slides"),
-        ]
-        return await self.delete(paths)
+    def __init__(
+        self,
+        root: str = "static/images",
+        layers: dict | None = None,
+        storage=None,
+        index=None,
+        content_addressed: bool | None = None,
+    ):
+        super().__init__(root, layers, storage, index, content_addressed)
+
+    async def delete_slide(self, base_path: str | Path, references: int = 0) -> int:
+        return await self.delete_by_layers(base_path, ["slides"], references)
 
     def base_slide_path(self, file_name: str) -> Path:
         return self.resolve_path(file_name, "original_slide")
 
     def get_slides_image_path(self, base_path: str | Path) -> str:
-        name = Path(base_path).name
+        name = self.derived_name(base_path)
         path_slides = self.resolve_path(name, "slides")
         return self.get_directory(path_slides, base_path)
-
-    @property
-    def get_all_slides_paths(self) -> tuple[str, ...]:
-        path = self.resolve_path(layer="original_slide")
-        return tuple(
-            self.get_slides_image_path(file)
-            for file in path.iterdir()
-            if file.is_file()
-        )
-
-    @property
-    def slides_file_count(self) -> int:
-        path = self.resolve_path(layer="original_slide")
-        return sum(1 for f in path.iterdir() if f.is_file())
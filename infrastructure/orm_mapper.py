@@ -1,6 +1,6 @@
 from domain import (Admin, Box, Categories, CollectionCategory, Collections,
-                    Producer, Slug, Tile, TileColor, TileImages, TileSize,
-                    TileSurface)
+                    ImageJob, Producer, Slide, Slug, Tile, TileColor,
+                    TileImages, TileSize, TileSurface)
 
 
 class DomainToOrmMapper:
@@ -16,9 +16,10 @@ class DomainToOrmMapper:
             "boxes_count",
             "category_name",
             "size_id",
+            "collection_id",
         ),
         Categories: ("name",),
-        TileImages: ("image_id", "tile_id", "image_path"),
+        TileImages: ("image_id", "tile_id", "image_path", "position"),
         Collections: ("id", "name", "image_path"),
         CollectionCategory: (
             "collection_id",
@@ -33,6 +34,16 @@ class DomainToOrmMapper:
         Box: ("id", "weight", "area"),
         Admin: ("username", "password"),
         Slug: ("name", "slug"),
+        ImageJob: (
+            "id",
+            "kind",
+            "source_path",
+            "status",
+            "attempts",
+            "last_error",
+            "locked_until",
+        ),
+        Slide: ("id", "image_path", "position", "active"),
     }
 
     @classmethod
@@ -0,0 +1,235 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from functools import wraps
+from pathlib import Path
+from urllib.parse import urlencode
+from uuid import uuid4
+
+from fastapi import Request, Response
+
+from core import conf
+from core.config import (PAGE_CACHE_MAX_BYTES, PAGE_CACHE_MAX_ENTRIES,
+                         PAGE_CACHE_TTL)
+
+log = logging.getLogger(__name__)
+
+
+class MemoryPageBackend:
+    # LRU в памяти процесса, ограниченный количеством страниц и суммарным размером
+    def __init__(
+        self,
+        max_entries: int = PAGE_CACHE_MAX_ENTRIES,
+        max_bytes: int = PAGE_CACHE_MAX_BYTES,
+    ):
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._entries: OrderedDict[str, dict] = OrderedDict()
+        self._size = 0
+        self._version = 0
+
+    async def get(self, key: str) -> dict | None:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    async def set(self, key: str, entry: dict):
+        if len(entry["body"]) > self._max_bytes:
+            return
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= len(old["body"])
+        self._entries[key] = entry
+        self._size += len(entry["body"])
+        while len(self._entries) > self._max_entries or self._size > self._max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted["body"])
+
+    async def get_version(self) -> str:
+        return str(self._version)
+
+    async def bump_version(self):
+        self._version += 1
+        # страницы старой версии больше никогда не прочитаются
+        self._entries.clear()
+        self._size = 0
+
+
+class FilePageBackend:
+    # общий для нескольких воркеров uvicorn кэш в локальном каталоге
+    def __init__(self, root: str | Path, max_entries: int = PAGE_CACHE_MAX_ENTRIES):
+        self._root = Path(root)
+        self._pages = self._root / "pages"
+        self._version_path = self._root / "version"
+        self._max_entries = max_entries
+        # каталог перебирается не при каждой записи, а раз в prune_every записей
+        self._prune_every = max(1, max_entries // 10)
+        self._writes = 0
+        self._pages.mkdir(parents=True, exist_ok=True)
+
+    def _path(self, key: str) -> Path:
+        return self._pages / hashlib.sha1(key.encode()).hexdigest()
+
+    @staticmethod
+    def _write_atomic(path: Path, data: bytes):
+        # уникальное имя: одну страницу могут одновременно писать несколько потоков
+        tmp_path = path.with_name(f".{path.name}.{uuid4().hex}.tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+    def _get(self, key: str) -> dict | None:
+        path = self._path(key)
+        try:
+            meta, body = path.read_bytes().split(b"\n", 1)
+        except (FileNotFoundError, ValueError):
+            return None
+        os.utime(path)  # для вытеснения самых давно использованных
+        return dict(json.loads(meta), body=body)
+
+    def _set(self, key: str, entry: dict):
+        meta = json.dumps({k: v for k, v in entry.items() if k != "body"})
+        self._write_atomic(self._path(key), meta.encode() + b"\n" + entry["body"])
+        self._writes += 1
+        if self._writes % self._prune_every == 0:
+            self._prune()
+
+    def _prune(self):
+        pages = []
+        for page in self._pages.iterdir():
+            if page.name.startswith("."):
+                continue
+            try:
+                pages.append((page.stat().st_mtime, page))
+            except FileNotFoundError:  # удалена другим воркером
+                continue
+        if len(pages) > self._max_entries:
+            pages.sort()
+            for _, page in pages[: len(pages) - self._max_entries]:
+                page.unlink(missing_ok=True)
+
+    def _get_version(self) -> str:
+        try:
+            return self._version_path.read_text()
+        except FileNotFoundError:
+            return "0"
+
+    def _bump_version(self):
+        # уникальное значение вместо инкремента: гонка двух воркеров ничего не ломает
+        self._write_atomic(self._version_path, str(time.time_ns()).encode())
+
+    async def get(self, key: str) -> dict | None:
+        return await asyncio.to_thread(self._get, key)
+
+    async def set(self, key: str, entry: dict):
+        await asyncio.to_thread(self._set, key, entry)
+
+    async def get_version(self) -> str:
+        return await asyncio.to_thread(self._get_version)
+
+    async def bump_version(self):
+        await asyncio.to_thread(self._bump_version)
+
+
+class PageCache:
+    def __init__(self, backend=None, ttl: float = PAGE_CACHE_TTL):
+        self._backend = backend if backend else MemoryPageBackend()
+        self._ttl = ttl
+
+    @staticmethod
+    def is_cacheable(request: Request) -> bool:
+        # кэшируются только страницы для анонимных посетителей
+        return request.method == "GET" and "access_token" not in request.cookies
+
+    async def key(self, request: Request, params: dict) -> str:
+        # params - ровно те значения, которые получит представление: страницы,
+        # отрисованные по разным значениям, не могут попасть под один ключ
+        query = urlencode(sorted((name, str(value)) for name, value in params.items()))
+        version = await self._backend.get_version()
+        return f"{version}:{request.url.path}?{query}"
+
+    async def get(self, key: str) -> dict | None:
+        entry = await self._backend.get(key)
+        # ttl страхует воркеры, до которых не дошло увеличение версии
+        if entry is None or entry["created_at"] + self._ttl <= time.time():
+            return None
+        return entry
+
+    async def set(self, key: str, response: Response) -> dict:
+        body = bytes(response.body)
+        entry = {
+            "body": body,
+            "etag": '"' + hashlib.sha1(body).hexdigest() + '"',
+            "media_type": response.media_type or "text/html",
+            "created_at": time.time(),
+        }
+        await self._backend.set(key, entry)
+        return entry
+
+    async def bump_version(self):
+        await self._backend.bump_version()
+        log.debug("версия кэша страниц увеличена")
+
+    @staticmethod
+    def response(request: Request, entry: dict) -> Response:
+        headers = {"ETag": entry["etag"], "Cache-Control": "no-cache"}
+        if request.headers.get("if-none-match") == entry["etag"]:
+            return Response(status_code=304, headers=headers)
+        return Response(
+            content=entry["body"], media_type=entry["media_type"], headers=headers
+        )
+
+
+_page_cache: PageCache | None = None
+
+
+def get_page_cache() -> PageCache:
+    global _page_cache
+    if _page_cache is None:
+        backend = (
+            FilePageBackend(conf.page_cache_dir)
+            if conf.page_cache_dir
+            else MemoryPageBackend()
+        )
+        _page_cache = PageCache(backend)
+    return _page_cache
+
+
+def cached_page(*query_params: str):
+    # ключ страницы - путь и значения параметров query_params, переданные представлению;
+    # пустые и отсутствующие параметры представление обрабатывает одинаково
+    def decorator(view):
+        @wraps(view)
+        async def wrapper(*args, **kwargs):
+            request: Request = kwargs["request"]
+            page_cache = get_page_cache()
+            if not page_cache.is_cacheable(request):
+                return await view(*args, **kwargs)
+            params = {
+                name: kwargs[name]
+                for name in query_params
+                if kwargs.get(name) not in (None, "")
+            }
+            key = await page_cache.key(request, params)
+            entry = await page_cache.get(key)
+            if entry is None:
+                response = await view(*args, **kwargs)
+                if response.status_code != 200 or not hasattr(response, "body"):
+                    return response
+                entry = await page_cache.set(key, response)
+            return page_cache.response(request, entry)
+
+        return wrapper
+
+    return decorator
+
+
+async def bump_pages_version():
+    try:
+        yield
+    finally:
+        await get_page_cache().bump_version()
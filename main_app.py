@@ -1,4 +1,5 @@
-from contextlib import asynccontextmanager
+import asyncio
+from contextlib import asynccontextmanager, suppress
 from pathlib import Path
 
 from fastapi import FastAPI
@@ -8,22 +9,56 @@ from pydantic_settings import BaseSettings
 
 from domain import InvalidAccessTokenError, InvalidRefreshTokenError
 from infrastructure.crud import get_db_manager
+from infrastructure.files import file_index, run_file_index_refresh
 from infrastructure.http_client import get_http_client
+from infrastructure.images import (CollectionImagesManager, ImageGenerator,
+                                   ProductImagesManager, SlideImagesManager)
+from infrastructure.page_cache import get_page_cache
 from api import main_router
 from api.error_handlers import *
+from api.templating import precompile_templates
 from core.logger import setup_logging
 from core import conf
+from services.image_jobs import run_image_jobs
 
 setup_logging()
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    precompile_templates()
     http_client = get_http_client()
     http_client.connect()
     manager = get_db_manager()
     manager.connect()
+    # очередь изображений: варианты загруженных в админке изображений
+    # создаются в фоне, после разбора очереди сбрасывается кэш страниц
+    file_managers = {
+        "products": ProductImagesManager(),
+        "collections": CollectionImagesManager(),
+        "slides": SlideImagesManager(),
+    }
+    # индекс файлов заполняется до первого запроса: рендер страниц не читает диск
+    directories = {d for fm in file_managers.values() for d in fm.directories()}
+    await file_index.refresh(directories)
+    # варианты, созданные очередью в другом воркере, появляются здесь только после
+    # пересканирования: тогда же сбрасывается кэш страниц, ссылавшихся на оригиналы
+    file_index_refresh = asyncio.create_task(
+        run_file_index_refresh(directories, on_change=get_page_cache().bump_version)
+    )
+    image_jobs = asyncio.create_task(
+        run_image_jobs(
+            manager,
+            ImageGenerator(http_client),
+            file_managers,
+            on_idle=get_page_cache().bump_version,
+        )
+    )
     yield
+    for task in (image_jobs, file_index_refresh):
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
     await manager.close_and_dispose()
     await http_client.close()
 
@@ -0,0 +1,45 @@
+"""catalog collection_id
+
+Revision ID: 3b7e1c9a4d20
+Revises: 68df66e3fe4f
+Create Date: 2026-10-18 12:10:42.118904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3b7e1c9a4d20'
+down_revision: Union[str, Sequence[str], None] = '68df66e3fe4f'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('catalog', sa.Column('collection_id', sa.Integer(), nullable=True))
+    op.create_foreign_key(
+        'catalog_collection_id_fkey', 'catalog', 'collections',
+        ['collection_id'], ['id'], ondelete='SET NULL'
+    )
+    op.create_index(op.f('ix_catalog_collection_id'), 'catalog', ['collection_id'], unique=False)
+    # коллекция раньше вычислялась из названия товара: слово в кавычках (services.views.extract_quoted_word)
+    op.execute(
+        """
+        UPDATE catalog AS c
+        SET collection_id = col.id
+        FROM collections AS col
+        WHERE c.name LIKE '%"%"%'
+          AND lower(split_part(c.name, '"', 2)) = lower(col.name)
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_catalog_collection_id'), table_name='catalog')
+    op.drop_constraint('catalog_collection_id_fkey', 'catalog', type_='foreignkey')
+    op.drop_column('catalog', 'collection_id')
@@ -0,0 +1,48 @@
+"""tile_images position
+
+Revision ID: 5d2a8f1c7e34
+Revises: 9c4f2a6e8b13
+Create Date: 2026-10-18 14:02:17.530211
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2a8f1c7e34'
+down_revision: Union[str, Sequence[str], None] = '9c4f2a6e8b13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column(
+        'tile_images',
+        sa.Column('position', sa.Integer(), server_default='0', nullable=False)
+    )
+    # главное изображение сохранялось первым (файл <id>-0), порядок image_id совпадает с порядком загрузки
+    op.execute(
+        """
+        UPDATE tile_images AS ti
+        SET position = r.rn - 1
+        FROM (
+            SELECT image_id, row_number() OVER (PARTITION BY tile_id ORDER BY image_id) AS rn
+            FROM tile_images
+        ) AS r
+        WHERE r.image_id = ti.image_id
+        """
+    )
+    op.create_index(
+        'ix_tile_images_main', 'tile_images', ['tile_id'], unique=True,
+        postgresql_where=sa.text('position = 0')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_tile_images_main', table_name='tile_images')
+    op.drop_column('tile_images', 'position')
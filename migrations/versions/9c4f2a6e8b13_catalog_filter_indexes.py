@@ -0,0 +1,53 @@
+"""catalog filter indexes
+
+Revision ID: 9c4f2a6e8b13
+Revises: 3b7e1c9a4d20
+Create Date: 2026-10-18 13:02:17.540231
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9c4f2a6e8b13'
+down_revision: Union[str, Sequence[str], None] = '3b7e1c9a4d20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+INDEXES = (
+    ('ix_catalog_category_name_id', 'catalog', ['category_name', 'id']),
+    ('ix_catalog_category_name_producer_name_id', 'catalog', ['category_name', 'producer_name', 'id']),
+    ('ix_catalog_category_name_color_name_id', 'catalog', ['category_name', 'color_name', 'id']),
+    ('ix_catalog_category_name_size_id_id', 'catalog', ['category_name', 'size_id', 'id']),
+    ('ix_tile_images_tile_id', 'tile_images', ['tile_id']),
+    ('ix_collection_category_category_name', 'collection_category', ['category_name']),
+    ('ix_slugs_slug', 'slugs', ['slug']),
+)
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # CONCURRENTLY не блокирует запись в таблицы, но не работает внутри транзакции
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(
+                name, table, columns,
+                unique=False,
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        for name, table, _ in reversed(INDEXES):
+            op.drop_index(
+                name, table_name=table,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
@@ -0,0 +1,36 @@
+"""slides
+
+Revision ID: c58f2e9a1d47
+Revises: e41b8d7c3a05
+Create Date: 2026-10-18 17:40:52.117304
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c58f2e9a1d47'
+down_revision: Union[str, Sequence[str], None] = 'e41b8d7c3a05'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('slides',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('image_path', sa.String(), nullable=True),
+    sa.Column('position', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('active', sa.Boolean(), server_default=sa.text('true'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_slides_position'), 'slides', ['position'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_slides_position'), table_name='slides')
+    op.drop_table('slides')
@@ -0,0 +1,32 @@
+"""shared collection images
+
+Revision ID: e41b8d7c3a05
+Revises: a7e3c5b9d162
+Create Date: 2026-10-18 17:02:11.530918
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e41b8d7c3a05'
+down_revision: Union[str, Sequence[str], None] = 'a7e3c5b9d162'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.drop_constraint('collections_image_path_key', 'collections', type_='unique')
+    op.create_index(
+        op.f('ix_collections_image_path'), 'collections', ['image_path'], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_collections_image_path'), table_name='collections')
+    op.create_unique_constraint('collections_image_path_key', 'collections', ['image_path'])
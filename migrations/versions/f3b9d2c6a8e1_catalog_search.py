@@ -0,0 +1,100 @@
+"""catalog search
+
+Revision ID: f3b9d2c6a8e1
+Revises: c58f2e9a1d47
+Create Date: 2026-10-18 19:12:36.804519
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b9d2c6a8e1'
+down_revision: Union[str, Sequence[str], None] = 'c58f2e9a1d47'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# документ товара собирается при записи, а не при поиске: название весит больше всего,
+# коллекция и производитель меньше, затем цвет, категория меньше всего
+CATALOG_SEARCH_FUNCTION = """
+CREATE OR REPLACE FUNCTION catalog_search_document() RETURNS trigger AS $$
+DECLARE
+    collection_name text;
+BEGIN
+    SELECT name INTO collection_name FROM collections WHERE id = NEW.collection_id;
+    NEW.search_text := lower(concat_ws(' ',
+        NEW.name, collection_name, NEW.producer_name,
+        NEW.color_name, NEW.feature_name, NEW.category_name));
+    NEW.search_vector :=
+        setweight(to_tsvector('russian', coalesce(NEW.name, '')), 'A')
+        || setweight(to_tsvector('russian', coalesce(collection_name, '')), 'B')
+        || setweight(to_tsvector('russian', coalesce(NEW.producer_name, '')), 'B')
+        || setweight(to_tsvector('russian', concat_ws(' ', NEW.color_name, NEW.feature_name)), 'C')
+        || setweight(to_tsvector('russian', coalesce(NEW.category_name, '')), 'D');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+CATALOG_SEARCH_TRIGGER = """
+CREATE TRIGGER catalog_search_document
+BEFORE INSERT OR UPDATE OF name, collection_id, producer_name, color_name, feature_name, category_name
+ON catalog
+FOR EACH ROW EXECUTE FUNCTION catalog_search_document();
+"""
+
+# переименование коллекции пересобирает документы её товаров
+COLLECTION_SEARCH_FUNCTION = """
+CREATE OR REPLACE FUNCTION collection_search_document() RETURNS trigger AS $$
+BEGIN
+    UPDATE catalog SET collection_id = collection_id WHERE collection_id = NEW.id;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+"""
+
+COLLECTION_SEARCH_TRIGGER = """
+CREATE TRIGGER collection_search_document
+AFTER UPDATE OF name ON collections
+FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+EXECUTE FUNCTION collection_search_document();
+"""
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    op.add_column('catalog', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+    op.add_column('catalog', sa.Column('search_text', sa.String(), nullable=True))
+    op.execute(CATALOG_SEARCH_FUNCTION)
+    op.execute(CATALOG_SEARCH_TRIGGER)
+    op.execute(COLLECTION_SEARCH_FUNCTION)
+    op.execute(COLLECTION_SEARCH_TRIGGER)
+    # заполнение существующих товаров через тот же триггер
+    op.execute('UPDATE catalog SET name = name')
+    op.create_index(
+        'ix_catalog_search_vector', 'catalog', ['search_vector'],
+        unique=False, postgresql_using='gin',
+    )
+    op.create_index(
+        'ix_catalog_search_text_trgm', 'catalog', ['search_text'],
+        unique=False, postgresql_using='gin',
+        postgresql_ops={'search_text': 'gin_trgm_ops'},
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_catalog_search_text_trgm', table_name='catalog')
+    op.drop_index('ix_catalog_search_vector', table_name='catalog')
+    op.execute('DROP TRIGGER IF EXISTS collection_search_document ON collections')
+    op.execute('DROP FUNCTION IF EXISTS collection_search_document()')
+    op.execute('DROP TRIGGER IF EXISTS catalog_search_document ON catalog')
+    op.execute('DROP FUNCTION IF EXISTS catalog_search_document()')
+    op.drop_column('catalog', 'search_text')
+    op.drop_column('catalog', 'search_vector')
@@ -0,0 +1,46 @@
+"""
+Разовый перенос: слайды, загруженные до появления таблицы slides, регистрируются в ней
+в порядке имён файлов. Уже зарегистрированные пути пропускаются.
+
+    python -m scripts.register_slides
+"""
+import asyncio
+import logging
+
+import core.logger
+from domain import Slide
+from infrastructure.crud import get_db_manager
+from infrastructure.images import SlideImagesManager
+
+log = logging.getLogger(__name__)
+
+
+def slide_sort_key(path):
+    return (0, int(path.name)) if path.name.isdigit() else (1, path.name)
+
+
+async def register_slides():
+    manager = get_db_manager()
+    manager.connect()
+    file_manager = SlideImagesManager()
+    folder = file_manager.resolve_path(layer="original_slide")
+    slides = await manager.read(Slide)
+    registered = {slide["image_path"] for slide in slides}
+    position = max((slide["position"] for slide in slides), default=-1) + 1
+    # раньше оригинал слайда лежал в base/slides/<n>/<n>
+    files = sorted(
+        (p for p in folder.rglob("*") if p.is_file() and not p.name.startswith(".")),
+        key=slide_sort_key,
+    )
+    for path in files:
+        if str(path) in registered:
+            continue
+        await manager.create(Slide, image_path=str(path), position=position, active=True)
+        log.info("Зарегистрирован слайд %s", path)
+        position += 1
+
+
+if __name__ == "__main__":
+    log.info("Старт")
+    asyncio.run(register_slides())
+    log.info("Конец")
@@ -1,149 +1,208 @@
+"""
+Пересборка вариантов изображений из оригиналов в static/images/base.
+
+    python -m scripts.resize_images [--only products,details] [--force] [--workers N]
+
+Варианты генерирует тот же код, что и image_worker (generate_image_variants),
+в пуле процессов. Манифест хранит для каждого оригинала и цели mtime/размер/sha1
+оригинала и отпечаток пресета: неизменённые пары пропускаются.
+"""
+import argparse
+import hashlib
+import json
 import logging
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, as_completed
 from pathlib import Path
 
-from PIL import Image, ImageOps
-
 from core import logger
-from image_worker import IMAGE_PRESETS  # твоя функция и пресеты
+from image_worker import IMAGE_FORMATS, IMAGE_PRESETS, generate_image_variants
+from infrastructure.files import FileManager
 
 log = logging.getLogger(__name__)
 
-BASE_PATH = Path("static/images/base")
+BASE_DIR = Path("static/images")
+MANIFEST_NAME = ".resize_manifest.json"
 
+# слой оригиналов -> цели, которые из него строятся
 PROCESS_MAP = {
-    "products": ["products", "details"],  # исходные товары
-    "collections": ["collections"],  # исходные коллекции
-    "slides": ["slides"],
-}
-
-BASE_DIR = Path("static/images")
-OUTPUT_DIRS = {
-    "products": BASE_DIR / "products" / "catalog",
-    "collections": BASE_DIR / "collections" / "catalog",
-    "details": BASE_DIR / "products" / "details",
-    "slides": BASE_DIR / "slides",
+    "original_product": ("products", "details"),
+    "original_collection": ("collections",),
+    "original_slide": ("slides",),
 }
+PROGRESS_INTERVAL = 5  # секунд между отчётами о ходе
 
 
-def resize_image(
-    img: Image.Image,
-    target_size: tuple[int, int],
-    mode: str,
-) -> Image.Image:
-    if mode == "fit":
-        img.thumbnail(target_size, Image.LANCZOS)
-        return img
-
-    if mode == "cover":
-        return ImageOps.fit(
-            img,
-            target_size,
-            method=Image.LANCZOS,
-            centering=(0.5, 0.5),
-        )
-
-    raise ValueError(f"Unknown resize mode: {mode}")
-
-
-def save_image(image: Image.Image, path: Path, form: str, quality: int):
-    image.save(
-        path,
-        form,
-        quality=quality,
-        optimize=True,
-        progressive=True,
+def preset_fingerprint(target: str) -> str:
+    # меняется при любом изменении пресета цели или параметров форматов
+    data = json.dumps(
+        {"preset": IMAGE_PRESETS[target], "formats": IMAGE_FORMATS},
+        sort_keys=True,
+        default=str,
     )
+    return hashlib.sha1(data.encode()).hexdigest()
 
 
-def generate_image_variant(
-    input_path: Path | str, target: str, quality: int = 82, output_dir=None
-):
-    """
-    Генерирует вариант изображения для сайта.
+def load_manifest(path: Path) -> dict:
+    try:
+        return json.loads(path.read_text())
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
 
-    - сохраняет пропорции
-    - не апскейлит маленькие изображения
-    - идемпотентна
-    """
 
-    if target not in IMAGE_PRESETS:
-        raise ValueError(f"Unknown image preset: {target}")
-
-    input_path = Path(input_path)
-
-    preset = IMAGE_PRESETS[target]
-    width, height = preset["size"]
-    mode = preset["mode"]
-    output_dir = output_dir or OUTPUT_DIRS[target]
-    output_dir.mkdir(parents=True, exist_ok=True)
-    output_path = output_dir / input_path.name
-
-    if output_path.exists():
-        log.debug("Image already exists: %s", output_path)
-        return output_path
-
-    if not input_path.exists():
-        return
-
-    with Image.open(input_path) as img:
-        img = img.convert("RGB")
-        smaller_width = width is not None and img.width < width
-        smaller_height = height is not None and img.height < height
-        # защита от апскейла
-        if smaller_width or smaller_height:
-            log.warning(
-                "Image smaller than target (%s < %s), saving original size",
-                img.size,
-                (width, height),
-            )
-            resized = img
-        else:
-            target_size = (
-                width if width is not None else img.width,
-                height if height is not None else img.height,
-            )
-            resized = resize_image(img, target_size, mode)
-
-        output_format = output_path.suffix.lstrip(".").upper()
-        if not output_format:
-            output_format = "JPEG"  # дефолтный формат для файлов без расширения
-        if not input_path.exists():
-            return
-
-        save_image(
-            resized,
-            output_path,
-            output_format,
-            quality=quality,
-        )
-
-    log.info("Generated %s image: %s", target, output_path)
-    return output_path
-
-
-def process_all_folders():
-    for src_dir, presets in PROCESS_MAP.items():
-        folder_path = BASE_PATH / src_dir
-        if not folder_path.exists() or not folder_path.is_dir():
-            log.warning("Исходная папка не найдена: %s", folder_path)
-            continue
+def save_manifest(path: Path, manifest: dict):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(manifest, sort_keys=True))
+    os.replace(tmp, path)
+
+
+def write_atomic(path: Path, data: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.tmp")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
 
-        log.info("Обрабатываем папку: %s", folder_path)
 
-        for image_file in folder_path.iterdir():
-            log.debug("images_file: %s", image_file)
-            if not image_file.is_file():
-                log.debug("not is file")
+def render_source(root: str, source: str, targets: tuple[str, ...], known_sha1: str | None):
+    """
+    Выполняется в процессе пула: читает оригинал и пишет все варианты целей.
+    Если содержимое совпало с known_sha1 (изменился только mtime), ничего не пишет.
+    """
+    data = Path(source).read_bytes()
+    sha1 = hashlib.sha1(data).hexdigest()
+    if sha1 == known_sha1:
+        return source, targets, sha1, 0
+    file_manager = FileManager(root)
+    name = Path(source).name
+    written = 0
+    for variant, image in generate_image_variants(data, targets).items():
+        write_atomic(file_manager.resolve_variant_path(name, variant), image)
+        written += 1
+    return source, targets, sha1, written
+
+
+def plan(root: Path, manifest: dict, only: set[str] | None, force: bool):
+    # задачи пересборки: (оригинал, цели, известный sha1 или None)
+    file_manager = FileManager(str(root))
+    fingerprints = {target: preset_fingerprint(target) for target in IMAGE_PRESETS}
+    tasks = []
+    for layer, layer_targets in PROCESS_MAP.items():
+        targets = [t for t in layer_targets if only is None or t in only]
+        folder = file_manager.resolve_path(layer=layer)
+        if not targets or not folder.is_dir():
+            continue
+        for entry in os.scandir(folder):
+            if not entry.is_file() or entry.name.startswith("."):
+                continue
+            stat = entry.stat()
+            records = {t: manifest.get(f"{entry.path}:{t}") for t in targets}
+            same_preset = {
+                t: records[t] is not None and records[t]["preset"] == fingerprints[t]
+                for t in targets
+            }
+            stale = [
+                t
+                for t in targets
+                if force
+                or not same_preset[t]
+                or (records[t]["mtime_ns"], records[t]["size"])
+                != (stat.st_mtime_ns, stat.st_size)
+            ]
+            if not stale:
+                continue
+            # пресеты прежние, изменились только mtime/размер: пропуск решит хэш содержимого
+            known_sha1 = None
+            if not force and all(same_preset[t] for t in stale):
+                sha1s = {records[t]["sha1"] for t in stale}
+                known_sha1 = sha1s.pop() if len(sha1s) == 1 else None
+            tasks.append((entry.path, tuple(stale), known_sha1))
+    return tasks
+
+
+def rebuild(
+    root: Path = BASE_DIR,
+    only: set[str] | None = None,
+    force: bool = False,
+    workers: int | None = None,
+    executor_cls: type[Executor] = ProcessPoolExecutor,
+) -> dict:
+    manifest_path = root / MANIFEST_NAME
+    manifest = load_manifest(manifest_path)
+    tasks = plan(root, manifest, only, force)
+    total = len(tasks)
+    log.info("Оригиналов к обработке: %s", total)
+    stats = {"sources": 0, "files": 0, "failed": 0}
+    started = last_report = time.monotonic()
+    with executor_cls(max_workers=workers or os.cpu_count()) as executor:
+        futures = [
+            executor.submit(render_source, str(root), source, targets, known_sha1)
+            for source, targets, known_sha1 in tasks
+        ]
+        for future in as_completed(futures):
+            try:
+                source, targets, sha1, written = future.result()
+            except Exception:
+                log.exception("Ошибка генерации варианта")
+                stats["failed"] += 1
                 continue
-            for preset in presets:
-                if preset not in IMAGE_PRESETS:
-                    log.warning("Preset не найден: %s", preset)
-                    continue
-                log.debug("Запуск функции resize")
-                generate_image_variant(image_file, preset)
+            stat = os.stat(source)
+            for target in targets:
+                manifest[f"{source}:{target}"] = {
+                    "mtime_ns": stat.st_mtime_ns,
+                    "size": stat.st_size,
+                    "sha1": sha1,
+                    "preset": preset_fingerprint(target),
+                }
+            stats["sources"] += 1
+            stats["files"] += written
+            now = time.monotonic()
+            if now - last_report >= PROGRESS_INTERVAL:
+                last_report = now
+                done = stats["sources"] + stats["failed"]
+                rate = done / (now - started)
+                log.info(
+                    "%s/%s оригиналов, %.1f оригиналов/с, %.1f файлов/с, осталось ~%.0f с",
+                    done,
+                    total,
+                    rate,
+                    stats["files"] / (now - started),
+                    (total - done) / rate if rate else 0,
+                )
+                save_manifest(manifest_path, manifest)
+    save_manifest(manifest_path, manifest)
+    elapsed = time.monotonic() - started
+    log.info(
+        "Готово: %s оригиналов, %s файлов, ошибок %s за %.1f с",
+        stats["sources"],
+        stats["files"],
+        stats["failed"],
+        elapsed,
+    )
+    return stats
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Пересборка вариантов изображений")
+    parser.add_argument(
+        "--only", help="цели через запятую, например products,details", default=None
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="игнорировать манифест и пересобрать всё"
+    )
+    parser.add_argument("--workers", type=int, default=None, help="процессов в пуле")
+    parser.add_argument("--root", type=Path, default=BASE_DIR)
+    args = parser.parse_args(argv)
+    if args.only:
+        args.only = {target.strip() for target in args.only.split(",") if target.strip()}
+        unknown = args.only - IMAGE_PRESETS.keys()
+        if unknown:
+            parser.error(f"неизвестные цели: {', '.join(sorted(unknown))}")
+    return args
 
 
 if __name__ == "__main__":
+    args = parse_args()
     log.info("Старт генерации изображений")
-    process_all_folders()
+    rebuild(args.root, args.only, args.force, args.workers)
     log.info("Генерация изображений завершена")
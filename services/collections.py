@@ -1,16 +1,53 @@
 import logging
+from pathlib import Path
+from typing import AsyncIterable
 
 from slugify import slugify
 
 from domain import CollectionCategory, Collections, Slug
+from services.image_jobs import enqueue_image_job
 from services.UoW import UnitOfWork
 
 log = logging.getLogger(__name__)
 
 
+async def link_tiles_to_collection(manager, coll_id: int, name: str, session=None):
+    # товары, добавленные раньше коллекции, привязываются к ней по слову в кавычках
+    return await manager.link_tiles_to_collection(coll_id, name, session=session)
+
+
+async def save_collection_image(
+    manager, images_generator, files, file_name: str, image, session=None
+) -> Path:
+    try:
+        image_path, stored = await files.save_original(
+            file_name, "original_collection", image
+        )
+        if not stored:
+            log.debug("изображение %s уже загружено для другой коллекции", image_path)
+        elif images_generator is None:
+            # варианты создаст очередь изображений
+            await enqueue_image_job(manager, "collections", image_path, session)
+        else:
+            miniatures = await images_generator.collections_catalog(
+                await files.read(image_path)
+            )
+            for variant, miniature in miniatures.items():
+                await files.save_variant(image_path.name, miniature, variant)
+    except TypeError:
+        log.debug(
+            "generate_image_variant_callback  или save_files не получили нужную функцию"
+        )
+        raise
+    except FileExistsError:
+        log.debug("путь для %s уже занять", file_name)
+        raise
+    return image_path
+
+
 async def add_collection(
     name: str,
-    image: bytes,
+    image: bytes | AsyncIterable[bytes],
     category_name: str,
     manager,
     images_generator,
@@ -30,30 +67,18 @@ async def add_collection(
                 session=uow.session,
             )  # type: ignore
             coll_id = collection_record["id"]
-            file_name = str(coll_id)
-            image_path = file_manager.base_collection_path(file_name)
-            await manager.update(
-                Collections,
-                {"id": coll_id},
-                image_path=str(image_path),
-                session=uow.session,
-            )
-            await manager.create(Slug, name=name, slug=slugify(name))
-            try:
-                async with file_manager.session() as files:
-                    await files.save(image_path, image)
-                    miniatures = await images_generator.collections_catalog(image)
-                    for layer, miniature in miniatures.items():
-                        #await files.save_by_layer(image_path, miniature, layer)
-                        await files.save_by_layer(file_name, miniature, layer)
-            except TypeError:
-                log.debug(
-                    "generate_image_variant_callback  или save_files не получили нужную функцию"
+            async with file_manager.session() as files:
+                image_path = await save_collection_image(
+                    manager, images_generator, files, str(coll_id), image, uow.session
+                )
+                await manager.update(
+                    Collections,
+                    {"id": coll_id},
+                    image_path=str(image_path),
+                    session=uow.session,
                 )
-                raise
-            except FileExistsError:
-                log.debug("путь %s уже занять", image_path)
-                raise
+            await manager.create(Slug, name=name, slug=slugify(name))
+            await link_tiles_to_collection(manager, coll_id, name, uow.session)
         else:
             collection_record = collection_record[0]
             coll_id = collection_record["id"]
@@ -69,7 +94,8 @@ async def add_collection(
             category_name=category_name,
             session=uow.session,
         )
-        return collection_record
+    manager.invalidate(Slug)
+    return collection_record
 
 
 async def delete_collection(
@@ -86,4 +112,9 @@ async def delete_collection(
         )
         await manager.delete(Slug, name=collection_name, session=uow.session)
         collection = collection[0]
-        await file_manager.delete_collection(collection["image_path"])
+        # изображение, общее с другими коллекциями, удаляется с последней из них
+        references = await manager.count(
+            Collections, image_path=collection["image_path"], session=uow.session
+        )
+        await file_manager.delete_collection(collection["image_path"], references)
+    manager.invalidate(Slug)
@@ -0,0 +1,91 @@
+import asyncio
+import logging
+from pathlib import Path
+
+from core.config import (IMAGE_JOB_LEASE, IMAGE_JOB_MAX_ATTEMPTS,
+                         IMAGE_JOB_POLL_INTERVAL)
+from domain import ImageJob
+
+log = logging.getLogger(__name__)
+
+# метод генератора изображений для каждого вида задачи
+IMAGE_JOB_GENERATORS = {
+    "products": "products_catalog_and_details",
+    "collections": "collections_catalog",
+    "slides": "slides",
+}
+
+
+async def enqueue_image_job(manager, kind: str, source_path, session=None):
+    # задача фиксируется в той же транзакции, что и запись об изображении;
+    # пока варианты не готовы, страницы показывают оригинал (FileManager.get_directory)
+    if kind not in IMAGE_JOB_GENERATORS:
+        raise ValueError(f"Unknown image job kind: {kind}")
+    return await manager.create(
+        ImageJob,
+        kind=kind,
+        source_path=str(source_path),
+        status=ImageJob.PENDING,
+        attempts=0,
+        last_error=None,
+        locked_until=None,
+        session=session,
+    )
+
+
+async def process_image_job(job: dict, images_generator, file_manager):
+    source_path = Path(job["source_path"])
+    image = await file_manager.read(source_path)
+    generate = getattr(images_generator, IMAGE_JOB_GENERATORS[job["kind"]])
+    miniatures = await generate(image)
+    async with file_manager.session() as files:
+        for variant, miniature in miniatures.items():
+            try:
+                await files.save_variant(source_path.name, miniature, variant)
+            except FileExistsError:
+                log.debug("вариант %s для %s уже создан прошлой попыткой", variant, source_path.name)
+
+
+async def run_next_image_job(manager, images_generator, file_managers: dict) -> bool:
+    job = await manager.claim_image_job(IMAGE_JOB_LEASE)
+    if job is None:
+        return False
+    try:
+        await process_image_job(job, images_generator, file_managers[job["kind"]])
+    except Exception as exc:
+        log.exception("задача %s не выполнена, попытка %s", job["id"], job["attempts"])
+        status = (
+            ImageJob.FAILED
+            if job["attempts"] >= IMAGE_JOB_MAX_ATTEMPTS
+            else ImageJob.PENDING
+        )
+        await manager.update(
+            ImageJob, {"id": job["id"]}, status=status, last_error=str(exc), locked_until=None
+        )
+    else:
+        await manager.update(
+            ImageJob, {"id": job["id"]}, status=ImageJob.DONE, last_error=None, locked_until=None
+        )
+    return True
+
+
+async def run_image_jobs(
+    manager,
+    images_generator,
+    file_managers: dict,
+    on_idle=None,
+    poll_interval: float = IMAGE_JOB_POLL_INTERVAL,
+):
+    # обработчик очереди; on_idle вызывается, когда очередь разобрана после новых задач
+    processed_since_idle = False
+    while True:
+        try:
+            if await run_next_image_job(manager, images_generator, file_managers):
+                processed_since_idle = True
+                continue
+            if processed_since_idle and on_idle is not None:
+                await on_idle()
+            processed_since_idle = False
+        except Exception:
+            log.exception("ошибка обработчика очереди изображений")
+        await asyncio.sleep(poll_interval)
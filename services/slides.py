@@ -1,31 +1,96 @@
 import logging
+from typing import AsyncIterable
 
 from core import logger
+from domain import Slide
+from services.image_jobs import enqueue_image_job
+from services.UoW import UnitOfWork
 
 log = logging.getLogger(__name__)
 
 
-async def add_slides(images: list[bytes], images_generator, file_manager):
-    extra_num = file_manager.slides_file_count
-    for i, image in enumerate(images):
-        file_name = str(extra_num + i)
-        try:
-            base_slide_path = file_manager.base_slide_path(file_name)
-            image_path = base_slide_path / file_name
-            async with file_manager.session() as files:
-                await files.save(image_path, image)
-                miniatures = await images_generator.slides(image)
-                for layer, miniature in miniatures.items():
-                    await files.save_by_layer(file_name, miniature, layer)
-        except TypeError:
-            log.debug(
-                "generate_image_variant_callback  или save_files не получили нужную функцию"
+async def add_slides(
+    images: list[bytes | AsyncIterable[bytes]],
+    images_generator,
+    file_manager,
+    manager,
+    uow_class=UnitOfWork,
+):
+    # новые слайды встают в конец показа; без генератора варианты создаёт очередь изображений
+    for image in images:
+        async with uow_class(manager) as uow:
+            # последняя позиция читается в транзакции, а не из кэша справочников
+            last = await manager.read(
+                Slide, session=uow.session, order_by="position", backward=True, limit=1
             )
-            raise
-        except FileExistsError:
-            log.debug("путь уже занять")
-            pass
+            slide = await manager.create(
+                Slide,
+                image_path=None,
+                position=last[0]["position"] + 1 if last else 0,
+                active=True,
+                session=uow.session,
+            )
+            try:
+                async with file_manager.session() as files:
+                    image_path, stored = await files.save_original(
+                        str(slide["id"]), "original_slide", image
+                    )
+                    await manager.update(
+                        Slide,
+                        {"id": slide["id"]},
+                        image_path=str(image_path),
+                        session=uow.session,
+                    )
+                    if not stored:
+                        continue
+                    if images_generator is None:
+                        await enqueue_image_job(manager, "slides", image_path, uow.session)
+                        continue
+                    miniatures = await images_generator.slides(await files.read(image_path))
+                    for variant, miniature in miniatures.items():
+                        await files.save_variant(image_path.name, miniature, variant)
+            except TypeError:
+                log.debug(
+                    "generate_image_variant_callback  или save_files не получили нужную функцию"
+                )
+                raise
+    manager.invalidate(Slide)
+
+
+async def update_slide(
+    manager,
+    slide_id: int,
+    position: int | None = None,
+    active: bool | None = None,
+):
+    values = {
+        k: v for k, v in (("position", position), ("active", active)) if v is not None
+    }
+    if values:
+        await manager.update(Slide, {"id": slide_id}, **values)
+    manager.invalidate(Slide)
+
+
+async def delete_slides(file_manager, manager, uow_class=UnitOfWork, **filters):
+    async with uow_class(manager) as uow:
+        slides = await manager.read(Slide, session=uow.session, **filters)
+        for slide in slides:
+            await manager.delete(Slide, id=slide["id"], session=uow.session)
+            if not slide["image_path"]:
+                continue
+            references = await manager.count(
+                Slide, image_path=slide["image_path"], session=uow.session
+            )
+            await file_manager.delete_slide(slide["image_path"], references)
+    manager.invalidate(Slide)
+    return slides
 
 
-async def delete_slides(file_manager):
-    await file_manager.delete_all_slides()
+async def get_slides_paths(manager, file_manager) -> tuple[str, ...]:
+    # активные слайды по порядку; записи кэшируются, наличие вариантов проверяется по индексу
+    slides = await manager.read(Slide, active=True, order_by="position")
+    return tuple(
+        file_manager.get_slides_image_path(slide["image_path"])
+        for slide in slides
+        if slide["image_path"]
+    )
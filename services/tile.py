@@ -1,15 +1,39 @@
+import asyncio
 import logging
-from typing import Any
+from collections import Counter
+from math import ceil
+from typing import Any, AsyncIterable
 
 from slugify import slugify
 
+from core.config import ADMIN_TILES_PER_PAGE, IMAGE_UPLOAD_CONCURRENCY
 from domain import *
+from services.image_jobs import enqueue_image_job
 from services.UoW import UnitOfWork
+from services.views import extract_quoted_word
 
 from .exceptions import FileStorageError
 
 log = logging.getLogger(__name__)
 
+# справочники, которые может пополнить добавление или изменение товара
+TILE_REFERENCE_MODELS = (TileSize, TileSurface, TileColor, Producer, Categories, Slug, Box)
+# таблица товаров в админке: колонки строки и поля поиска (артикул, название, производитель)
+ADMIN_TILE_COLUMNS = (
+    "id",
+    "name",
+    "producer_name",
+    "category_name",
+    "color_name",
+    "feature_name",
+    "surface_name",
+    "boxes_count",
+    "size.length",
+    "size.width",
+    "size.height",
+)
+ADMIN_SEARCH_FIELDS = ("id", "name", "producer_name")
+
 
 async def add_items(domain_model, manager, session, **filters):
     item = await manager.read(domain_model, **filters, session=session)
@@ -18,6 +42,51 @@ async def add_items(domain_model, manager, session, **filters):
     return item[0]
 
 
+async def find_collection_id(manager, tile_name: str, session=None) -> int | None:
+    # коллекция товара - слово в кавычках в его названии
+    collection_name = extract_quoted_word(tile_name)
+    if collection_name is None:
+        return None
+    return await manager.collection_id_by_name(collection_name, session=session)
+
+
+async def gather_all(*aws):
+    # в отличие от gather, дожидается всех задач и только потом поднимает первую ошибку:
+    # каждый сохранённый файл успевает попасть в FileSession и будет откачен
+    results = await asyncio.gather(*aws, return_exceptions=True)
+    for result in results:
+        if isinstance(result, BaseException):
+            raise result
+    return results
+
+
+async def save_tile_original(files, semaphore, file_name: str, img):
+    async with semaphore:
+        try:
+            return await files.save_original(file_name, "original_product", img)
+        except FileExistsError as exc:
+            log.debug("путь для %s уже занять", file_name)
+            raise FileStorageError(f"путь для {file_name} уже занять") from exc
+
+
+async def save_tile_variants(files, images_generator, semaphore, image_path):
+    # оригинал уже на диске: воркеру он передаётся прочитанным оттуда
+    async with semaphore:
+        miniatures = await images_generator.products_catalog_and_details(
+            await files.read(image_path)
+        )
+        try:
+            await gather_all(
+                *(
+                    files.save_variant(image_path.name, miniature, variant)
+                    for variant, miniature in miniatures.items()
+                )
+            )
+        except FileExistsError as exc:
+            log.debug("путь %s уже занять", image_path)
+            raise FileStorageError(f"путь {image_path} уже занять") from exc
+
+
 async def add_tile(
     name: str,
     length: Decimal,
@@ -28,10 +97,10 @@ async def add_tile(
     box_weight: Decimal,
     box_area: Decimal,
     boxes_count: int,
-    main_image: bytes,
+    main_image: bytes | AsyncIterable[bytes],
     category_name: str,
     manager,
-    images: list[bytes] | list,
+    images: list[bytes | AsyncIterable[bytes]] | list,
     images_generator,
     file_manager,
     color_feature: str = "",
@@ -60,6 +129,7 @@ async def add_tile(
         box = await add_items(
             Box, manager, uow.session, weight=box_weight, area=box_area
         )
+        collection_id = await find_collection_id(manager, name, uow.session)
         tile_record = await manager.create(
             Tile,
             name=name,
@@ -71,29 +141,73 @@ async def add_tile(
             producer_name=producer_name,
             box_id=box["id"],
             boxes_count=boxes_count,
+            collection_id=collection_id,
             session=uow.session,
         )
         images = [img for img in images if img]
         images.insert(0, main_image)
-        for n, img in enumerate(images):
-            file_name = str(tile_record["id"]) + "-" + str(n)  # type: ignore
-            image_path = file_manager.base_product_path(file_name)
-            await manager.create(
-                TileImages,
-                tile_id=tile_record["id"],  # type: ignore
-                image_path=str(image_path),
-                session=uow.session,
+        # все изображения товара обрабатываются параллельно; при ошибке любого из них
+        # FileSession удаляет все сохранённые файлы, а UoW откатывает записи в базе
+        semaphore = asyncio.Semaphore(IMAGE_UPLOAD_CONCURRENCY)
+        async with file_manager.session() as files:
+            originals = await gather_all(
+                *(
+                    save_tile_original(files, semaphore, f"{tile_record['id']}-{n}", img)
+                    for n, img in enumerate(images)
+                )
             )
-            try:
-                async with file_manager.session() as files:
-                    await files.save(image_path, img)
-                    miniatures = await images_generator.products_catalog_and_details(img)
-                    for layer, miniature in miniatures.items():
-                        await files.save_by_layer(file_name, miniature, layer)
-            except FileExistsError as exc:
-                log.debug("путь %s уже занять", image_path)
-                raise FileStorageError(f"путь {image_path} уже занять") from exc
-        return tile_record
+            for n, (image_path, stored) in enumerate(originals):
+                await manager.create(
+                    TileImages,
+                    tile_id=tile_record["id"],  # type: ignore
+                    image_path=str(image_path),
+                    position=n,
+                    session=uow.session,
+                )
+                # файл с тем же содержимым уже был: его варианты созданы раньше
+                if stored and images_generator is None:
+                    await enqueue_image_job(manager, "products", image_path, uow.session)
+            if images_generator is not None:
+                await gather_all(
+                    *(
+                        save_tile_variants(files, images_generator, semaphore, image_path)
+                        for image_path, stored in originals
+                        if stored
+                    )
+                )
+    manager.invalidate(*TILE_REFERENCE_MODELS)
+    return tile_record
+
+
+async def fetch_admin_tiles(
+    manager,
+    query: str = "",
+    page: int = 1,
+    per_page: int = ADMIN_TILES_PER_PAGE,
+    **filters,
+) -> dict:
+    # страница таблицы товаров админки; поиск и подсчёт выполняет база
+    search = (ADMIN_SEARCH_FIELDS, query.strip())
+    total = await manager.count(Tile, search=search, **filters)
+    pages = max(1, ceil(total / per_page))
+    page = min(max(page, 1), pages)
+    items = await manager.read(
+        Tile,
+        columns=ADMIN_TILE_COLUMNS,
+        as_dict=True,
+        search=search,
+        order_by="id",
+        limit=per_page,
+        offset=(page - 1) * per_page,
+        **filters,
+    )
+    return {
+        "items": list(items),
+        "total": total,
+        "page": page,
+        "pages": pages,
+        "per_page": per_page,
+    }
 
 
 async def delete_tile(manager, file_manager, uow_class=UnitOfWork, **filters):
@@ -101,11 +215,21 @@ async def delete_tile(manager, file_manager, uow_class=UnitOfWork, **filters):
         tiles = await manager.read(
             Tile, loaded=["images"], session=uow.session, **filters
         )
+        images_paths = {
+            image for tile in tiles for image in tile.get("images_paths", [])
+        }
+        # при адресации по содержимому один файл может принадлежать нескольким товарам
+        deleted_ids = {tile["id"] for tile in tiles}
+        references = Counter()
+        if images_paths:
+            for image in await manager.read(
+                TileImages, image_path=list(images_paths), session=uow.session
+            ):
+                if image["tile_id"] not in deleted_ids:
+                    references[image["image_path"]] += 1
         del_res = await manager.delete(Tile, session=uow.session, **filters)
-        for tile in tiles:
-            images_paths = tile.get("images_paths", [])
-            for image in images_paths:
-                await file_manager.delete_product(image)
+        for image in images_paths:
+            await file_manager.delete_product(image, references[image])
         return del_res
 
 
@@ -206,8 +330,13 @@ async def update_tile(
             domain_model = map_param_to_domain_model(k)
             if domain_model is Tile:
                 to_update.update({k: v})
+                if k == "name":
+                    to_update["collection_id"] = await find_collection_id(
+                        manager, v, uow.session
+                    )
                 continue
             updated_in_model = dict_for_update_model(k, v)
             updated_fields_in_tile = await create_new_model(manager, article, domain_model, uow.session, **updated_in_model)
             to_update.update(updated_fields_in_tile)
         await manager.update(Tile, session=uow.session, filters=dict(id=article), **to_update)
+    manager.invalidate(*TILE_REFERENCE_MODELS)
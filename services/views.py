@@ -1,11 +1,37 @@
+import base64
+import binascii
+import json
 import logging
 from decimal import Decimal
-from collections.abc import Sequence
 
-from domain import Categories, Slug, Tile, TileColor, TileSize
+from core.config import DB_INT_MAX, SEARCH_MAX_QUERY_LENGTH
+
+from domain import (Categories, Collections, Producer, Slug, Tile, TileColor,
+                    TileSize)
 
 log = logging.getLogger(__name__)
 
+# порядок товаров в каталоге, он же ключ курсора для постраничного чтения
+CATALOG_ORDER = "id"
+# колонки товара, которые нужны карточке листинга (ключи как в Catalog.model_dump)
+LISTING_COLUMNS = (
+    "id",
+    "name",
+    "size_id",
+    "size.length",
+    "size.width",
+    "size.height",
+    "color_name",
+    "feature_name",
+    "surface_name",
+    "producer_name",
+    "box_id",
+    "box.weight",
+    "box.area",
+    "boxes_count",
+    "category_name",
+)
+
 
 async def build_tile_filters(
     manager,
@@ -34,58 +60,57 @@ async def build_tile_filters(
     return filters
 
 
-def tiles_from_ids_collection(tiles: Sequence, collection:str):
-    tiles_ids = []
-    for tile in tiles:
-        if extract_quoted_word(tile["name"]) == collection:
-            tiles_ids.append(tile["id"])
-    return tiles_ids
+async def get_collection_id(manager, collection: str) -> int:
+    collection_name = (await manager.read(Slug, slug=collection))[0]["name"]
+    return (await manager.read(Collections, name=collection_name))[0]["id"]
+
+
+# колонки каталога, по которым строятся фильтры боковой панели
+CATALOG_FACETS = {
+    "sizes": ("size_id", "size.length", "size.width", "size.height"),
+    "colors": ("color_name",),
+    "producers": ("producer_name",),
+}
 
 
 async def build_data_for_filters(
-    manager, category: str | None = None, collection: str | None = None
+    manager,
+    category: str | None = None,
+    collection: str | None = None,
+    filters: dict | None = None,
 ):
-    category = (
-        (await manager.read(Slug, slug=category))[0]["name"] if category else None
-    )
-    tiles = await manager.read(Tile, loaded = ["size"], category_name=category)
-    log.debug("in category: %s, tiles: %s", category, len(tiles))
-    tiles_ids = None
+    filters = dict(filters) if filters else {}
+    if category is not None:
+        filters["category_name"] = (await manager.read(Slug, slug=category))[0]["name"]
     if collection is not None:
         log.debug("collection: %s", collection)
-        collection = ((await manager.read(Slug, slug=collection))[0]["name"]).lower()
-        tiles_ids = tiles_from_ids_collection(tiles, collection)
-
-    tile_ids_filter = dict(id=tiles_ids) if tiles_ids else {}
-    tile_sizes = await manager.read(Tile, loaded=["size"], distinct="size_id", category_name=category, **tile_ids_filter)
-    tile_colors = await manager.read(Tile, distinct="color_name", category_name=category, **tile_ids_filter)
-    producers = await manager.read(Tile, distinct="producer_name", category_name=category, **tile_ids_filter)
-    log.debug("size: %s, colors: %s, producers: %s", len(tile_sizes), len(tile_colors), len(producers))
-    producers = tuple(producer["producer_name"] for producer in producers)
+        filters["collection_id"] = await get_collection_id(manager, collection)
+
+    facets = await manager.facets(Tile, CATALOG_FACETS, **filters)
+    log.debug(
+        "size: %s, colors: %s, producers: %s",
+        len(facets["sizes"]),
+        len(facets["colors"]),
+        len(facets["producers"]),
+    )
     sizes = [
-        TileSize(
-            size_id=size["size_id"],
-            height=size["size_height"],
-            width=size["size_width"],
-            length=size["size_length"],
-        )
-        for size in tile_sizes
+        TileSize(size_id=size_id, length=length, width=width, height=height, count=count)
+        for size_id, length, width, height, count in facets["sizes"]
     ]
     colors = [
-        TileColor(color_name=color["color_name"], feature_name=color["feature_name"])
-        for color in tile_colors
+        TileColor(color_name=color_name, count=count)
+        for color_name, count in facets["colors"]
     ]
+    producers = tuple(
+        Producer(name=name, count=count) for name, count in facets["producers"]
+    )
     return sizes, colors, producers
 
 
 def build_main_images(tiles):
-    main_images = {}
-    for tile in tiles:
-        img = tile["images_paths"][0]
-        images_part = img.split("-")
-        images_part[-1] = "0"
-        main_images[tile["id"]] = "-".join(images_part)
-    return main_images
+    return {
+        tile["id"]: tile["main_image"] for tile in tiles if tile.get("main_image")
+    }
 
 
 def extract_quoted_word(name: str) -> str | None:
@@ -95,24 +120,110 @@ def extract_quoted_word(name: str) -> str | None:
     return None
 
 
+def encode_cursor(tile: dict, backward: bool = False) -> str:
+    payload = json.dumps({"key": [tile[CATALOG_ORDER]], "backward": backward})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[list, bool] | None:
+    try:
+        payload = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        data = json.loads(payload)
+        key, backward = data["key"], data["backward"]
+    except (binascii.Error, ValueError, KeyError, TypeError):
+        log.debug("некорректный курсор: %s", cursor)
+        return None
+    # ключ - ровно одно значение CATALOG_ORDER (id), иначе запрос упадёт уже в базе
+    if (
+        not isinstance(key, list)
+        or len(key) != 1
+        or type(key[0]) is not int
+        or not 0 <= key[0] <= DB_INT_MAX
+        or not isinstance(backward, bool)
+    ):
+        log.debug("некорректный курсор: %s", cursor)
+        return None
+    return key, backward
+
+
+async def attach_main_images(manager, items):
+    tiles_ids = [item["id"] for item in items]
+    main_images = await manager.main_images(tiles_ids) if tiles_ids else {}
+    for item in items:
+        item["main_image"] = main_images.get(item["id"])
+    return items
+
+
 async def fetch_items(manager, limit, offset, **filters):
-    total_items = await manager.read(Tile, loaded=["images", "size", "box"], **filters)
+    total_count = await manager.count(Tile, **filters)
+    items = await manager.read(
+        Tile,
+        columns=LISTING_COLUMNS,
+        as_dict=True,
+        limit=limit,
+        offset=offset,
+        order_by=CATALOG_ORDER,
+        **filters,
+    )
+    return await attach_main_images(manager, items), total_count
+
+
+async def search_items(manager, query: str, limit, page: int = 1):
+    # поиск по всему каталогу: ранжирование и страница считаются в базе;
+    # номер страницы за концом выдачи заменяется последней
+    query = query.strip()[:SEARCH_MAX_QUERY_LENGTH]
+    if not query:
+        return (), 0, 1
+    items, total_count = await manager.search_tiles(
+        query, columns=LISTING_COLUMNS, limit=limit, offset=(page - 1) * limit
+    )
+    page = min(page, max((total_count + limit - 1) // limit, 1))
+    return await attach_main_images(manager, items), total_count, page
+
+
+async def fetch_items_by_cursor(manager, limit, cursor: str, **filters):
+    # чтение по ключу вместо offset: цена страницы не зависит от её номера
+    seek, backward = decode_cursor(cursor)
+    total_count = await manager.count(Tile, **filters)
     items = await manager.read(
-        Tile, loaded=["images", "size", "box"], limit=limit, offset=offset, **filters
+        Tile,
+        columns=LISTING_COLUMNS,
+        as_dict=True,
+        limit=limit + 1,
+        order_by=CATALOG_ORDER,
+        seek=seek,
+        backward=backward,
+        **filters,
+    )
+    has_more = len(items) > limit
+    if has_more:
+        items = items[1:] if backward else items[:limit]
+    items = await attach_main_images(manager, items)
+    next_cursor = encode_cursor(items[-1]) if items and (has_more or backward) else None
+    prev_cursor = (
+        encode_cursor(items[0], backward=True)
+        if items and (has_more or not backward)
+        else None
     )
-    filters.pop("category_name", None)
-    total_count = len(total_items)
-    return items, total_count
+    return items, total_count, next_cursor, prev_cursor
 
 
-async def fetch_collections_items(manager, collection, limit, offset, **filters):
-    items = await manager.read(Tile, loaded=["images", "size", "box"], **filters)
-    collection = (await manager.read(Slug, slug=collection))[0]["name"].lower()
-    items = [item for item in items if extract_quoted_word(item["name"]) == collection]
-    total_count = len(items)
-    items = items[offset : offset + limit]
+async def fetch_page(manager, limit, offset, cursor: str | None = None, **filters):
+    if cursor is not None and decode_cursor(cursor) is not None:
+        return await fetch_items_by_cursor(manager, limit, cursor, **filters)
+    items, total_count = await fetch_items(manager, limit, offset, **filters)
+    next_cursor = (
+        encode_cursor(items[-1]) if items and offset + len(items) < total_count else None
+    )
+    prev_cursor = encode_cursor(items[0], backward=True) if items and offset else None
+    return items, total_count, next_cursor, prev_cursor
+
 
-    return items, total_count
+async def fetch_collections_items(
+    manager, collection, limit, offset, cursor: str | None = None, **filters
+):
+    filters["collection_id"] = await get_collection_id(manager, collection)
+    return await fetch_page(manager, limit, offset, cursor, **filters)
 
 
 async def get_categories_for_items(manager):
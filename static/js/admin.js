@@ -43,4 +43,118 @@ document.getElementById('delete-collection-btn').addEventListener('click', () =>
     collectionForm.action = "/admin/tiles/collections/delete";
     imageInput.required = false;
     categorySelect.required = false;
-});
\ No newline at end of file
+});
+// Список товаров: страница и поиск запрашиваются у /admin/api/tiles
+const tilesList = document.getElementById('tiles-list-items');
+const tilesTitle = document.getElementById('tiles-title');
+const tilesSearch = document.getElementById('tiles-search');
+const tilesPagination = document.getElementById('tiles-pagination');
+const tilesOptions = document.getElementById('tiles-list');
+let tilesRequest = null;
+
+function escapeHtml(value) {
+    const div = document.createElement('div');
+    div.textContent = value ?? '';
+    return div.innerHTML;
+}
+
+function renderTile(tile) {
+    return `
+        <div class="tile-item">
+            <div class="tile-info">
+                <strong>${tile.id}</strong>
+                <strong>${escapeHtml(tile.name)}</strong>
+                <span>Размер: ${tile.size_length} ${tile.size_width} ${tile.size_height}</span>
+            </div>
+            <div class="tile-actions">
+                <form method="post" action="/admin/tiles/delete">
+                    <input type="hidden" name="token_key" value="${escapeHtml(tilesList.dataset.csrf)}">
+                    <input type="hidden" name="tile_id" value="${tile.id}">
+                    <button type="submit" class="delete-btn"
+                            onclick="return confirm('Удалить товар?')">
+                        Удалить
+                    </button>
+                </form>
+            </div>
+        </div>`;
+}
+
+const PAGINATION_RADIUS = 2;  // страниц по обе стороны от текущей
+
+function pageWindow(current, total) {
+    // первая, последняя и соседние с текущей; null - пропуск между ними
+    const pages = [];
+    for (let page = 1; page <= total; page++) {
+        if (page === 1 || page === total || Math.abs(page - current) <= PAGINATION_RADIUS) {
+            pages.push(page);
+        } else if (pages[pages.length - 1] !== null) {
+            pages.push(null);
+        }
+    }
+    return pages;
+}
+
+function paginationButton(label, page, disabled) {
+    const button = document.createElement('button');
+    button.type = 'button';
+    button.textContent = label;
+    button.disabled = disabled;
+    button.addEventListener('click', () => loadTiles(page));
+    return button;
+}
+
+function renderPagination(data) {
+    tilesPagination.innerHTML = '';
+    if (data.pages <= 1) {
+        return;
+    }
+    tilesPagination.appendChild(paginationButton('«', data.page - 1, data.page === 1));
+    for (const page of pageWindow(data.page, data.pages)) {
+        if (page === null) {
+            const gap = document.createElement('span');
+            gap.textContent = '…';
+            tilesPagination.appendChild(gap);
+        } else {
+            tilesPagination.appendChild(paginationButton(page, page, page === data.page));
+        }
+    }
+    tilesPagination.appendChild(paginationButton('»', data.page + 1, data.page === data.pages));
+}
+
+async function loadTiles(page = 1) {
+    if (tilesRequest) {
+        tilesRequest.abort();
+    }
+    tilesRequest = new AbortController();
+    const params = new URLSearchParams({q: tilesSearch.value.trim(), page});
+    let data;
+    try {
+        const response = await fetch(`/admin/api/tiles?${params}`, {signal: tilesRequest.signal});
+        if (!response.ok) {
+            return;
+        }
+        data = await response.json();
+    } catch (error) {
+        if (error.name !== 'AbortError') {
+            console.error(error);
+        }
+        return;
+    }
+    tilesTitle.dataset.count = `${data.total} шт.`;
+    tilesTitle.textContent = `Список товаров - ${data.total} шт.`;
+    tilesList.innerHTML = data.items.length
+        ? data.items.map(renderTile).join('')
+        : '<p class="no-items">Товаров нет</p>';
+    tilesOptions.innerHTML = data.items
+        .map(tile => `<option value="${tile.id}">${escapeHtml(tile.name)}</option>`)
+        .join('');
+    renderPagination(data);
+}
+
+let searchTimer = null;
+tilesSearch.addEventListener('input', () => {
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(() => loadTiles(1), 300);
+});
+
+loadTiles();
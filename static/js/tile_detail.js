@@ -1,12 +1,21 @@
 document.addEventListener("DOMContentLoaded", () => {
     const mainImage = document.getElementById("main-image");
+    const mainPicture = mainImage.closest("picture");
     const thumbs = document.querySelectorAll(".thumbnail");
 
     thumbs.forEach(thumb => {
         const img = thumb.querySelector(".thumbnail-image");
 
         thumb.addEventListener("click", () => {
-            mainImage.src = img.src;
+            // форматы и ширины миниатюры переносятся в главный <picture> с его sizes
+            mainPicture.querySelectorAll("source").forEach(source => source.remove());
+            img.closest("picture").querySelectorAll("source").forEach(source => {
+                const copy = source.cloneNode();
+                copy.sizes = mainImage.sizes;
+                mainPicture.insertBefore(copy, mainImage);
+            });
+            mainImage.srcset = img.srcset;
+            mainImage.src = img.getAttribute("src");
 
             // снимаем подсветку со всех
             document.querySelectorAll(".thumbnail").forEach(t => {
@@ -1,7 +1,11 @@
 import logging
+from collections.abc import Collection
 
-from domain import Box, Collections, NotFoundError, TileImages, TileSize
+from domain import (Box, Collections, ImageJob, NotFoundError, Tile,
+                    TileImages, TileSize)
+from core.config import DB_INT_MAX
 from infrastructure.orm_mapper import DomainToOrmMapper
+from services.views import extract_quoted_word
 
 
 log = logging.getLogger(__name__)
@@ -31,10 +35,33 @@ class Table:
         return row
 
 
+def _match(row: dict, filters: dict) -> bool:
+    for k, v in filters.items():
+        if isinstance(v, Collection) and not isinstance(v, str):
+            if row.get(k) not in v:
+                return False
+        elif row.get(k) != v:
+            return False
+    return True
+
+
+def _search_match(row: dict, fields, term: str) -> bool:
+    for field in fields:
+        value = row.get(field)
+        if isinstance(value, int):
+            number = term.isascii() and term.isdecimal() and int(term) <= DB_INT_MAX
+            if number and value == int(term):
+                return True
+        elif value is not None and term.lower() in str(value).lower():
+            return True
+    return False
+
+
 class FakeCRUD:
     def __init__(self):
         self.tables = {}
         self._session_factory = None
+        self.invalidated: list[tuple] = []
 
     def _new_table(self, model):
         self.tables[model] = Table(DomainToOrmMapper.fields(model))
@@ -53,13 +80,115 @@ class FakeCRUD:
         #log.debug("create res: %s", res)
         return res
 
-    async def read(self, model, **kwargs):
-        ignored = {"limit", "offset", "loaded", "distinct", "session"}
+    async def read(
+        self,
+        model,
+        limit=None,
+        offset=None,
+        order_by=None,
+        seek=None,
+        backward=False,
+        columns=None,
+        as_dict=False,
+        search=None,
+        **kwargs,
+    ):
+        ignored = {"loaded", "distinct", "session"}
         table = self._get_table(model)
         filters = {k: v for k, v in kwargs.items() if k not in ignored}
-        return tuple(
-            r for r in table.rows if all(r.get(k) == v for k, v in filters.items())
-        )
+        rows = [r for r in table.rows if _match(r, filters)]
+        if search and search[1]:
+            rows = [r for r in rows if _search_match(r, *search)]
+        if order_by is not None:
+            # как и в Crud, порядок дополняется первичным ключом id, если он есть
+            keys = [order_by] + (["id"] if order_by != "id" and "id" in table.columns else [])
+            rows.sort(key=lambda r: [r[k] for k in keys], reverse=backward)
+            if seek is not None:
+                seek = list(seek)
+                rows = [
+                    r for r in rows
+                    if ([r[k] for k in keys] < seek if backward else [r[k] for k in keys] > seek)
+                ]
+        rows = rows[offset or 0:]
+        if limit:
+            rows = rows[:limit]
+        if backward:
+            rows = rows[::-1]
+        if columns:
+            keys = [column.replace(".", "_") for column in columns]
+            if as_dict:
+                return tuple({k: r.get(k) for k in keys} for r in rows)
+            return tuple(tuple(r.get(k) for k in keys) for r in rows)
+        return tuple(rows)
+
+    def invalidate(self, *models):
+        self.invalidated.append(models)
+
+    async def count(self, model, **kwargs) -> int:
+        return len(await self.read(model, **kwargs))
+
+    async def collection_id_by_name(self, name, **kwargs):
+        for row in self._get_table(Collections).rows:
+            if row["name"].lower() == name.lower():
+                return row["id"]
+        return None
+
+    async def link_tiles_to_collection(self, collection_id, name, **kwargs):
+        ids = [
+            row["id"]
+            for row in self._get_table(Tile).rows
+            if extract_quoted_word(row["name"]) == name.lower()
+        ]
+        if ids:
+            await self.update(Tile, {"id": ids}, collection_id=collection_id)
+        return ids
+
+    async def search_tiles(self, term, *, columns, limit, offset=0, **kwargs):
+        # вместо полнотекстового поиска - вхождение всех слов в название и производителя,
+        # по числу совпавших в названии; порядок при равенстве - по id
+        words = term.lower().split()
+        found = []
+        for row in self._get_table(Tile).rows:
+            name = str(row.get("name", "")).lower()
+            document = f"{name} {row.get('producer_name', '')}".lower()
+            if all(word in document for word in words):
+                found.append((-sum(word in name for word in words), row["id"]))
+        found.sort()
+        ids = [tile_id for _, tile_id in found]
+        offset = min(offset, max(len(ids) - 1, 0) // limit * limit)
+        page = ids[offset:offset + limit]
+        rows = {r["id"]: r for r in await self.read(Tile, id=page, columns=columns, as_dict=True)}
+        return tuple(rows[tile_id] for tile_id in page), len(ids)
+
+    async def main_images(self, tiles_ids, **kwargs) -> dict:
+        return {
+            row["tile_id"]: row["image_path"]
+            for row in self._get_table(TileImages).rows
+            if row["tile_id"] in tiles_ids and row["position"] == 0
+        }
+
+    async def claim_image_job(self, lease, **kwargs) -> dict | None:
+        # аренда в фейке не истекает: брошенные задачи не переназначаются
+        for row in self._get_table(ImageJob).rows:
+            if row["status"] == ImageJob.PENDING:
+                row.update(status=ImageJob.PROCESSING, attempts=row["attempts"] + 1)
+                return dict(row)
+        return None
+
+    async def facets(self, model, groups, **filters):
+        filters = {k: v for k, v in filters.items() if k != "session"}
+        rows = self._get_table(model).rows
+        result = {}
+        for name, paths in groups.items():
+            group_filters = {k: v for k, v in filters.items() if k not in paths}
+            counts: dict[tuple, int] = {}
+            for row in rows:
+                if _match(row, group_filters):
+                    # связанные колонки вида size.length в фейке хранятся плоско: size_length
+                    key = tuple(row.get(path.replace(".", "_")) for path in paths)
+                    counts[key] = counts.get(key, 0) + 1
+            result[name] = tuple(key + (count,) for key, count in counts.items())
+        return result
 
     async def update(self, model, filters, **values):
         ignored = {"session"}
@@ -67,7 +196,7 @@ class FakeCRUD:
         values = {k: v for k, v in values.items() if k not in ignored}
         table = self._get_table(model)
         for i in range(len(table.rows)):
-            if all(table.rows[i][f] == v for f, v in filters.items()):
+            if _match(table.rows[i], filters):
                 for k, v in values.items():
                     log.debug("column %s :: new value %s", k, v)
                     table.rows[i][k] = v
@@ -77,11 +206,9 @@ class FakeCRUD:
         filters = {k: v for k, v in filters.items() if k not in ignored}
 
         table = self._get_table(model)
-        del_res = []
-        for i in range(len(table.rows)):
-            if all(table.rows[i][f] == v for f, v in filters.items()):
-                del_res.append(table.rows[i])
-                del table.rows[i]
+        del_res = [r for r in table.rows if all(r[f] == v for f, v in filters.items())]
+        deleted = {id(r) for r in del_res}
+        table.rows[:] = [r for r in table.rows if id(r) not in deleted]
         if not del_res:
             raise NotFoundError(model, **filters)
         return tuple(del_res)
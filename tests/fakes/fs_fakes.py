@@ -9,8 +9,20 @@ class FakeStorage:
 
     async def save(self, path, data):
         #log.debug("save by path: %s", path)
+        if str(path) in self.storage:
+            raise FileExistsError(path)
+        if not isinstance(data, bytes):
+            data = b"".join([chunk async for chunk in data])
         self.storage[str(path)] = data
 
+    async def move(self, src, dst):
+        if str(dst) in self.storage:
+            raise FileExistsError(dst)
+        self.storage[str(dst)] = self.storage.pop(str(src))
+
+    async def read(self, path):
+        return self.storage[str(path)]
+
     async def delete(self, path):
         log.debug("delete by path: %s", path)
         del self.storage[str(path)]
@@ -4,9 +4,9 @@ from services.tile import add_tile
 from services.collections import add_collection
 
 
-async def add_tile_helper_with_control_filters(manager, file_manager, images_generator, test_uow_class: bool=True, need_params: bool=False, category_name=None, size: str = None, producer: str = None, color_name: str=None):
+async def add_tile_helper_with_control_filters(manager, file_manager, images_generator, test_uow_class: bool=True, need_params: bool=False, category_name=None, size: str = None, producer: str = None, color_name: str=None, name: str = None):
     params = dict(
-        name = "Tile",
+        name = name if name else "Tile",
         length = Decimal(300),
         width = Decimal(200),
         height = Decimal(10),
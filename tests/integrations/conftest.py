@@ -40,7 +40,9 @@ async def crud(request):
                 collections,
                 tile_surface,
                 slugs,
-                collection_category
+                collection_category,
+                image_jobs,
+                slides
                 
             RESTART IDENTITY CASCADE;
         """
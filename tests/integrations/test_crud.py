@@ -0,0 +1,99 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from core.config import IMAGE_JOB_MAX_ATTEMPTS
+from domain import ImageJob, Tile
+from services.image_jobs import enqueue_image_job
+from infrastructure.crud import Crud
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_count_with_equal_filter(products_env_with_tiles):
+    manager: Crud = await products_env_with_tiles({"category1": 3, "category2": 4})
+    assert await manager.count(Tile) == 7
+    assert await manager.count(Tile, category_name="category2") == 4
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_count_with_in_filter(products_env_with_tiles):
+    # фильтр-список превращается в IN так же, как и в read
+    manager: Crud = await products_env_with_tiles({"category1": 3, "category2": 4})
+    filters = dict(producer_name=["producer0", "producer1"], category_name="category2")
+    count = await manager.count(Tile, **filters)
+    assert count == len(await manager.read(Tile, **filters)) == 2
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_main_images_returns_first_image_of_each_tile(products_env_with_tiles):
+    manager: Crud = await products_env_with_tiles({"category1": 3})
+    tiles = await manager.read(Tile, loaded=["images"])
+    main_images = await manager.main_images([tile["id"] for tile in tiles])
+    assert main_images == {tile["id"]: tile["images_paths"][0] for tile in tiles}
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_claim_image_job_skips_job_locked_by_other_worker(crud):
+    first = await enqueue_image_job(crud, "products", "base/products/1-0")
+    second = await enqueue_image_job(crud, "products", "base/products/2-0")
+    async with crud.session_factory.begin() as session:
+        # первая задача заблокирована незавершённой транзакцией другого обработчика
+        claimed_first = await crud.claim_image_job(60, session=session)
+        claimed_second = await crud.claim_image_job(60)
+        assert claimed_first["id"] == first["id"]
+        assert claimed_second["id"] == second["id"]
+        assert claimed_second["status"] == ImageJob.PROCESSING
+        assert claimed_second["attempts"] == 1
+    assert await crud.claim_image_job(60) is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_claim_image_job_fails_expired_job_after_max_attempts(crud):
+    # обработчик умирал на задаче: после последней попытки она не выдаётся снова
+    expired = datetime.now(timezone.utc) - timedelta(minutes=1)
+    for path, attempts in (("base/products/1-0", IMAGE_JOB_MAX_ATTEMPTS), ("base/products/2-0", 1)):
+        await crud.create(
+            ImageJob,
+            kind="products",
+            source_path=path,
+            status=ImageJob.PROCESSING,
+            attempts=attempts,
+            last_error=None,
+            locked_until=expired,
+        )
+    claimed = await crud.claim_image_job(60)
+    assert claimed["source_path"] == "base/products/2-0" and claimed["attempts"] == 2
+    assert await crud.claim_image_job(60) is None
+    failed = await crud.read(ImageJob, source_path="base/products/1-0")
+    assert failed[0]["status"] == ImageJob.FAILED
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_search_tiles_full_text_with_sql_pagination(products_env_with_tiles):
+    # документ поиска заполняет триггер при добавлении товара
+    manager: Crud = await products_env_with_tiles({"category1": 3, "category2": 3})
+    columns = ("id", "name", "producer_name")
+    items, total = await manager.search_tiles("producer1", columns=columns, limit=1)
+    assert total == 2 and len(items) == 1
+    assert items[0]["producer_name"] == "producer1"
+    rest, _ = await manager.search_tiles("producer1", columns=columns, limit=1, offset=1)
+    assert rest[0]["id"] != items[0]["id"]
+    last, _ = await manager.search_tiles("producer1", columns=columns, limit=1, offset=10**20)
+    assert last == rest
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_search_tiles_falls_back_to_trigrams_on_typo(products_env_with_tiles):
+    manager: Crud = await products_env_with_tiles({"category1": 3})
+    items, total = await manager.search_tiles(
+        "prodcer2", columns=("id", "producer_name"), limit=10
+    )
+    assert total >= 1
+    assert items[0]["producer_name"] == "producer2"
@@ -0,0 +1,59 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.dialects import postgresql
+
+from core.config import ITEMS_PER_PAGE
+from domain import CollectionCategory, Slug, Tile, TileImages
+
+
+async def explain(manager, query) -> str:
+    sql = query.compile(
+        dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}
+    )
+    async with manager.session_factory.begin() as session:
+        # на маленькой тестовой таблице планировщик иначе выберет seq scan
+        await session.execute(text("SET LOCAL enable_seqscan = off"))
+        rows = await session.execute(text(f"EXPLAIN {sql}"))
+        return "\n".join(row[0] for row in rows)
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+@pytest.mark.parametrize(
+    "filters, index",
+    [
+        ({"category_name": "category1"}, "ix_catalog_category_name_id"),
+        (
+            {"category_name": "category1", "producer_name": "producer1"},
+            "ix_catalog_category_name_producer_name_id",
+        ),
+        (
+            {"category_name": "category1", "color_name": "color1"},
+            "ix_catalog_category_name_color_name_id",
+        ),
+        (
+            {"category_name": "category1", "size_id": 1},
+            "ix_catalog_category_name_size_id_id",
+        ),
+    ],
+)
+async def test_catalog_listing_uses_index(products_env_with_tiles, filters, index):
+    manager = await products_env_with_tiles({"category1": 3, "category2": 3})
+    query = manager.build_read_query(Tile, limit=ITEMS_PER_PAGE, **filters)
+    assert index in await explain(manager, query)
+
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+@pytest.mark.parametrize(
+    "domain_model, filters, index",
+    [
+        (TileImages, {"tile_id": [1, 2]}, "ix_tile_images_tile_id"),
+        (CollectionCategory, {"category_name": "category1"}, "ix_collection_category_category_name"),
+        (Slug, {"slug": "category1"}, "ix_slugs_slug"),
+    ],
+)
+async def test_lookup_uses_index(products_env_with_tiles, domain_model, filters, index):
+    manager = await products_env_with_tiles({"category1": 3})
+    query = manager.build_read_query(domain_model, **filters)
+    assert index in await explain(manager, query)
@@ -5,6 +5,7 @@ from domain import Slug
 #from .conftest import products_env_with_tiles, products_env
 
 @pytest.mark.asyncio
+@pytest.mark.integration
 async def test_build_data_for_filters_catalog_with_categories_when_exists_handbooks_not_exists_items(
     products_env,
 ):
@@ -19,6 +20,7 @@ async def test_build_data_for_filters_catalog_with_categories_when_exists_handbo
 
 
 @pytest.mark.asyncio
+@pytest.mark.integration
 async def test_build_data_for_filters_with_category(
     products_env_with_tiles,
 ):
@@ -30,6 +32,7 @@ async def test_build_data_for_filters_with_category(
 
 
 @pytest.mark.asyncio
+@pytest.mark.integration
 async def test_build_data_for_filters_with_category_and_collection(
     products_env_with_tiles,
 ):
@@ -41,4 +44,20 @@ async def test_build_data_for_filters_with_category_and_collection(
     sizes1, colors1, producers1 = await build_data_for_filters(manager, category=category1_slug)
     sizes2, colors2, producers2 = await build_data_for_filters(manager, category=category2_slug)
     assert len(sizes1) == len(colors1) == len(producers1) == 7
-    assert len(sizes2) == len(colors2) == len(producers2) == 4
\ No newline at end of file
+    assert len(sizes2) == len(colors2) == len(producers2) == 4
+
+@pytest.mark.asyncio
+@pytest.mark.integration
+async def test_build_data_for_filters_counts_and_active_filters(
+    products_env_with_tiles,
+):
+    categories = {"category1": 3}
+    manager = await products_env_with_tiles(categories)
+    category_slug = (await manager.read(Slug, name="category1"))[0]["slug"]
+    sizes, colors, producers = await build_data_for_filters(
+        manager, category=category_slug, filters={"producer_name": "producer1"}
+    )
+    # фильтр производителей не сужается своим же значением, остальные сужаются
+    assert [p.count for p in producers] == [1, 1, 1]
+    assert [c.color_name for c in colors] == ["color1"]
+    assert len(sizes) == 1 and sizes[0].count == 1
@@ -6,6 +6,7 @@ from domain import (Box, Categories, CollectionCategory, Collections, Producer,
                     Slug, Tile, TileColor, TileImages, TileSize, TileSurface)
 from services.tile import add_tile
 from tests.fakes import FakeCRUD, FakeUoW, FakeStorage
+from infrastructure.files import FileIndex
 from infrastructure.images import ProductImagesManager, CollectionImagesManager, SlideImagesManager
 
 
@@ -72,7 +73,7 @@ def crud():
 @pytest.fixture
 async def products_env(crud):
     fs = {}
-    file_manager = ProductImagesManager(root="tests/images", storage=FakeStorage(fs))
+    file_manager = ProductImagesManager(root="tests/images", storage=FakeStorage(fs), index=FileIndex())
     return crud, file_manager, fs
 
 
@@ -93,6 +94,13 @@ async def products_env_with_handbooks(products_env):
 @pytest.fixture
 async def collection_env(crud):
     fs = {}
-    file_manager = CollectionImagesManager(root="tests/images", storage=FakeStorage(fs))
+    file_manager = CollectionImagesManager(root="tests/images", storage=FakeStorage(fs), index=FileIndex())
+    return crud, file_manager, fs
+
+
+@pytest.fixture
+async def slides_env(crud):
+    fs = {}
+    file_manager = SlideImagesManager(root="tests/images", storage=FakeStorage(fs), index=FileIndex())
     return crud, file_manager, fs
 
@@ -0,0 +1,107 @@
+import pytest
+
+from domain import Producer, Tile
+from infrastructure.cache import TTLCache
+from infrastructure.crud import CachedCrud, Crud
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_ttl_cache_expires():
+    clock = FakeClock()
+    cache = TTLCache(ttl=10, clock=clock)
+    cache.set("key", "value")
+    clock.now = 9
+    assert cache.get("key") == "value"
+    clock.now = 10
+    assert cache.get("key") is None
+    assert len(cache) == 0
+
+
+def test_ttl_cache_invalidate_by_predicate():
+    cache = TTLCache(ttl=10)
+    cache.set(("a", 1), 1)
+    cache.set(("b", 1), 2)
+    cache.invalidate(lambda key: key[0] == "a")
+    assert cache.get(("a", 1)) is None and cache.get(("b", 1)) == 2
+
+
+def test_ttl_cache_bounded_and_drops_expired_on_write():
+    clock = FakeClock()
+    cache = TTLCache(ttl=10, clock=clock, max_entries=2)
+    for key in "abc":
+        cache.set(key, key)
+    # самая старая запись вытеснена
+    assert len(cache) == 2 and cache.get("a") is None
+    clock.now = 10
+    cache.set("d", "d")
+    # истёкшие записи удаляются при записи, даже если их больше не читают
+    assert len(cache) == 1 and cache.get("d") == "d"
+
+
+@pytest.fixture
+def cached_crud(monkeypatch):
+    # подменяется только обращение к базе, логика кэша остаётся настоящей
+    calls = []
+
+    async def fake_read(self, domain_model, *, session=None, **kwargs):
+        calls.append((domain_model, session, kwargs))
+        return ({"name": "producer"},)
+
+    monkeypatch.setattr(Crud, "read", fake_read)
+    return CachedCrud("url", cached_models=(Producer,)), calls
+
+
+@pytest.mark.asyncio
+async def test_cached_crud_reads_reference_data_once(cached_crud):
+    manager, calls = cached_crud
+    first = await manager.read(Producer, name=["producer"])
+    first[0]["name"] = "changed"
+    second = await manager.read(Producer, name=["producer"])
+    assert second == ({"name": "producer"},)
+    assert len(calls) == 1
+
+
+@pytest.mark.asyncio
+async def test_cached_crud_skips_cache_in_session_and_for_other_models(cached_crud):
+    manager, calls = cached_crud
+    await manager.read(Producer, session="session")
+    await manager.read(Producer, session="session")
+    await manager.read(Tile)
+    await manager.read(Tile)
+    assert len(calls) == 4
+
+
+@pytest.mark.asyncio
+async def test_cached_crud_invalidate(cached_crud):
+    manager, calls = cached_crud
+    await manager.read(Producer)
+    manager.invalidate(Producer)
+    await manager.read(Producer)
+    manager.invalidate()
+    await manager.read(Producer)
+    assert len(calls) == 3
+
+
+@pytest.mark.asyncio
+async def test_cached_crud_skips_empty_results_and_row_tuples(monkeypatch):
+    calls = []
+
+    async def fake_read(self, domain_model, *, session=None, **kwargs):
+        calls.append(kwargs)
+        if kwargs.get("columns") and not kwargs.get("as_dict"):
+            return (("producer",),)
+        return () if kwargs.get("name") == "missing" else ({"name": "producer"},)
+
+    monkeypatch.setattr(Crud, "read", fake_read)
+    manager = CachedCrud("url", cached_models=(Producer,))
+    for _ in range(2):
+        assert await manager.read(Producer, name="missing") == ()
+        assert await manager.read(Producer, columns=("name",)) == (("producer",),)
+    assert len(calls) == 4 and len(manager._cache) == 0
@@ -2,12 +2,13 @@ import logging
 
 import pytest
 
-from domain import CollectionCategory, Collections, NotFoundError, Slug
+from domain import CollectionCategory, Collections, NotFoundError, Slug, Tile
+from infrastructure.images import ProductImagesManager
 from services.collections import delete_collection
-from tests.fakes import FakeUoW, FakeImageGenerator
+from tests.fakes import FakeUoW, FakeImageGenerator, FakeStorage
 from .helpers import collection_catalog_path
 #from .conftest import collection_env
-from tests.helpers import add_collection_helper
+from tests.helpers import add_collection_helper, add_tile_helper_with_control_filters
 
 log = logging.getLogger(__name__)
 
@@ -97,3 +98,20 @@ async def test_delete_collection_fail(collection_env):
             uow_class=FakeUoW,
             file_manager=file_manager,
         )
+
+
+@pytest.mark.asyncio
+async def test_create_collection_links_existing_tiles(collection_env):
+    # товары, созданные до коллекции, привязываются к ней при её создании
+    manager, file_manager, fs = collection_env
+    products_manager = ProductImagesManager(root="tests/images", storage=FakeStorage(fs))
+    in_collection = await add_tile_helper_with_control_filters(
+        manager, products_manager, FakeImageGenerator(), name='Tile "COLLECTION1"'
+    )
+    other = await add_tile_helper_with_control_filters(
+        manager, products_manager, FakeImageGenerator(), name='Tile "collection2"'
+    )
+    collection = await add_collection_helper(manager, file_manager, FakeImageGenerator())
+    tiles = await manager.read(Tile, collection_id=collection["id"])
+    assert [tile["id"] for tile in tiles] == [in_collection["id"]]
+    assert (await manager.read(Tile, id=other["id"]))[0]["collection_id"] is None
@@ -1,5 +1,14 @@
+import asyncio
+import os
+import shutil
+import time
+from pathlib import Path
+
 import pytest
 from tests.fakes import FakeStorage
+from core.config import FILE_TEMP_MAX_AGE
+from infrastructure.files import (FileIndex, FileSystemStorage,
+                                  run_file_index_refresh)
 from infrastructure.images import ProductImagesManager
 
 
@@ -15,4 +24,199 @@ async def test_files_session_remove_exists_files_when_raises():
             assert len(fs) == 3
             raise Exception
     except Exception:
-        assert not fs
\ No newline at end of file
+        assert not fs
+
+@pytest.mark.asyncio
+async def test_catalog_image_path_follows_saved_and_deleted_layers(monkeypatch):
+    index = FileIndex()
+    file_manager = ProductImagesManager(
+        root="tests/images", storage=FakeStorage({}), index=index
+    )
+    base_path = file_manager.base_product_path("1-0")
+    assert file_manager.get_product_catalog_image_path(base_path) == str(base_path)
+    await file_manager.save(base_path, b"1")
+    await file_manager.save_by_layer("1-0", b"1", "products")
+    await file_manager.save_by_layer("1-0", b"1", "details")
+    # после первого чтения каталога проверки идут только по индексу
+    monkeypatch.setattr(os, "scandir", None)
+    catalog_path = file_manager.resolve_path("1-0", "products")
+    assert file_manager.get_product_catalog_image_path(base_path) == str(catalog_path)
+    await file_manager.delete_product(base_path)
+    assert file_manager.get_product_catalog_image_path(base_path) == str(base_path)
+
+
+@pytest.mark.asyncio
+async def test_file_index_reads_disk_only_on_refresh(tmp_path, monkeypatch):
+    (tmp_path / "a").write_bytes(b"a")
+    index = FileIndex()
+    assert await index.refresh([tmp_path])
+    assert not await index.refresh()
+    (tmp_path / "b").write_bytes(b"b")
+    monkeypatch.setattr(os, "scandir", None)
+    # проверки идут по памяти: файл другого процесса виден только после refresh
+    assert index.exists(tmp_path / "a")
+    assert not index.exists(tmp_path / "b")
+    assert not index.exists(tmp_path / "unknown" / "c")
+    monkeypatch.undo()
+    index.discard(tmp_path / "a")
+    assert await index.refresh()
+    assert index.exists(tmp_path / "a") and index.exists(tmp_path / "b")
+
+
+@pytest.mark.asyncio
+async def test_file_index_refresh_sweeps_stale_temp_files(tmp_path):
+    (tmp_path / "img.jpg").write_bytes(b"1")
+    stale = tmp_path / ".img.jpg.0a1b.tmp"
+    stale_upload = tmp_path / ".img.jpg.upload"
+    fresh = tmp_path / ".img2.jpg.2c3d.tmp"
+    for path in (stale, stale_upload, fresh):
+        path.write_bytes(b"partial")
+    old = time.time() - FILE_TEMP_MAX_AGE - 60
+    os.utime(stale, (old, old))
+    os.utime(stale_upload, (old, old))
+    index = FileIndex()
+    await index.refresh([tmp_path])
+    # запись, которая ещё идёт, не трогается, но и в индекс не попадает
+    assert sorted(os.listdir(tmp_path)) == [fresh.name, "img.jpg"]
+    assert index.exists(tmp_path / "img.jpg")
+    assert not index.exists(fresh)
+
+
+@pytest.mark.asyncio
+async def test_file_index_refresh_keeps_changes_made_during_scan(tmp_path, monkeypatch):
+    (tmp_path / "old").write_bytes(b"1")
+    index = FileIndex()
+    await index.refresh([tmp_path])
+    scan = FileIndex._scan
+
+    def scan_while_saving(directory):
+        # файл записан и другой удалён, пока каталог читался в потоке
+        index.add(tmp_path / "new")
+        index.discard(tmp_path / "old")
+        return scan(directory)
+
+    monkeypatch.setattr(index, "_scan", scan_while_saving)
+    await index.refresh()
+    assert index.exists(tmp_path / "new") and not index.exists(tmp_path / "old")
+
+
+@pytest.mark.asyncio
+async def test_format_variants_saved_as_siblings_and_deleted_with_layers():
+    fs = {}
+    file_manager = ProductImagesManager(
+        root="tests/images", storage=FakeStorage(fs), index=FileIndex()
+    )
+    base_path = file_manager.base_product_path("1-0")
+    await file_manager.save(base_path, b"1")
+    variants = ("products", "products.webp", "products@320", "products@320.webp", "details")
+    for variant in variants:
+        await file_manager.save_variant("1-0", b"1", variant)
+    catalog_path = file_manager.get_product_catalog_image_path(base_path)
+    assert file_manager.image_sources(catalog_path) == [
+        ("image/webp", f"/{catalog_path}_320w.webp 320w, /{catalog_path}.webp 640w"),
+        ("image/jpeg", f"/{catalog_path}_320w 320w, /{catalog_path} 640w"),
+    ]
+    assert await file_manager.delete_product(base_path) == 6
+    assert fs == {}
+
+
+@pytest.mark.asyncio
+async def test_content_addressed_files_shared_until_last_reference():
+    fs = {}
+    file_manager = ProductImagesManager(
+        root="tests/images", storage=FakeStorage(fs), index=FileIndex(), content_addressed=True
+    )
+    png = b"\x89PNG\r\n\x1a\n" + b"1"
+    base_path, stored = await file_manager.save_original("1-0", "original_product", png)
+    assert stored and base_path.suffix == ".png"
+    assert await file_manager.save_original("2-0", "original_product", png) == (base_path, False)
+    await file_manager.save_variant(base_path.name, b"1", "products")
+    await file_manager.save_variant(base_path.name, b"1", "products@320.webp")
+    await file_manager.save_variant(base_path.name, b"1", "details")
+    catalog_path = file_manager.get_product_catalog_image_path(base_path)
+    assert catalog_path == str(file_manager.resolve_path(f"{base_path.stem}.jpg", "products"))
+    assert file_manager.image_sources(catalog_path)[0] == (
+        "image/webp", f"/{file_manager.resolve_path(base_path.stem + '_320w.webp', 'products')}"
+    )
+    assert await file_manager.delete_product(base_path, references=1) == 0
+    assert len(fs) == 4
+    assert await file_manager.delete_product(base_path) == 4
+    assert fs == {}
+
+
+async def chunks(*parts: bytes):
+    for part in parts:
+        yield part
+
+
+@pytest.mark.asyncio
+async def test_stream_saved_atomically_without_overwrite(tmp_path):
+    file_manager = ProductImagesManager(root=str(tmp_path), index=FileIndex())
+    path, stored = await file_manager.save_original("1-0", "original_product", chunks(b"a", b"b"))
+    assert stored and path.read_bytes() == b"ab"
+    with pytest.raises(FileExistsError):
+        await file_manager.save_original("1-0", "original_product", chunks(b"c"))
+    assert path.read_bytes() == b"ab"
+    assert os.listdir(path.parent) == [path.name]
+
+
+@pytest.mark.asyncio
+async def test_content_addressed_stream_named_by_hash(tmp_path):
+    file_manager = ProductImagesManager(
+        root=str(tmp_path), index=FileIndex(), content_addressed=True
+    )
+    jpeg = b"\xff\xd8\xff" + b"1" * 100
+    path, stored = await file_manager.save_original("1-0", "original_product", chunks(jpeg[:2], jpeg[2:]))
+    assert stored and path.suffix == ".jpg"
+    again = await file_manager.save_original("2-0", "original_product", chunks(jpeg))
+    assert again == (path, False)
+    assert os.listdir(path.parent) == [path.name]
+
+
+@pytest.mark.asyncio
+async def test_atomic_write_leaves_no_partial_file(tmp_path):
+    storage = FileSystemStorage(fsync=True)
+
+    async def broken():
+        yield b"half"
+        raise ConnectionError
+
+    with pytest.raises(ConnectionError):
+        await storage.save(tmp_path / "a" / "img", broken())
+    assert os.listdir(tmp_path / "a") == []
+    await storage.save(tmp_path / "a" / "img", b"full")
+    assert (tmp_path / "a" / "img").read_bytes() == b"full"
+
+
+@pytest.mark.asyncio
+async def test_directory_created_once_and_again_after_removal(tmp_path, monkeypatch):
+    storage = FileSystemStorage()
+    calls = []
+    mkdir = Path.mkdir
+    monkeypatch.setattr(Path, "mkdir", lambda self, *a, **kw: calls.append(self) or mkdir(self, *a, **kw))
+    await storage.save(tmp_path / "a" / "1", b"1")
+    await storage.save(tmp_path / "a" / "2", b"2")
+    assert calls == [tmp_path / "a"]
+    shutil.rmtree(tmp_path / "a")
+    await storage.save(tmp_path / "a" / "3", b"3")
+    assert (tmp_path / "a" / "3").read_bytes() == b"3"
+
+
+@pytest.mark.asyncio
+async def test_file_index_refresh_task_reports_files_of_other_workers(tmp_path):
+    index = FileIndex()
+    await index.refresh([tmp_path])
+    bumped = asyncio.Event()
+
+    async def on_change():
+        bumped.set()
+
+    task = asyncio.create_task(
+        run_file_index_refresh([tmp_path], index, interval=0.01, on_change=on_change)
+    )
+    try:
+        (tmp_path / "products.webp").write_bytes(b"1")
+        await asyncio.wait_for(bumped.wait(), 1)
+        assert index.exists(tmp_path / "products.webp")
+    finally:
+        task.cancel()
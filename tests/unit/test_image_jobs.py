@@ -0,0 +1,62 @@
+import pytest
+
+from core.config import IMAGE_JOB_MAX_ATTEMPTS
+from domain import ImageJob
+from services.exceptions import ImageProcessingError
+from services.image_jobs import run_next_image_job
+from tests.fakes import FakeImageGenerator
+from tests.helpers import add_collection_helper, add_tile_helper
+
+from .helpers import collection_catalog_path, product_catalog_path
+
+
+class FailingImageGenerator(FakeImageGenerator):
+    async def products_catalog_and_details(self, img: bytes):
+        raise ImageProcessingError("Ошибка генерации")
+
+
+async def run_all_jobs(manager, images_generator, file_manager, kind="products"):
+    while await run_next_image_job(manager, images_generator, {kind: file_manager}):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_tile_upload_saves_originals_and_enqueues_jobs(products_env):
+    manager, file_manager, fs = products_env
+    tile = await add_tile_helper(manager, file_manager, None)
+    # до обработки очереди на диске только оригиналы, страницы показывают их
+    assert len(fs) == 3
+    jobs = await manager.read(ImageJob)
+    assert [job["status"] for job in jobs] == [ImageJob.PENDING] * 3
+    main_path = file_manager.base_product_path(f"{tile['id']}-0")
+    assert file_manager.get_product_catalog_image_path(main_path) == str(main_path)
+
+    await run_all_jobs(manager, FakeImageGenerator(), file_manager)
+    assert len(fs) == 9
+    assert str(product_catalog_path(file_manager)(f"{tile['id']}-0")) in fs
+    jobs = await manager.read(ImageJob)
+    assert [job["status"] for job in jobs] == [ImageJob.DONE] * 3
+
+
+@pytest.mark.asyncio
+async def test_collection_upload_enqueues_job(collection_env):
+    manager, file_manager, fs = collection_env
+    collection = await add_collection_helper(manager, file_manager, None)
+    assert len(fs) == 1
+    await run_all_jobs(manager, FakeImageGenerator(), file_manager, "collections")
+    assert str(collection_catalog_path(file_manager)(str(collection["id"]))) in fs
+
+
+@pytest.mark.asyncio
+async def test_failed_job_is_retried_then_marked_failed(products_env):
+    manager, file_manager, fs = products_env
+    await add_tile_helper(manager, file_manager, None)
+    for _ in range(IMAGE_JOB_MAX_ATTEMPTS * 3):
+        await run_next_image_job(
+            manager, FailingImageGenerator(), {"products": file_manager}
+        )
+    jobs = await manager.read(ImageJob)
+    assert all(job["status"] == ImageJob.FAILED for job in jobs)
+    assert all(job["attempts"] == IMAGE_JOB_MAX_ATTEMPTS for job in jobs)
+    assert all(job["last_error"] for job in jobs)
+    assert len(fs) == 3
@@ -0,0 +1,138 @@
+import re
+import time
+from io import BytesIO
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+from PIL import Image
+
+import image_worker
+from core.config import IMAGE_SERVICE_TIMEOUT
+from core.multipart import decode_parts, encode_parts, multipart_content_type
+from infrastructure.http_client import MyExternalApiForBot
+
+
+def test_multipart_round_trip_keeps_binary_parts():
+    boundary = "b0undary"
+    parts = {"products": b"\r\n--b0und\x00\xff", "details": b""}
+    body = b"".join(encode_parts(boundary, parts.items()))
+    assert decode_parts(body, multipart_content_type(boundary)) == parts
+
+
+def test_multipart_rejects_truncated_body():
+    boundary = "b0undary"
+    body = b"".join(encode_parts(boundary, [("products", b"123")]))
+    with pytest.raises(ValueError):
+        decode_parts(body[:-10], multipart_content_type(boundary))
+
+
+@pytest.mark.asyncio
+async def test_binary_endpoint_returns_one_part_per_target():
+    buf = BytesIO()
+    Image.new("RGB", (1280, 800), "red").save(buf, format="JPEG")
+    client = MyExternalApiForBot("http://worker", app=image_worker.app)
+    client.connect()
+    try:
+        images = await client.generate_images_binary(
+            buf.getvalue(), ("products", "details")
+        )
+    finally:
+        await client.close()
+    assert {"products", "details", "products.webp", "details.webp"} <= images.keys()
+    with Image.open(BytesIO(images["products"])) as img:
+        assert img.size == (640, 400)
+        assert img.format == "JPEG"
+
+
+@pytest.mark.asyncio
+async def test_large_source_finishes_within_client_timeout():
+    buf = BytesIO()
+    Image.linear_gradient("L").resize((4500, 3000)).convert("RGB").save(
+        buf, format="JPEG", quality=90
+    )
+    client = MyExternalApiForBot("http://worker", app=image_worker.app)
+    client.connect()
+    started = time.monotonic()
+    try:
+        images = await client.generate_images_binary(
+            buf.getvalue(), ("products", "details")
+        )
+    finally:
+        await client.close()
+    elapsed = time.monotonic() - started
+    # ASGI-транспорт не применяет таймауты, поэтому сравнение явное
+    assert elapsed < IMAGE_SERVICE_TIMEOUT
+    assert len(images) == 7 * len(image_worker.IMAGE_FORMATS)
+
+
+def test_client_timeout_is_sized_for_ladder():
+    client = MyExternalApiForBot("http://worker")
+    client.connect()
+    assert client._client.timeout.read == IMAGE_SERVICE_TIMEOUT
+
+
+@pytest.mark.asyncio
+async def test_binary_endpoint_labels_parts_with_their_format():
+    buf = BytesIO()
+    Image.new("RGB", (1280, 800), "red").save(buf, format="JPEG")
+    async with AsyncClient(
+        transport=ASGITransport(app=image_worker.app), base_url="http://worker"
+    ) as client:
+        resp = await client.post(
+            "/generate-images/binary",
+            content=buf.getvalue(),
+            params={"targets": ["products"]},
+        )
+    labels = dict(
+        re.findall(rb'name="([^"]+)"\r\nContent-Type: ([^\r]+)', resp.content)
+    )
+    assert labels[b"products"] == b"image/jpeg"
+    assert labels[b"products.webp"] == b"image/webp"
+    if "AVIF" in image_worker.IMAGE_FORMATS:
+        assert labels[b"products.avif"] == b"image/avif"
+
+
+def test_variants_decode_once_and_match_presets():
+    buf = BytesIO()
+    Image.new("RGB", (6000, 4000), "blue").save(buf, format="JPEG")
+    images = image_worker.generate_image_variants(
+        buf.getvalue(), ("products", "details", "slides")
+    )
+    sizes = {}
+    for variant, data in images.items():
+        with Image.open(BytesIO(data)) as img:
+            sizes[variant] = img.size
+    expected = {
+        "products": (640, 400),
+        "products@320": (320, 200),
+        "products@960": (960, 600),
+        "details": (2400, 1600),
+        "details@640": (640, 427),
+        "details@1280": (1280, 853),
+        "details@1920": (1920, 1280),
+        "slides": (1100, 825),
+        "slides@550": (550, 412),
+        "slides@1650": (1650, 1238),
+    }
+    # каждая ступень есть во всех форматах и одного размера
+    assert sizes == {
+        name if img_format == "JPEG" else f"{name}.{img_format.lower()}": size
+        for name, size in expected.items()
+        for img_format in image_worker.IMAGE_FORMATS
+    }
+
+
+def test_variants_keep_small_image_size():
+    buf = BytesIO()
+    Image.new("RGB", (300, 200), "blue").save(buf, format="PNG")
+    images = image_worker.generate_image_variants(buf.getvalue(), ("products",))
+    with Image.open(BytesIO(images["products"])) as img:
+        assert img.size == (300, 200)
+
+
+def test_variants_include_webp_sibling():
+    buf = BytesIO()
+    Image.new("RGB", (1280, 800), "green").save(buf, format="JPEG")
+    images = image_worker.generate_image_variants(buf.getvalue(), ("products",))
+    with Image.open(BytesIO(images["products.webp"])) as img:
+        assert img.format == "WEBP"
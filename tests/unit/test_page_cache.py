@@ -0,0 +1,121 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse
+from fastapi.testclient import TestClient
+
+import infrastructure.page_cache as page_cache_module
+from infrastructure.page_cache import (FilePageBackend, MemoryPageBackend,
+                                       PageCache, cached_page)
+
+
+def entry(body: bytes) -> dict:
+    return {"body": body, "etag": '"etag"', "media_type": "text/html", "created_at": 0}
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryPageBackend(max_entries=2, max_bytes=100)
+    await backend.set("a", entry(b"a"))
+    await backend.set("b", entry(b"b"))
+    await backend.get("a")
+    await backend.set("c", entry(b"c"))
+    assert await backend.get("b") is None
+    assert await backend.get("a") is not None and await backend.get("c") is not None
+
+
+@pytest.mark.asyncio
+async def test_memory_backend_respects_bytes_limit():
+    backend = MemoryPageBackend(max_entries=10, max_bytes=5)
+    await backend.set("a", entry(b"aaa"))
+    await backend.set("b", entry(b"bbb"))
+    assert await backend.get("a") is None and await backend.get("b") is not None
+
+
+@pytest.mark.asyncio
+async def test_file_backend_shared_between_instances(tmp_path):
+    # два экземпляра на одном каталоге ведут себя как два воркера
+    first, second = FilePageBackend(tmp_path), FilePageBackend(tmp_path)
+    await first.set("key", entry(b"<html>"))
+    assert (await second.get("key"))["body"] == b"<html>"
+    version = await second.get_version()
+    await first.bump_version()
+    assert await second.get_version() != version
+
+
+@pytest.fixture
+def client(monkeypatch):
+    calls = []
+    monkeypatch.setattr(page_cache_module, "_page_cache", PageCache(MemoryPageBackend()))
+    app = FastAPI()
+
+    @app.get("/catalog")
+    @cached_page("page", "producer")
+    async def catalog(request: Request, page: int = 1, producer: str | None = None):
+        calls.append(page)
+        return HTMLResponse(f"page {page} {producer!r}")
+
+    return TestClient(app), calls
+
+
+def test_cached_page_renders_once_per_key(client):
+    test_client, calls = client
+    assert test_client.get("/catalog?page=2&utm=1").text == "page 2 None"
+    assert test_client.get("/catalog?utm=2&page=2").text == "page 2 None"
+    test_client.get("/catalog?page=3")
+    assert calls == [2, 3]
+
+
+def test_cached_page_etag_not_modified(client):
+    test_client, calls = client
+    etag = test_client.get("/catalog").headers["etag"]
+    response = test_client.get("/catalog", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert calls == [1]
+
+
+@pytest.mark.asyncio
+async def test_bump_version_invalidates_pages(client):
+    test_client, calls = client
+    test_client.get("/catalog")
+    await page_cache_module.get_page_cache().bump_version()
+    test_client.get("/catalog")
+    assert calls == [1, 1]
+
+
+def test_cached_page_skipped_for_admin(client):
+    test_client, calls = client
+    test_client.cookies.set("access_token", "token")
+    test_client.get("/catalog")
+    test_client.get("/catalog")
+    assert calls == [1, 1]
+
+
+def test_cached_page_keys_on_values_passed_to_view(client):
+    # представление видит значение как есть: пробелы дают другую страницу и другой ключ
+    test_client, calls = client
+    assert test_client.get("/catalog?producer=%20").text == "page 1 ' '"
+    assert test_client.get("/catalog").text == "page 1 None"
+    assert test_client.get("/catalog?producer=%20A").text == "page 1 ' A'"
+    assert test_client.get("/catalog?producer=A").text == "page 1 'A'"
+    # пустой параметр представление обрабатывает как отсутствующий
+    assert test_client.get("/catalog?producer=&page=1").text == "page 1 None"
+    assert len(calls) == 4
+
+
+@pytest.mark.asyncio
+async def test_file_backend_concurrent_writes_of_one_page(tmp_path):
+    backend = FilePageBackend(tmp_path)
+    bodies = [bytes([i]) * 100_000 for i in range(8)]
+    await asyncio.gather(*(backend.set("key", entry(body)) for body in bodies))
+    assert (await backend.get("key"))["body"] in bodies
+    assert [p.name for p in (tmp_path / "pages").iterdir() if p.name.startswith(".")] == []
+
+
+@pytest.mark.asyncio
+async def test_file_backend_prunes_oldest_pages(tmp_path):
+    backend = FilePageBackend(tmp_path, max_entries=3)
+    for i in range(5):
+        await backend.set(f"key{i}", entry(b"x"))
+    assert len(list((tmp_path / "pages").iterdir())) == 3
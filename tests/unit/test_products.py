@@ -1,14 +1,16 @@
+import asyncio
 import logging
 
 import pytest
 
 from domain import *
-from services.tile import delete_tile, update_tile
+from services.exceptions import ImageProcessingError
+from services.tile import delete_tile, fetch_admin_tiles, update_tile
 from tests.conftest import domain_handbooks_models_for_products
 from tests.fakes import FakeUoW, FakeImageGenerator
 #from .conftest import products_env, products_env_with_handbooks
 from .helpers import product_catalog_path, product_details_path
-from tests.helpers import add_tile_helper, assert_size, assert_box, assert_tile_fields, assert_handbooks_count, update_filters
+from tests.helpers import add_tile_helper, add_tile_helper_with_control_filters, assert_size, assert_box, assert_tile_fields, assert_handbooks_count, update_filters
 
 log = logging.getLogger(__name__)
 
@@ -29,6 +31,10 @@ async def test_create_tile_success_when_all_handbooks_exists(
 
     images_table = await manager.read(TileImages, tile_id=tile_id)
     assert len(images_table) == 3
+    # главное изображение сохраняется первым, на позиции 0
+    assert [img["position"] for img in images_table] == [0, 1, 2]
+    main_images = await manager.main_images([tile_id])
+    assert main_images[tile_id].endswith(f"{tile_id}-0")
 
 
 @pytest.mark.asyncio
@@ -118,3 +124,112 @@ async def test_delete_tile_by_article(products_env, domain_handbooks_models_for_
     assert not new_records
     await assert_handbooks_count(manager, domain_handbooks_models_for_products, 1)
 
+
+
+@pytest.mark.asyncio
+async def test_tiles_with_identical_images_share_content_addressed_file(products_env):
+    manager, file_manager, fs = products_env
+    file_manager.content_addressed = True
+    first = await add_tile_helper(manager, file_manager, FakeImageGenerator())
+    files_count = len(fs)
+    second = await add_tile_helper(manager, file_manager, FakeImageGenerator())
+    # те же изображения не сохраняются второй раз, записи ссылаются на общие файлы
+    assert len(fs) == files_count
+    first_paths = [img["image_path"] for img in await manager.read(TileImages, tile_id=first["id"])]
+    second_paths = [img["image_path"] for img in await manager.read(TileImages, tile_id=second["id"])]
+    assert first_paths == second_paths
+    assert all(path.endswith(".jpg") for path in first_paths)
+
+
+@pytest.mark.asyncio
+async def test_create_tile_links_existing_collection(products_env_with_handbooks):
+    # коллекция берётся из слова в кавычках и сохраняется в collection_id один раз при создании
+    manager, file_manager, fs = products_env_with_handbooks
+    collection = await manager.create(Collections, name="Collection1", image_path="path")
+    record = await add_tile_helper_with_control_filters(
+        manager, file_manager, FakeImageGenerator(), name='Tile "collection1"'
+    )
+    assert record["collection_id"] == collection["id"]
+    record = await add_tile_helper_with_control_filters(
+        manager, file_manager, FakeImageGenerator(), name='Tile "other"'
+    )
+    assert record["collection_id"] is None
+
+
+@pytest.mark.asyncio
+async def test_update_tile_name_changes_collection(products_env_with_handbooks):
+    manager, file_manager, fs = products_env_with_handbooks
+    collection = await manager.create(Collections, name="collection1", image_path="path")
+    record = await add_tile_helper(manager, file_manager, FakeImageGenerator())
+    assert record["collection_id"] is None
+    await update_tile(manager, record["id"], uow_class=FakeUoW, name='Tile "Collection1"')
+    new_tile = (await manager.read(Tile, id=record["id"]))[0]
+    assert new_tile["collection_id"] == collection["id"]
+
+
+@pytest.mark.asyncio
+async def test_create_tile_invalidates_reference_cache(products_env):
+    manager, file_manager, fs = products_env
+    await add_tile_helper(manager, file_manager, FakeImageGenerator())
+    assert manager.invalidated
+    assert {TileSize, Producer, Categories, Slug} <= set(manager.invalidated[-1])
+
+
+class SlowImageGenerator(FakeImageGenerator):
+    # отслеживает число одновременных вызовов воркера и падает на заданном изображении
+    def __init__(self, fail_on: bytes | None = None):
+        self.fail_on = fail_on
+        self.active = 0
+        self.max_active = 0
+
+    async def products_catalog_and_details(self, img: bytes):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        await asyncio.sleep(0.01)
+        self.active -= 1
+        if img == self.fail_on:
+            raise ImageProcessingError("Ошибка генерации")
+        return await super().products_catalog_and_details(img)
+
+
+@pytest.mark.asyncio
+async def test_create_tile_processes_images_concurrently(products_env):
+    manager, file_manager, fs = products_env
+    generator = SlowImageGenerator()
+    await add_tile_helper(manager, file_manager, generator)
+    assert generator.max_active == 3
+    assert len(fs) == 9
+
+
+@pytest.mark.asyncio
+async def test_create_tile_rolls_back_all_files_when_one_image_fails(products_env):
+    manager, file_manager, fs = products_env
+    with pytest.raises(ImageProcessingError):
+        await add_tile_helper(manager, file_manager, SlowImageGenerator(fail_on=b"B"))
+    assert fs == {}
+
+
+@pytest.mark.asyncio
+async def test_fetch_admin_tiles_searches_and_paginates(crud):
+    for i in range(1, 8):
+        await crud.create(
+            Tile,
+            id=i,
+            name=f"Плитка {i}" if i % 2 else f"Керамогранит {i}",
+            producer_name="Kerama" if i < 4 else "Cersanit",
+        )
+    page = await fetch_admin_tiles(crud, page=2, per_page=3)
+    assert [tile["id"] for tile in page["items"]] == [4, 5, 6]
+    assert (page["total"], page["pages"], page["page"]) == (7, 3, 2)
+
+    found = await fetch_admin_tiles(crud, query="плитка", per_page=2, page=10)
+    assert found["total"] == 4
+    assert found["page"] == found["pages"] == 2
+    assert [tile["id"] for tile in found["items"]] == [5, 7]
+
+    assert [t["id"] for t in (await fetch_admin_tiles(crud, query="kerama"))["items"]] == [1, 2, 3]
+    assert [t["id"] for t in (await fetch_admin_tiles(crud, query="6"))["items"]] == [6]
+    for term in ("²", "١", "9" * 30):
+        assert (await fetch_admin_tiles(crud, query=term))["total"] == 0
+    empty = await fetch_admin_tiles(crud, query="нет такого")
+    assert (empty["items"], empty["total"], empty["pages"]) == ([], 0, 1)
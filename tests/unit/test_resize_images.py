@@ -0,0 +1,51 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from PIL import Image
+
+from scripts import resize_images
+
+
+def make_original(root, name="1-0", color="red"):
+    path = root / "base" / "products" / name
+    path.parent.mkdir(parents=True, exist_ok=True)
+    buf = BytesIO()
+    Image.new("RGB", (700, 500), color).save(buf, format="JPEG")
+    path.write_bytes(buf.getvalue())
+    return path
+
+
+def rebuild(root, **kwargs):
+    return resize_images.rebuild(root, executor_cls=ThreadPoolExecutor, workers=2, **kwargs)
+
+
+def test_rebuild_skips_unchanged_sources(tmp_path):
+    make_original(tmp_path)
+    first = rebuild(tmp_path, only={"products"})
+    assert first["sources"] == 1 and first["files"] > 0
+    assert (tmp_path / "products" / "catalog" / "1-0").exists()
+    assert rebuild(tmp_path, only={"products"})["sources"] == 0
+    # другая цель того же оригинала ещё не собиралась
+    assert rebuild(tmp_path)["sources"] == 1
+
+
+def test_rebuild_uses_hash_when_only_mtime_changed(tmp_path):
+    original = make_original(tmp_path)
+    rebuild(tmp_path)
+    stat = original.stat()
+    os.utime(original, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    touched = rebuild(tmp_path)
+    assert touched["sources"] == 1 and touched["files"] == 0
+    make_original(tmp_path, color="blue")
+    assert rebuild(tmp_path)["files"] > 0
+
+
+def test_rebuild_force_and_preset_change(tmp_path, monkeypatch):
+    make_original(tmp_path)
+    rebuild(tmp_path)
+    assert rebuild(tmp_path, force=True)["sources"] == 1
+    presets = dict(resize_images.IMAGE_PRESETS)
+    presets["products"] = {**presets["products"], "widths": (320, 640)}
+    monkeypatch.setattr(resize_images, "IMAGE_PRESETS", presets)
+    assert rebuild(tmp_path, only={"products"})["sources"] == 1
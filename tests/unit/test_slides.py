@@ -0,0 +1,52 @@
+import pytest
+
+from domain import ImageJob, Slide
+from services.slides import add_slides, delete_slides, get_slides_paths, update_slide
+from tests.fakes import FakeImageGenerator, FakeUoW
+
+
+@pytest.mark.asyncio
+async def test_slides_shown_by_position_and_activity(slides_env):
+    manager, file_manager, fs = slides_env
+    await add_slides([b"1", b"2", b"3"], FakeImageGenerator(), file_manager, manager, FakeUoW)
+    slides = await manager.read(Slide, order_by="position")
+    assert [slide["position"] for slide in slides] == [0, 1, 2]
+    assert len(fs) == 6
+    first, second, third = slides
+    assert await get_slides_paths(manager, file_manager) == tuple(
+        str(file_manager.resolve_path(str(slide["id"]), "slides")) for slide in slides
+    )
+
+    await update_slide(manager, first["id"], position=5)
+    await update_slide(manager, second["id"], active=False)
+    assert await get_slides_paths(manager, file_manager) == (
+        str(file_manager.resolve_path(str(third["id"]), "slides")),
+        str(file_manager.resolve_path(str(first["id"]), "slides")),
+    )
+    assert manager.invalidated
+
+
+@pytest.mark.asyncio
+async def test_new_slides_appended_and_enqueued(slides_env):
+    manager, file_manager, fs = slides_env
+    await add_slides([b"1"], FakeImageGenerator(), file_manager, manager, FakeUoW)
+    await add_slides([b"2"], None, file_manager, manager, FakeUoW)
+    slides = await manager.read(Slide, order_by="position")
+    assert [slide["position"] for slide in slides] == [0, 1]
+    jobs = await manager.read(ImageJob)
+    assert [job["source_path"] for job in jobs] == [slides[1]["image_path"]]
+    # пока варианта нет, показывается оригинал
+    assert (await get_slides_paths(manager, file_manager))[1] == slides[1]["image_path"]
+
+
+@pytest.mark.asyncio
+async def test_delete_one_and_all_slides(slides_env):
+    manager, file_manager, fs = slides_env
+    await add_slides([b"1", b"2"], FakeImageGenerator(), file_manager, manager, FakeUoW)
+    first, second = await manager.read(Slide, order_by="position")
+    await delete_slides(file_manager, manager, FakeUoW, id=first["id"])
+    assert [slide["id"] for slide in await manager.read(Slide)] == [second["id"]]
+    assert len(fs) == 2
+    await delete_slides(file_manager, manager, FakeUoW)
+    assert not await manager.read(Slide)
+    assert fs == {}
@@ -0,0 +1,60 @@
+import re
+
+import pytest
+from starlette.requests import Request
+
+from api.templating import _buffered, stream_template, templates
+from domain import Slide
+from tests.fakes import FakeCRUD
+
+
+def make_request(path: str = "/admin") -> Request:
+    return Request(
+        {"type": "http", "method": "GET", "path": path, "headers": [], "query_string": b""}
+    )
+
+
+async def parts(*items: str):
+    for item in items:
+        yield item
+
+
+@pytest.mark.asyncio
+async def test_buffered_sends_head_early_then_large_chunks():
+    buffered = _buffered(parts("a" * 600, "b" * 600, "c", "d"), chunk_size=4, first_chunk_size=1000)
+    chunks = [chunk async for chunk in buffered]
+    assert chunks == ["a" * 600 + "b" * 600, "cd"]
+
+
+@pytest.mark.asyncio
+async def test_streamed_admin_page_matches_buffered_render():
+    manager = FakeCRUD()
+    for position in range(2):
+        await manager.create(Slide, image_path=f"slide{position}.jpg", position=position, active=True)
+    context = {
+        "request": make_request(),
+        "csrf_token": "token",
+        "slides": await manager.read(Slide, order_by="position"),
+    }
+    response = stream_template("admin.html", context)
+    streamed = "".join([chunk async for chunk in response.body_iterator])
+    rendered = templates.get_template("admin.html").render(context)
+    assert streamed == rendered
+    assert "slide1.jpg" in streamed and 'id="tiles-list-items"' in streamed
+
+
+@pytest.mark.parametrize(
+    "current, total, expected",
+    [
+        (1, 2, "[1] 2"),
+        (1, 10, "[1] 2 3 … 10"),
+        (6, 50, "1 … 4 5 [6] 7 8 … 50"),
+        (50, 50, "1 … 48 49 [50]"),
+    ],
+)
+def test_page_links_render_window_around_current_page(current, total, expected):
+    macros = templates.get_template("macros.html").module
+    html = str(macros.page_links(current, total, "?q=x&page="))
+    links = re.findall(r'class="page-(\w+)"(?: href="([^"]*)")?>([^<]+)<', html)
+    assert " ".join(f"[{text}]" if kind == "current" else text for kind, _, text in links) == expected
+    assert all(href == f"?q=x&amp;page={text}" for kind, href, text in links if kind == "btn")
@@ -1,13 +1,17 @@
+import base64
+import json
 import logging
 
 import pytest
 from slugify import slugify
 
+from api.templating import _render_category_nav, category_nav, precompile_templates
 from core.config import ITEMS_PER_PAGE
-from domain import Categories, Slug
-from services.views import (build_main_images,
-                            build_tile_filters, extract_quoted_word,
-                            fetch_items)
+from domain import Categories, Slug, Tile, TileImages
+from services.views import (LISTING_COLUMNS, build_data_for_filters,
+                            build_main_images, build_tile_filters, decode_cursor,
+                            extract_quoted_word, fetch_items, fetch_page,
+                            search_items)
 from tests.unit.conftest import manager_factory
 
 log = logging.getLogger(__name__)
@@ -68,11 +72,7 @@ async def test_build_tile_filters_with_not_exists_size(manager_factory):
 
 @pytest.mark.asyncio
 async def test_build_main_images():
-    image1 = "image-image-110"
-    tiles = [{"id": 1, "images_paths": [image1]}]
-    assert build_main_images(tiles) == {1: "image-image-0"}
-    image2 = "image-image-0"
-    tiles = [{"id": 1, "images_paths": [image2]}]
+    tiles = [{"id": 1, "main_image": "image-image-0"}, {"id": 2, "main_image": None}]
     assert build_main_images(tiles) == {1: "image-image-0"}
 
 
@@ -82,4 +82,134 @@ async def test_fetch_items(manager_factory):
     log.debug("items per page: %s", ITEMS_PER_PAGE)
     manager = await manager_factory(n)
     items, count = await fetch_items(manager, ITEMS_PER_PAGE, 0)
-    assert count == n
\ No newline at end of file
+    assert count == n
+
+@pytest.mark.asyncio
+async def test_fetch_items_total_count_not_depends_on_page(manager_factory):
+    # общее количество считается отдельным запросом и не зависит от страницы
+    n = ITEMS_PER_PAGE + 5
+    manager = await manager_factory(n)
+    _, first_count = await fetch_items(manager, ITEMS_PER_PAGE, 0)
+    _, last_count = await fetch_items(manager, ITEMS_PER_PAGE, ITEMS_PER_PAGE)
+    assert first_count == last_count == n
+
+
+@pytest.mark.asyncio
+async def test_fetch_items_total_count_with_in_filter(manager_factory):
+    manager = await manager_factory(5)
+    _, count = await fetch_items(
+        manager, ITEMS_PER_PAGE, 0, producer_name=["producer0", "producer3"]
+    )
+    assert count == 2
+
+
+@pytest.mark.asyncio
+async def test_build_data_for_filters_narrows_by_active_filters(manager_factory):
+    # выбранный цвет сужает остальные фильтры, но сам фильтр цветов остаётся полным
+    manager = await manager_factory(3)
+    sizes, colors, producers = await build_data_for_filters(
+        manager, filters={"color_name": "color1"}
+    )
+    assert len(colors) == 3
+    assert [(p.name, p.count) for p in producers] == [("producer0", 1)]
+    assert [(s.id, s.count) for s in sizes] == [(0, 1)]
+
+
+@pytest.mark.asyncio
+async def test_fetch_page_cursors_walk_whole_catalog(manager_factory):
+    # переход по курсорам вперёд проходит все товары ровно один раз в порядке id
+    n, limit = 7, 3
+    manager = await manager_factory(n)
+    items, total, next_cursor, prev_cursor = await fetch_page(manager, limit, 0)
+    assert prev_cursor is None and total == n
+    seen = [item["id"] for item in items]
+    while next_cursor:
+        items, _, next_cursor, prev_cursor = await fetch_page(
+            manager, limit, 0, next_cursor
+        )
+        assert prev_cursor is not None
+        seen += [item["id"] for item in items]
+    all_ids = sorted(tile["id"] for tile in await manager.read(Tile))
+    assert seen == all_ids
+
+
+@pytest.mark.asyncio
+async def test_fetch_page_prev_cursor_returns_previous_page(manager_factory):
+    manager = await manager_factory(7)
+    first, _, next_cursor, _ = await fetch_page(manager, 3, 0)
+    second, _, _, prev_cursor = await fetch_page(manager, 3, 0, next_cursor)
+    back, _, next_from_back, prev_from_back = await fetch_page(manager, 3, 0, prev_cursor)
+    assert [i["id"] for i in back] == [i["id"] for i in first]
+    assert prev_from_back is None and next_from_back is not None
+
+
+@pytest.mark.asyncio
+async def test_fetch_page_ignores_broken_cursor(manager_factory):
+    manager = await manager_factory(4)
+    items, _, _, _ = await fetch_page(manager, 3, 3, "not a cursor")
+    assert len(items) == 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "payload",
+    [
+        {"key": ["x"], "backward": False},
+        {"key": [1, 2], "backward": False},
+        {"key": [True], "backward": False},
+        {"key": [2**40], "backward": False},
+        {"key": 1, "backward": False},
+        {"key": [1], "backward": "yes"},
+    ],
+)
+async def test_wrongly_typed_cursor_falls_back_to_pages(manager_factory, payload):
+    # курсор раскодировался, но ключ не подходит для запроса - как будто курсора нет
+    manager = await manager_factory(4)
+    cursor = base64.urlsafe_b64encode(json.dumps(payload).encode()).decode().rstrip("=")
+    assert decode_cursor(cursor) is None
+    items, _, _, _ = await fetch_page(manager, 3, 3, cursor)
+    assert len(items) == 1
+
+
+@pytest.mark.asyncio
+async def test_fetch_items_reads_only_listing_columns(manager_factory):
+    # в листинг попадают только нужные карточке поля и главное изображение, без галереи
+    manager = await manager_factory(2)
+    tile_id = (await manager.read(Tile))[0]["id"]
+    await manager.create(TileImages, tile_id=tile_id, image_path="main", position=0)
+    await manager.create(TileImages, tile_id=tile_id, image_path="gallery", position=1)
+    items, _ = await fetch_items(manager, ITEMS_PER_PAGE, 0)
+    assert set(items[0]) == {
+        key.replace(".", "_") for key in LISTING_COLUMNS
+    } | {"main_image"}
+    main_images = {item["id"]: item["main_image"] for item in items}
+    assert main_images[tile_id] == "main"
+
+
+def test_category_nav_rendered_once_per_categories_set():
+    assert precompile_templates() > 0
+    categories = [{"slug": "plitka", "name": "Плитка"}]
+    _render_category_nav.cache_clear()
+    first = category_nav(categories)
+    assert category_nav([dict(c) for c in categories]) is first
+    assert 'href="/catalog/plitka/products"' in first
+    assert _render_category_nav.cache_info().misses == 1
+
+
+@pytest.mark.asyncio
+async def test_search_items_ranks_and_paginates(crud):
+    names = ["Керамогранит Мрамор", "Плитка Мрамор белая", "Плитка Дерево", "Мозаика"]
+    for i, name in enumerate(names, start=1):
+        await crud.create(Tile, id=i, name=name, producer_name="Kerama")
+    await crud.create(TileImages, tile_id=2, image_path="img-2", position=0)
+
+    items, total, page = await search_items(crud, "  плитка мрамор ", limit=10)
+    assert total == 1 and page == 1 and [item["id"] for item in items] == [2]
+    assert items[0]["main_image"] == "img-2"
+
+    items, total, page = await search_items(crud, "kerama", limit=3, page=2)
+    assert total == 4 and page == 2 and [item["id"] for item in items] == [4]
+    # страница за концом выдачи - последняя, а не OFFSET за пределами bigint
+    items, _, page = await search_items(crud, "kerama", limit=3, page=10**20)
+    assert page == 2 and [item["id"] for item in items] == [4]
+    assert await search_items(crud, "   ", limit=3) == ((), 0, 1)